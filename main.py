@@ -1,11 +1,26 @@
 from fastapi import FastAPI, Request, HTTPException, Query
-from fastapi.responses import HTMLResponse, Response, JSONResponse
+from fastapi.responses import HTMLResponse, Response, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from services.email_service import EmailService
-from services.s3_service import S3Service
+from services.async_email_service import AsyncEmailService
+from services.s3_service import S3Service, s3_relative_path
 from services.mongodb_service import MongoDBService
+from services.imap_pool import IMAPConnectionPool
+from services.message_cache import MessageCache
+from services.idle_watcher import WatcherRegistry
+from services.health_monitor import HealthMonitor
+from services.blob_index import BlobIndex
+from services.email_record import EmailRecord
+from services.response_cache import ResponseCache, etag_matches, http_date, not_modified_since, state_etag
+from services.upload_queue import JobStore, RetryableJobError, UploadWorkerPool
+from services.account_scheduler import IngestionScheduler
+from services.folder_sync import parse_folders
 from pydantic import BaseModel
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
 import uvicorn
+import asyncio
+import json
+import time
 import base64
 import io
 import os
@@ -14,8 +29,6 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Gmail Email Parser")
-
 # Setup templates
 templates = Jinja2Templates(directory="templates")
 
@@ -33,11 +46,166 @@ S3_CV_FOLDER = os.getenv("S3_CV_FOLDER", "emailCvs")
 # MongoDB connection - Load from environment variables
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Shared pool of warm Gmail IMAP sessions, keyed by account
+imap_pool = IMAPConnectionPool(
+    max_sessions_per_account=int(os.getenv("IMAP_MAX_SESSIONS_PER_ACCOUNT", "4")),
+    idle_timeout=float(os.getenv("IMAP_IDLE_TIMEOUT", "300"))
+)
+
+# Local cache of parsed listing records, synced incrementally per mailbox
+message_cache = MessageCache(os.getenv("EMAIL_CACHE_PATH", "email_cache.db"))
+
+# One IMAP IDLE watcher per account, shared by every open emails page
+email_watchers = WatcherRegistry(message_cache, limit=100)
+
+# Rendered /emails and /api/emails responses, reused while the mailbox state is unchanged
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_ENTRIES", "256")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+)
+
+# Folders (Gmail labels) /emails lists unread email from, synced in parallel
+EMAIL_FOLDERS = parse_folders(os.getenv("EMAIL_FOLDERS", "INBOX"))
+
+# Largest page /api/emails serves per request
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "500"))
+
+# Content hashes of attachments already in S3, so repeated CVs are not uploaded again
+blob_index = BlobIndex(os.getenv("BLOB_INDEX_PATH", "blob_index.db"))
+
+# S3 and MongoDB clients shared by every request, created at startup
+s3_service: Optional[S3Service] = None
+s3_error: Optional[str] = None
+mongodb_service: Optional[MongoDBService] = None
+mongodb_error: Optional[str] = None
+
+# Upload jobs persisted locally and run by background workers
+upload_jobs = JobStore(os.getenv("UPLOAD_JOBS_PATH", "upload_jobs.db"))
+upload_workers: Optional[UploadWorkerPool] = None
+
+# Cached S3/MongoDB reachability, refreshed in the background instead of probed per upload
+service_health = HealthMonitor(interval=float(os.getenv("HEALTH_CHECK_INTERVAL", "60")))
+
+# Background cache sync for the accounts in ACCOUNTS_CONFIG, if that file exists
+ACCOUNTS_CONFIG = os.getenv("ACCOUNTS_CONFIG", "accounts.json")
+ingestion_scheduler: Optional[IngestionScheduler] = None
+
+def start_ingestion_scheduler():
+    global ingestion_scheduler
+    if not os.path.exists(ACCOUNTS_CONFIG):
+        return
+    try:
+        ingestion_scheduler = IngestionScheduler.from_config(
+            ACCOUNTS_CONFIG, imap_pool, message_cache,
+            max_concurrency=int(os.getenv("INGEST_MAX_CONCURRENCY", "4")),
+            batch_size=int(os.getenv("INGEST_BATCH_SIZE", "200")),
+            interval=float(os.getenv("INGEST_INTERVAL", "60"))
+        )
+        ingestion_scheduler.start()
+    except Exception as e:
+        print(f"Could not start account ingestion from {ACCOUNTS_CONFIG}: {e}")
+
+async def start_storage_services():
+    global s3_service, s3_error, mongodb_service, mongodb_error
+    
+    try:
+        s3_service = S3Service(
+            AWS_ACCESS_KEY, AWS_SECRET_KEY, AWS_REGION,
+            max_pool_connections=int(os.getenv("S3_MAX_POOL_CONNECTIONS", "20")),
+            multipart_threshold=int(float(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8")) * 1024 * 1024),
+            part_size=int(float(os.getenv("S3_PART_SIZE_MB", "8")) * 1024 * 1024),
+            max_concurrency=int(os.getenv("S3_UPLOAD_CONCURRENCY", "4")),
+            blob_index=blob_index
+        )
+        service_health.register("s3", lambda: asyncio.to_thread(s3_service.test_connection, S3_BUCKET_NAME))
+    except Exception as e:
+        s3_error = str(e)
+    
+    try:
+        mongodb_service = MongoDBService(
+            max_pool_size=int(os.getenv("MONGODB_MAX_POOL_SIZE", "20")),
+            min_pool_size=int(os.getenv("MONGODB_MIN_POOL_SIZE", "2"))
+        )
+        service_health.register("mongodb", mongodb_service.test_connection)
+    except Exception as e:
+        mongodb_error = str(e)
+    
+    if mongodb_service is not None:
+        try:
+            await mongodb_service.ensure_indexes()
+        except Exception as e:
+            print(f"Could not create MongoDB indexes: {e}")
+    
+    service_health.start()
+
+async def close_storage_services():
+    await service_health.stop()
+    if s3_service is not None:
+        await asyncio.to_thread(s3_service.close)
+    if mongodb_service is not None:
+        await mongodb_service.close_connection()
+    blob_index.close()
+
+def start_upload_workers():
+    global upload_workers
+    upload_workers = UploadWorkerPool(
+        upload_jobs,
+        run_upload_job,
+        workers=int(os.getenv("UPLOAD_WORKERS", "4")),
+        max_attempts=int(os.getenv("UPLOAD_MAX_ATTEMPTS", "5"))
+    )
+    upload_workers.start()
+    # Keep a week of finished jobs for status lookups
+    upload_jobs.prune(older_than=7 * 24 * 3600)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the shared clients and background workers, then stop them in reverse order"""
+    imap_pool.start_reaper()
+    await start_storage_services()
+    start_upload_workers()
+    start_ingestion_scheduler()
+    try:
+        yield
+    finally:
+        # Stop everything that syncs or uploads before the pool, cache and stores it uses go away
+        if ingestion_scheduler is not None:
+            await ingestion_scheduler.stop()
+        if upload_workers is not None:
+            await upload_workers.stop()
+        email_watchers.stop_all()
+        await close_storage_services()
+        imap_pool.close_all()
+        message_cache.close()
+        upload_jobs.close()
+
+app = FastAPI(title="Gmail Email Parser", lifespan=lifespan)
+
 # Pydantic model for request body
 class EmailCredentials(BaseModel):
     email: str
     password: str
 
+class BulkUploadItem(BaseModel):
+    message_id: str
+    filename: str
+    job_category: str = "Unknown"
+    mailbox: str = "INBOX"
+
+class BulkUploadRequest(BaseModel):
+    email: str
+    password: str
+    category: Optional[str] = None
+    items: List[BulkUploadItem] = []
+    # Folders the category is expanded over; EMAIL_FOLDERS when omitted, as on /emails
+    folders: Optional[List[str]] = None
+
+# Login failures (as raised by EmailService.connect) that retrying can't fix
+PERMANENT_LOGIN_ERRORS = ("Invalid Gmail credentials", "IMAP access is disabled", "App password required")
+
+# Concurrent S3 uploads per bulk request
+BULK_UPLOAD_WORKERS = int(os.getenv("BULK_UPLOAD_WORKERS", "8"))
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -52,10 +220,10 @@ async def config_page(request: Request):
 async def test_connection(credentials: EmailCredentials):
     """Test email connection with provided credentials"""
     try:
-        email_service = EmailService(credentials.email, credentials.password)
+        email_service = AsyncEmailService(credentials.email, credentials.password, pool=imap_pool)
         
         # Test connection with improved validation
-        if not email_service.test_connection():
+        if not await email_service.test_connection():
             return {
                 "success": False,
                 "error": "Failed to connect to Gmail",
@@ -63,7 +231,7 @@ async def test_connection(credentials: EmailCredentials):
             }
         
         # Test email retrieval
-        emails = email_service.get_all_emails(limit=5)  # Test with just 5 emails
+        emails = await email_service.get_all_emails(limit=5, listing_mode=True)  # Test with just 5 emails
         
         return {
             "success": True,
@@ -77,42 +245,257 @@ async def test_connection(credentials: EmailCredentials):
             "message": "Connection failed. Please check your credentials and try again."
         }
 
+async def conditional_response(request: Request, email_service: AsyncEmailService, variant, render,
+                               mailboxes: Optional[List[str]] = None) -> Response:
+    """
+    Answer from the mailbox state alone when possible
+    
+    One STATUS yields the state the response would be built from. A client that already
+    has it gets a 304, a cached rendering is replayed, and only otherwise render() runs.
+    
+    Args:
+        variant: What else the response depends on (endpoint and query)
+        render: Coroutine returning (response, cacheable)
+        mailboxes: Folders the response is built from, if not just the service's mailbox
+    """
+    try:
+        if mailboxes:
+            state = await email_service.probe_folder_states(mailboxes)
+        else:
+            state = await email_service.probe_mailbox_state()
+    except Exception:
+        # Let the normal path report the connection error
+        response, _ = await render()
+        return response
+    
+    mailbox = mailboxes or email_service.mailbox
+    etag = state_etag(
+        email_service.email_address.lower(), mailbox, state,
+        email_service.category_version(), variant
+    )
+    key = ResponseCache.key(email_service.email_address.lower(), mailbox, variant)
+    entry = response_cache.get(key, etag)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if entry is not None:
+        headers["Last-Modified"] = http_date(entry["last_modified"])
+    
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag) or (
+        entry is not None and not if_none_match
+        and not_modified_since(request.headers.get("if-modified-since"), entry["last_modified"])
+    ):
+        return Response(status_code=304, headers=headers)
+    
+    if entry is not None:
+        return Response(content=entry["body"], media_type=entry["media_type"], headers={**entry["headers"], **headers})
+    
+    response, cacheable = await render()
+    if cacheable and response.status_code == 200:
+        # Response-specific headers (e.g. the page cursor) are replayed with the body
+        extra_headers = {name: value for name, value in response.headers.items() if name.lower().startswith("x-")}
+        entry = response_cache.put(key, etag, response.body, response.media_type, extra_headers)
+        headers["Last-Modified"] = http_date(entry["last_modified"])
+        response.headers.update(headers)
+    return response
+
+async def unread_listing(email_service: AsyncEmailService, folders: List[str]) -> List[EmailRecord]:
+    """The unread listing /emails renders: the service's mailbox from the cache, or several folders merged"""
+    if folders != [email_service.mailbox]:
+        return await email_service.get_folder_unread_emails(folders, limit=100)
+    return await email_service.get_unread_emails(limit=100, listing_mode=True)
+
 @app.get("/emails", response_class=HTMLResponse)
 async def get_emails(request: Request):
     """Display unread emails categorized by job titles"""
-    try:
-        # Get credentials from query parameters or use defaults
-        email = request.query_params.get("email", EMAIL_ADDRESS)
-        password = request.query_params.get("password", EMAIL_PASSWORD)
-        
-        email_service = EmailService(email, password)
+    # Get credentials from query parameters or use defaults
+    email = request.query_params.get("email", EMAIL_ADDRESS)
+    password = request.query_params.get("password", EMAIL_PASSWORD)
+    
+    email_service = AsyncEmailService(email, password, pool=imap_pool, cache=message_cache)
+    
+    # ?folder=... (repeatable) overrides EMAIL_FOLDERS
+    folders = parse_folders(",".join(request.query_params.getlist("folder"))) \
+        if request.query_params.getlist("folder") else EMAIL_FOLDERS
+    multi_folder = folders != [email_service.mailbox]
+    
+    async def render():
+        try:
+            # Fetch only unread emails; listing mode skips attachment payloads
+            emails = await unread_listing(email_service, folders)
+            
+            # Categorize emails by job titles
+            categorized_emails = email_service.categorize_emails(emails)
+            
+            return templates.TemplateResponse("emails.html", {
+                "request": request, 
+                "categorized_emails": categorized_emails,
+                "total_emails": len(emails),
+                "error": None,
+                "live_updates": not multi_folder
+            }), True
+        except Exception as e:
+            return templates.TemplateResponse("emails.html", {
+                "request": request, 
+                "categorized_emails": {},
+                "total_emails": 0,
+                "error": str(e),
+                "live_updates": not multi_folder
+            }), False
+    
+    return await conditional_response(
+        request, email_service, ("emails", str(request.url.query)), render,
+        mailboxes=folders if multi_folder else None
+    )
+
+@app.get("/emails/stream")
+async def stream_emails(request: Request):
+    """Server-Sent Events feed of new, changed and removed unread emails in INBOX"""
+    email = request.query_params.get("email", EMAIL_ADDRESS)
+    password = request.query_params.get("password", EMAIL_PASSWORD)
+    
+    # ?uids=... lists the rows the page rendered, so mail that arrived before the subscription is sent too
+    uids = request.query_params.get("uids")
+    rendered_uids = {int(uid) for uid in uids.split(",") if uid.isdigit()} if uids is not None else None
+    
+    watcher, queue = email_watchers.subscribe(email, password, rendered_uids)
+    
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Keep proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            email_watchers.unsubscribe(watcher, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/emails")
+async def get_emails_api(
+    request: Request,
+    email_address: str = Query(...),
+    password: str = Query(...),
+    after_uid: int = Query(0, ge=0, description="Cursor: return messages with a higher UID"),
+    limit: int = Query(50, ge=1, le=API_MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated fields, e.g. subject,sender,date"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="json, or ndjson to stream records")
+):
+    """Page through the mailbox oldest first; pass next_after_uid back as after_uid for the next page"""
+    # uid is always returned; it is the cursor
+    projection = None
+    if fields:
+        projection = ["uid"] + [field.strip() for field in fields.split(",") if field.strip() and field.strip() != "uid"]
+        unknown = [field for field in projection if field not in EmailRecord.__slots__]
+        if unknown:
+            return JSONResponse(
+                status_code=400,
+                content={
+                    "success": False,
+                    "error": f"Unknown fields: {', '.join(unknown)}",
+                    "message": f"Available fields: {', '.join(EmailRecord.__slots__)}"
+                }
+            )
+    
+    def project(record: EmailRecord) -> Dict:
+        return {field: record[field] for field in projection} if projection else record.to_dict()
+    
+    email_service = AsyncEmailService(email_address, password, pool=imap_pool, cache=message_cache)
+    
+    async def start_page():
+        """Run the SEARCH and first batch so errors surface as a status code and the cursor is known"""
+        records = email_service.iter_emails(after_uid, limit)
+        try:
+            first = await records.__anext__()
+        except StopAsyncIteration:
+            first = None
+        page = email_service.last_page
+        headers = {
+            "X-Next-After-Uid": str(page["next_after_uid"]),
+            "X-Has-More": "true" if page["has_more"] else "false"
+        }
+        return records, first, page, headers
+    
+    def list_failed(e: Exception) -> JSONResponse:
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": str(e), "message": "Failed to list emails"}
+        )
+    
+    if format == "ndjson":
+        try:
+            records, first, page, headers = await start_page()
+        except Exception as e:
+            return list_failed(e)
         
-        # Fetch only unread emails
-        emails = email_service.get_unread_emails(limit=100)
+        async def ndjson_stream():
+            # One line per record, sent as soon as its FETCH batch is parsed
+            try:
+                if first is not None:
+                    yield json.dumps(project(first), default=str) + "\n"
+                    async for record in records:
+                        yield json.dumps(project(record), default=str) + "\n"
+            finally:
+                # Hands the IMAP session back even if the client disconnects mid-page
+                await records.aclose()
         
-        # Categorize emails by job titles
-        categorized_emails = email_service.categorize_emails(emails)
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson", headers=headers)
+    
+    async def render():
+        try:
+            records, first, page, headers = await start_page()
+        except Exception as e:
+            return list_failed(e), False
         
-        return templates.TemplateResponse("emails.html", {
-            "request": request, 
-            "categorized_emails": categorized_emails,
-            "total_emails": len(emails),
-            "error": None
-        })
-    except Exception as e:
-        return templates.TemplateResponse("emails.html", {
-            "request": request, 
-            "categorized_emails": {},
-            "total_emails": 0,
-            "error": str(e)
-        })
+        emails = []
+        try:
+            if first is not None:
+                emails.append(project(first))
+                async for record in records:
+                    emails.append(project(record))
+        finally:
+            await records.aclose()
+        return JSONResponse(
+            content={
+                "emails": emails,
+                "total": len(emails),
+                "next_after_uid": page["next_after_uid"],
+                "has_more": page["has_more"]
+            },
+            headers=headers
+        ), True
+    
+    # Pages are cached as a whole; streamed pages are not
+    return await conditional_response(request, email_service, ("api", after_uid, limit, projection), render)
 
-@app.get("/api/emails")
-async def get_emails_api():
-    """API endpoint to get emails as JSON"""
-    email_service = EmailService(EMAIL_ADDRESS, EMAIL_PASSWORD)
-    emails = email_service.get_all_emails(limit=100)
-    return {"emails": emails, "total": len(emails)}
+@app.get("/health")
+async def health():
+    """Cached S3/MongoDB health and IMAP pool usage"""
+    return {
+        "services": service_health.status(),
+        "s3_error": s3_error,
+        "mongodb_error": mongodb_error,
+        "imap_pool": imap_pool.stats()
+    }
+
+@app.get("/accounts/status")
+async def accounts_status():
+    """Per-account ingestion lag and throughput of the background scheduler"""
+    if ingestion_scheduler is None:
+        raise HTTPException(status_code=404, detail=f"No accounts configured ({ACCOUNTS_CONFIG} not found)")
+    return {
+        "max_concurrency": ingestion_scheduler.max_concurrency,
+        "batch_size": ingestion_scheduler.batch_size,
+        "accounts": ingestion_scheduler.status()
+    }
 
 @app.post("/button-click")
 async def button_click():
@@ -123,56 +506,32 @@ async def download_attachment(
     email_address: str = Query(...),
     password: str = Query(...),
     message_id: str = Query(...),
-    filename: str = Query(...)
+    filename: str = Query(...),
+    mailbox: str = Query("INBOX", description="Folder (Gmail label) the email was listed from")
 ):
     """Download a specific attachment from an email"""
     try:
         # Create email service and connect
-        email_service = EmailService(email_address, password)
+        email_service = AsyncEmailService(email_address, password, pool=imap_pool, cache=message_cache, mailbox=mailbox)
         
-        if not email_service.connect():
+        if not await email_service.connect():
             raise HTTPException(status_code=400, detail="Failed to connect to email account")
         
+        # The connection stays open until the streamed body has been sent
+        streaming = False
+        
         try:
             # Search for the specific email by Message-ID
-            status, messages = email_service.mail.search(None, f'HEADER Message-ID "{message_id}"')
-            
-            if status != "OK" or not messages[0]:
-                raise HTTPException(status_code=404, detail="Email not found")
+            uid = await email_service.find_message_uid(message_id)
             
-            email_ids = messages[0].split()
-            if not email_ids:
+            if uid is None:
                 raise HTTPException(status_code=404, detail="Email not found")
             
-            # Fetch the email
-            status, msg_data = email_service.mail.fetch(email_ids[0], "(RFC822)")
-            
-            if status != "OK":
-                raise HTTPException(status_code=500, detail="Failed to fetch email")
-            
-            # Parse the email
-            import email as email_lib
-            email_message = email_lib.message_from_bytes(msg_data[0][1])
-            
-            # Get attachments
-            attachments = email_service.get_attachments(email_message)
+            # Describe attachments from BODYSTRUCTURE without downloading the message
+            attachments = await email_service.get_message_attachments(uid)
             
             # Find the requested attachment
-            target_attachment = None
-            
-            for attachment in attachments:
-                # Try exact match first
-                if attachment["filename"] == filename:
-                    target_attachment = attachment
-                    break
-                # Try URL decoded match
-                elif attachment["filename"] == filename.replace('%20', ' '):
-                    target_attachment = attachment
-                    break
-                # Try case insensitive match
-                elif attachment["filename"].lower() == filename.lower():
-                    target_attachment = attachment
-                    break
+            target_attachment = email_service.find_attachment(attachments, filename)
             
             if not target_attachment:
                 available_filenames = [att["filename"] for att in attachments]
@@ -191,21 +550,28 @@ async def download_attachment(
                     }
                 )
             
-            # Return the attachment as a download
+            async def stream_attachment():
+                try:
+                    async for chunk in email_service.iter_attachment_data(uid, target_attachment):
+                        yield chunk
+                finally:
+                    await email_service.disconnect()
+            
+            # Stream the attachment part as it is fetched and decoded
             headers = {
-                "Content-Disposition": f"attachment; filename=\"{filename}\"",
-                "Content-Type": target_attachment["content_type"],
-                "Content-Length": str(target_attachment["size"])
+                "Content-Disposition": f"attachment; filename=\"{filename}\""
             }
             
-            return Response(
-                content=target_attachment["data"],
+            streaming = True
+            return StreamingResponse(
+                stream_attachment(),
                 headers=headers,
                 media_type=target_attachment["content_type"]
             )
             
         finally:
-            email_service.disconnect()
+            if not streaming:
+                await email_service.disconnect()
             
     except HTTPException:
         # Re-raise HTTP exceptions as-is
@@ -213,22 +579,90 @@ async def download_attachment(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to download attachment: {str(e)}")
 
-@app.post("/upload-to-s3")
+@app.post("/upload-to-s3", status_code=202)
 async def upload_to_s3(
-    request: Request,
     email_address: str = Query(...),
     password: str = Query(...),
     message_id: str = Query(...),
     filename: str = Query(...),
-    job_category: str = Query("Unknown", description="Job category for the candidate")
+    job_category: str = Query("Unknown", description="Job category for the candidate"),
+    mailbox: str = Query("INBOX", description="Folder (Gmail label) the email was listed from")
 ):
+    """Queue an attachment upload and return its job id right away"""
+    # The password stays in worker memory; only the rest of the request is written to disk
+    job_id = await upload_workers.submit(
+        {
+            "email_address": email_address,
+            "message_id": message_id,
+            "filename": filename,
+            "job_category": job_category,
+            "mailbox": mailbox
+        },
+        password
+    )
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/upload-jobs/{job_id}",
+            "message": f"Upload of {filename} queued"
+        }
+    )
+
+@app.get("/upload-jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    """Status of a queued upload; once finished, result holds the upload response"""
+    job = await asyncio.to_thread(upload_jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "next_run_at": job["next_run_at"] if job["status"] == "queued" else None,
+        "error": job["error"],
+        "result": job["result"],
+        "filename": job["payload"]["filename"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+
+async def run_upload_job(payload: Dict, password: str):
+    """Worker handler: run one upload and decide whether a failure is worth retrying"""
+    response = await run_upload(password=password, **payload)
+    content = json.loads(response.body)
+    result = {"status_code": response.status_code, "content": content}
+    
+    if response.status_code == 200:
+        return True, result
+    if content.get("retryable", True):
+        raise RetryableJobError(content.get("message", "Upload failed"), result)
+    return False, result
+
+async def run_upload(email_address: str, password: str, message_id: str, filename: str,
+                     job_category: str = "Unknown", mailbox: str = "INBOX") -> JSONResponse:
     """Upload attachment to S3 bucket"""
     try:
-        # Initialize S3 service
-        s3_service = S3Service(AWS_ACCESS_KEY, AWS_SECRET_KEY, AWS_REGION)
+        # Per-stage latency in milliseconds, returned with the result
+        timings = {}
+        started = time.perf_counter()
         
-        # Test S3 connection first
-        if not s3_service.test_connection(S3_BUCKET_NAME):
+        # Use the shared S3 client; reachability comes from the background health check
+        if s3_service is None:
+            # Missing configuration doesn't fix itself; retrying the job would only delay the error
+            return JSONResponse(
+                status_code=400,
+                content={
+                    "success": False,
+                    "error": "S3 connection failed",
+                    "message": "Cannot connect to S3 bucket. Please check your AWS credentials and bucket name.",
+                    "retryable": False
+                }
+            )
+        if not service_health.is_healthy("s3"):
             return JSONResponse(
                 status_code=400,
                 content={
@@ -239,9 +673,9 @@ async def upload_to_s3(
             )
         
         # Create email service and connect to get attachment
-        email_service = EmailService(email_address, password)
+        email_service = AsyncEmailService(email_address, password, pool=imap_pool, cache=message_cache, mailbox=mailbox)
         
-        if not email_service.connect():
+        if not await email_service.connect():
             return JSONResponse(
                 status_code=400,
                 content={
@@ -253,33 +687,23 @@ async def upload_to_s3(
         
         try:
             # Search for the specific email by Message-ID
-            status, messages = email_service.mail.search(None, f'HEADER Message-ID "{message_id}"')
+            uid = await email_service.find_message_uid(message_id)
             
-            if status != "OK" or not messages[0]:
+            if uid is None:
                 return JSONResponse(
                     status_code=404,
                     content={
                         "success": False,
                         "error": "Email not found",
-                        "message": "The email containing this attachment was not found"
+                        "message": "The email containing this attachment was not found",
+                        "retryable": False
                     }
                 )
             
-            email_ids = messages[0].split()
-            if not email_ids:
-                return JSONResponse(
-                    status_code=404,
-                    content={
-                        "success": False,
-                        "error": "Email not found",
-                        "message": "The email containing this attachment was not found"
-                    }
-                )
-            
-            # Fetch the email
-            status, msg_data = email_service.mail.fetch(email_ids[0], "(RFC822)")
-            
-            if status != "OK":
+            # Describe attachments from BODYSTRUCTURE without downloading the message
+            try:
+                attachments = await email_service.get_message_attachments(uid)
+            except Exception:
                 return JSONResponse(
                     status_code=500,
                     content={
@@ -289,13 +713,6 @@ async def upload_to_s3(
                     }
                 )
             
-            # Parse the email
-            import email as email_lib
-            email_message = email_lib.message_from_bytes(msg_data[0][1])
-            
-            # Get attachments
-            attachments = email_service.get_attachments(email_message)
-            
             # Find the requested attachment
             target_attachment = None
             for attachment in attachments:
@@ -310,34 +727,40 @@ async def upload_to_s3(
                     content={
                         "success": False,
                         "error": "Attachment not found",
-                        "message": f"Attachment '{filename}' not found in the email"
+                        "message": f"Attachment '{filename}' not found in the email",
+                        "retryable": False
                     }
                 )
             
-            # Upload to S3
-            upload_result = s3_service.upload_attachment(
+            timings["lookup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            
+            # Stream the attachment's MIME part straight from IMAP into S3
+            stage_started = time.perf_counter()
+            upload_result = await s3_service.upload_stream_async(
                 bucket_name=S3_BUCKET_NAME,
-                attachment_data=target_attachment["data"],
+                chunks=email_service.iter_attachment_data(uid, target_attachment),
                 filename=target_attachment["filename"],
                 folder=S3_CV_FOLDER
             )
+            timings["transfer_ms"] = round((time.perf_counter() - stage_started) * 1000, 1)
             
             if upload_result["success"]:
-                # Initialize MongoDB service
-                try:
-                    mongodb_service = MongoDBService()
-                except Exception as e:
+                service_health.mark("s3", True)
+                
+                # Use the shared MongoDB client
+                if mongodb_service is None:
                     return JSONResponse(
                         status_code=500,
                         content={
                             "success": False,
                             "error": "MongoDB configuration error",
-                            "message": f"S3 upload successful but database configuration failed: {str(e)}"
+                            "message": f"S3 upload successful but database configuration failed: {mongodb_error}",
+                            "retryable": False
                         }
                     )
                 
-                # Test MongoDB connection
-                if not await mongodb_service.test_connection():
+                # Skip the insert if the background check last saw the database down
+                if not service_health.is_healthy("mongodb"):
                     return JSONResponse(
                         status_code=500,
                         content={
@@ -351,24 +774,18 @@ async def upload_to_s3(
                 job_posting = job_category
                 
                 # Extract relative path from S3 URL (remove base URL)
-                s3_url = upload_result["s3_url"]
-                # Remove the base URL part: https://bridge-cv-dev.s3.us-east-2.amazonaws.com
-                base_url = "https://bridge-cv-dev.s3.us-east-2.amazonaws.com"
-                if s3_url.startswith(base_url):
-                    relative_path = s3_url.replace(base_url, "")
-                else:
-                    # Fallback: try to extract path from any S3 URL format
-                    relative_path = "/" + upload_result["key"]
+                relative_path = s3_relative_path(upload_result)
                 
                 # Save to MongoDB
+                stage_started = time.perf_counter()
                 db_result = await mongodb_service.create_expected_candidate(
                     name=target_attachment["filename"],
                     job_posting=job_posting,
-                    cv_file_path=relative_path
+                    cv_file_path=relative_path,
+                    sha256=upload_result["sha256"]
                 )
-                
-                # Close MongoDB connection
-                await mongodb_service.close_connection()
+                timings["db_ms"] = round((time.perf_counter() - stage_started) * 1000, 1)
+                timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
                 
                 if db_result["success"]:
                     # Combine S3 and database results
@@ -381,11 +798,15 @@ async def upload_to_s3(
                         "filename": upload_result["filename"],
                         "original_filename": upload_result["original_filename"],
                         "size": upload_result["size"],
+                        "sha256": upload_result["sha256"],
+                        "deduplicated": upload_result["deduplicated"],
                         "database": {
                             "candidate_id": db_result["candidate_id"],
+                            "duplicate": db_result.get("duplicate", False),
                             "job_posting": job_posting,
-                            "cv_file_path": relative_path
-                        }
+                            "cv_file_path": db_result["data"]["cvFilePath"]
+                        },
+                        "timings": timings
                     }
                     return JSONResponse(
                         status_code=200,
@@ -405,7 +826,8 @@ async def upload_to_s3(
                             "original_filename": upload_result["original_filename"],
                             "size": upload_result["size"],
                             "database_error": db_result["error"],
-                            "cv_file_path": relative_path
+                            "cv_file_path": relative_path,
+                            "timings": timings
                         }
                     )
             else:
@@ -415,7 +837,7 @@ async def upload_to_s3(
                 )
             
         finally:
-            email_service.disconnect()
+            await email_service.disconnect()
             
     except Exception as e:
         return JSONResponse(
@@ -423,10 +845,218 @@ async def upload_to_s3(
             content={
                 "success": False,
                 "error": str(e),
-                "message": "An unexpected error occurred during S3 upload"
+                "message": "An unexpected error occurred during S3 upload",
+                # Bad credentials or disabled IMAP won't fix themselves
+                "retryable": not str(e).startswith(PERMANENT_LOGIN_ERRORS)
             }
         )
 
+@app.post("/upload-to-s3/bulk")
+async def bulk_upload_to_s3(upload: BulkUploadRequest):
+    """Upload many attachments in one pipeline: one IMAP session, concurrent S3 uploads, one insert_many"""
+    try:
+        timings = {}
+        started = time.perf_counter()
+        
+        if s3_service is None or not service_health.is_healthy("s3"):
+            return JSONResponse(
+                status_code=400,
+                content={
+                    "success": False,
+                    "error": "S3 connection failed",
+                    "message": "Cannot connect to S3 bucket. Please check your AWS credentials and bucket name."
+                }
+            )
+        
+        if upload.category == "Uncategorized":
+            return JSONResponse(
+                status_code=400,
+                content={
+                    "success": False,
+                    "error": "Uncategorized emails are not uploaded",
+                    "message": "Pick a job category to upload"
+                }
+            )
+        
+        email_service = AsyncEmailService(upload.email, upload.password, pool=imap_pool, cache=message_cache)
+        items = list(upload.items)
+        
+        # Expand a category into every attachment of its unread emails, classified from the same
+        # listing /emails renders, so matches on preview, attachment names or sender domain count too
+        if upload.category:
+            folders = parse_folders(",".join(upload.folders)) if upload.folders else EMAIL_FOLDERS
+            emails = await unread_listing(email_service, folders)
+            for email_data in email_service.categorize_emails(emails).get(upload.category, []):
+                for attachment in email_data.get("attachments", []):
+                    items.append(BulkUploadItem(
+                        message_id=email_data["message_id"],
+                        filename=attachment["filename"],
+                        job_category=upload.category,
+                        mailbox=email_data.get("mailbox") or email_service.mailbox
+                    ))
+        
+        # One report entry per distinct (mailbox, message_id, filename)
+        items = list({(item.mailbox, item.message_id, item.filename): item for item in items}.values())
+        results = [
+            {"message_id": item.message_id, "filename": item.filename, "success": False}
+            for item in items
+        ]
+        folders = {}
+        for index, item in enumerate(items):
+            folders.setdefault(item.mailbox, []).append(index)
+        
+        # IMAP fetches feed a bounded queue drained by concurrent S3 uploads
+        stage_started = time.perf_counter()
+        lookup_seconds = 0.0
+        queue = asyncio.Queue(maxsize=BULK_UPLOAD_WORKERS)
+        
+        async def upload_worker():
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                index, data = entry
+                upload_result = await asyncio.to_thread(
+                    s3_service.upload_attachment,
+                    bucket_name=S3_BUCKET_NAME,
+                    attachment_data=data,
+                    filename=results[index]["filename"],
+                    folder=S3_CV_FOLDER
+                )
+                if upload_result["success"]:
+                    results[index].update({
+                        "success": True,
+                        "s3_url": upload_result["s3_url"],
+                        "key": upload_result["key"],
+                        "size": upload_result["size"],
+                        "sha256": upload_result["sha256"],
+                        "deduplicated": upload_result["deduplicated"],
+                        "cv_file_path": s3_relative_path(upload_result)
+                    })
+                else:
+                    results[index]["error"] = upload_result["error"]
+        
+        workers = [asyncio.create_task(upload_worker()) for _ in range(BULK_UPLOAD_WORKERS)]
+        fetch_error = None
+        target_index = {}
+        try:
+            # Each folder's messages are resolved and fetched on a session of that folder
+            for mailbox, indexes in folders.items():
+                lookup_started = time.perf_counter()
+                folder_service = email_service if mailbox == email_service.mailbox else AsyncEmailService(
+                    upload.email, upload.password, pool=imap_pool, cache=message_cache, mailbox=mailbox
+                )
+                
+                if not await folder_service.connect():
+                    return JSONResponse(
+                        status_code=400,
+                        content={
+                            "success": False,
+                            "error": "Email connection failed",
+                            "message": "Failed to connect to email account"
+                        }
+                    )
+                
+                try:
+                    # Resolve Message-IDs and attachment structures with batched IMAP commands
+                    uids = await folder_service.find_message_uids([items[index].message_id for index in indexes])
+                    structures = await folder_service.get_attachments_by_uid(
+                        [uid for uid in uids.values() if uid is not None]
+                    )
+                    
+                    targets = []
+                    for index in indexes:
+                        item = items[index]
+                        uid = uids.get(item.message_id)
+                        if uid is None:
+                            results[index]["error"] = "Email not found"
+                            continue
+                        attachment = folder_service.find_attachment(structures.get(uid, []), item.filename)
+                        if attachment is None:
+                            results[index]["error"] = "Attachment not found"
+                            continue
+                        key = (mailbox, uid, attachment["part"])
+                        if key in target_index:
+                            results[index]["error"] = f"Same attachment as {items[target_index[key]].filename}"
+                            continue
+                        target_index[key] = index
+                        targets.append((uid, attachment))
+                    lookup_seconds += time.perf_counter() - lookup_started
+                    
+                    async for uid, attachment, data in folder_service.iter_attachments(targets):
+                        await queue.put((target_index[(mailbox, uid, attachment["part"])], data))
+                finally:
+                    await folder_service.disconnect()
+        except Exception as e:
+            fetch_error = str(e)
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        
+        # Anything never handed to a worker was cut off by the fetch error
+        for result in results:
+            if not result["success"] and "error" not in result:
+                result["error"] = f"Failed to fetch attachment: {fetch_error}"
+        timings["lookup_ms"] = round((stage_started - started + lookup_seconds) * 1000, 1)
+        timings["transfer_ms"] = round((time.perf_counter() - stage_started - lookup_seconds) * 1000, 1)
+        
+        # One insert_many for every file that reached S3
+        uploaded = [index for index, result in enumerate(results) if result["success"]]
+        if uploaded:
+            stage_started = time.perf_counter()
+            if mongodb_service is None:
+                database_errors = [f"Database configuration failed: {mongodb_error}"] * len(uploaded)
+                candidate_ids = [None] * len(uploaded)
+            elif not service_health.is_healthy("mongodb"):
+                database_errors = ["Failed to connect to database"] * len(uploaded)
+                candidate_ids = [None] * len(uploaded)
+            else:
+                db_result = await mongodb_service.create_expected_candidates([
+                    {
+                        "name": items[index].filename,
+                        "job_posting": items[index].job_category,
+                        "cv_file_path": results[index]["cv_file_path"],
+                        "sha256": results[index]["sha256"]
+                    }
+                    for index in uploaded
+                ])
+                database_errors, candidate_ids = db_result["errors"], db_result["candidate_ids"]
+                for index, duplicate in zip(uploaded, db_result["duplicates"]):
+                    results[index]["duplicate"] = duplicate
+            
+            for index, candidate_id, database_error in zip(uploaded, candidate_ids, database_errors):
+                if database_error is None:
+                    results[index]["database"] = {
+                        "candidate_id": candidate_id,
+                        "job_posting": items[index].job_category,
+                        "cv_file_path": results[index]["cv_file_path"]
+                    }
+                else:
+                    results[index]["database_error"] = database_error
+            timings["db_ms"] = round((time.perf_counter() - stage_started) * 1000, 1)
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        
+        failed = len(results) - len(uploaded)
+        return {
+            "success": failed == 0,
+            "message": f"Uploaded {len(uploaded)} of {len(results)} attachments",
+            "total": len(results),
+            "uploaded": len(uploaded),
+            "failed": failed,
+            "results": results,
+            "timings": timings
+        }
+
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={
+                "success": False,
+                "error": str(e),
+                "message": "An unexpected error occurred during bulk upload"
+            }
+        )
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -4,6 +4,7 @@ Contains all service modules for email processing and S3 uploads
 """
 
 from .email_service import EmailService
+from .async_email_service import AsyncEmailService
 from .s3_service import S3Service
 
-__all__ = ['EmailService', 'S3Service']
+__all__ = ['EmailService', 'AsyncEmailService', 'S3Service']
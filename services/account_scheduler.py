@@ -0,0 +1,193 @@
+"""
+Multi-account ingestion scheduler
+Keeps the message cache of several mailboxes in sync concurrently, taking turns fairly between accounts
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from .email_service import EmailService
+from .imap_pool import IMAPConnectionPool
+from .message_cache import MessageCache
+
+
+def load_accounts(path: str) -> Dict:
+    """
+    Read an accounts config file
+
+    The file is JSON: {"max_concurrency": 4, "accounts": [{"name": "emea", "email": "...",
+    "password_env": "EMEA_PASSWORD", "max_connections": 2}]}. A literal "password" is
+    accepted too, but password_env keeps secrets out of the file.
+
+    Returns:
+        Dict with max_concurrency (or None) and the account entries, passwords resolved
+    """
+    with open(path) as config_file:
+        config = json.load(config_file)
+
+    accounts = []
+    for index, entry in enumerate(config.get("accounts", [])):
+        password = entry.get("password")
+        if entry.get("password_env"):
+            password = os.getenv(entry["password_env"])
+        if not entry.get("email") or not password:
+            raise Exception(f"Account {entry.get('name') or index} in {path} needs an email and a password")
+        accounts.append({
+            "name": entry.get("name") or entry["email"],
+            "email": entry["email"],
+            "password": password,
+            "max_connections": entry.get("max_connections")
+        })
+    return {"max_concurrency": config.get("max_concurrency"), "accounts": accounts}
+
+
+class IngestionScheduler:
+    """
+    Syncs many accounts' caches with bounded concurrency and round-robin fairness
+
+    Each turn syncs at most batch_size new messages of one account; an account with more
+    waiting goes to the back of the queue, so a huge inbox takes turns with the small ones
+    instead of holding a worker until it is done.
+    """
+
+    def __init__(self, accounts: List[Dict], pool: IMAPConnectionPool, cache: MessageCache,
+                 max_concurrency: int = 4, batch_size: int = 200, interval: float = 60.0):
+        """
+        Initialize the scheduler
+
+        Args:
+            accounts: Entries as returned by load_accounts
+            pool: Shared IMAP pool; per-account max_connections become its account limits
+            cache: Message cache the accounts are synced into
+            max_concurrency: Accounts synced at the same time across all accounts
+            batch_size: New messages fetched per turn
+            interval: Seconds between background sync passes
+        """
+        self.accounts = {account["name"]: account for account in accounts}
+        self.pool = pool
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._pass_lock = asyncio.Lock()
+
+        self._stats = {}
+        for name, account in self.accounts.items():
+            if account.get("max_connections"):
+                pool.set_account_limit(account["email"], account["max_connections"])
+            self._stats[name] = {
+                "email": account["email"],
+                "synced_at": None,
+                "caught_up_at": None,
+                "pending": 0,
+                "fetched_total": 0,
+                "last_pass": None,
+                "error": None
+            }
+
+    @classmethod
+    def from_config(cls, path: str, pool: IMAPConnectionPool, cache: MessageCache, **kwargs) -> "IngestionScheduler":
+        """Build a scheduler from an accounts config file; the file's max_concurrency wins over kwargs"""
+        config = load_accounts(path)
+        if config["max_concurrency"]:
+            kwargs["max_concurrency"] = config["max_concurrency"]
+        return cls(config["accounts"], pool, cache, **kwargs)
+
+    def _sync_turn(self, name: str) -> Dict[str, int]:
+        """One turn for one account: incremental sync of up to batch_size new messages"""
+        account = self.accounts[name]
+        service = EmailService(account["email"], account["password"], pool=self.pool, cache=self.cache)
+        if not service.connect():
+            raise Exception(f"Failed to connect to {account['email']}")
+        try:
+            service.sync_cache(max_fetch=self.batch_size)
+            return service.last_sync
+        finally:
+            service.disconnect()
+
+    async def sync_all(self) -> Dict[str, Dict]:
+        """
+        Run one pass: sync every account until it has nothing pending
+
+        Returns:
+            Per-account results of the pass: messages fetched, turns, seconds spent and error
+        """
+        async with self._pass_lock:
+            ready = deque(self.accounts)
+            results = {name: {"fetched": 0, "turns": 0, "busy_seconds": 0.0, "error": None} for name in self.accounts}
+            started = time.perf_counter()
+
+            async def worker():
+                while ready:
+                    # Oldest waiting account first; one that still has work rejoins at the back
+                    name = ready.popleft()
+                    turn_started = time.perf_counter()
+                    try:
+                        last_sync = await asyncio.to_thread(self._sync_turn, name)
+                        error = None
+                    except Exception as e:
+                        last_sync, error = {"fetched": 0, "pending": 0}, str(e)
+
+                    result = results[name]
+                    result["fetched"] += last_sync["fetched"]
+                    result["turns"] += 1
+                    result["busy_seconds"] += time.perf_counter() - turn_started
+                    result["error"] = error
+
+                    stats = self._stats[name]
+                    stats["synced_at"] = time.time()
+                    stats["pending"] = last_sync["pending"]
+                    stats["fetched_total"] += last_sync["fetched"]
+                    stats["error"] = error
+                    if error is None and not last_sync["pending"]:
+                        stats["caught_up_at"] = stats["synced_at"]
+                    elif error is None:
+                        ready.append(name)
+
+            # Workers stop as soon as the queue is empty, even while others still finish a turn
+            await asyncio.gather(*(worker() for _ in range(min(self.max_concurrency, len(ready)))))
+
+            for name, result in results.items():
+                result["seconds"] = round(result.pop("busy_seconds"), 3)
+                self._stats[name]["last_pass"] = dict(result)
+            return {"seconds": round(time.perf_counter() - started, 3), "accounts": results}
+
+    def status(self) -> Dict[str, Dict]:
+        """Per-account lag (seconds since the account was last fully caught up) and throughput"""
+        now = time.time()
+        status = {}
+        for name, stats in self._stats.items():
+            last_pass = stats["last_pass"] or {}
+            seconds = last_pass.get("seconds") or 0.0
+            status[name] = {
+                **{key: value for key, value in stats.items() if key != "last_pass"},
+                "lag_seconds": round(now - stats["caught_up_at"], 1) if stats["caught_up_at"] else None,
+                "messages_per_second": round(last_pass.get("fetched", 0) / seconds, 1) if seconds else None,
+                "last_pass": last_pass or None
+            }
+        return status
+
+    async def _run(self):
+        while True:
+            await self.sync_all()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Sync in the background of the running event loop, one pass per interval"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel background syncing"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
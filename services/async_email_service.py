@@ -0,0 +1,109 @@
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .email_record import EmailRecord
+from .email_service import EmailService
+from .folder_sync import FolderSync
+from .imap_pool import IMAPConnectionPool
+
+
+class AsyncEmailService:
+    """
+    Asyncio twin of EmailService
+
+    Every blocking IMAP call runs in a worker thread so a slow mailbox never
+    stalls the event loop; results and errors are exactly those of EmailService.
+    """
+
+    def __init__(self, email_address: str, password: str, pool: Optional[IMAPConnectionPool] = None, **kwargs):
+        self.service = EmailService(email_address, password, pool=pool, **kwargs)
+
+    def __getattr__(self, name):
+        # Non-blocking helpers (categorize_emails, find_attachment, job_categories ...)
+        return getattr(self.service, name)
+
+    async def connect(self) -> bool:
+        """Connect to Gmail IMAP server"""
+        return await asyncio.to_thread(self.service.connect)
+
+    async def disconnect(self):
+        """Disconnect from the IMAP server or return the pooled session"""
+        await asyncio.to_thread(self.service.disconnect)
+
+    async def test_connection(self) -> bool:
+        """Test if we can actually connect and access emails"""
+        return await asyncio.to_thread(self.service.test_connection)
+
+    async def get_all_emails(self, limit: int = 50, listing_mode: bool = False) -> List[EmailRecord]:
+        """Get all emails from the inbox"""
+        return await asyncio.to_thread(self.service.get_all_emails, limit, listing_mode)
+
+    async def get_unread_emails(self, limit: int = 50, listing_mode: bool = False) -> List[EmailRecord]:
+        """Get only unread emails from the inbox"""
+        return await asyncio.to_thread(self.service.get_unread_emails, limit, listing_mode)
+
+    async def get_matching_emails(self, planner, limit: int = 50,
+                                  categories: Optional[List[str]] = None) -> List[EmailRecord]:
+        """Listing records of the newest messages matching a search plan"""
+        return await asyncio.to_thread(self.service.get_matching_emails, planner, limit, categories)
+
+    async def probe_mailbox_state(self) -> Dict[str, int]:
+        """Mailbox status in one STATUS command"""
+        return await asyncio.to_thread(self.service.probe_mailbox_state)
+
+    def folders(self, mailboxes: List[str]) -> FolderSync:
+        """A FolderSync over several folders of this account, sharing the pool and cache"""
+        return FolderSync(self.service.email_address, self.service.password, mailboxes,
+                          pool=self.service.pool, cache=self.service.cache)
+
+    async def get_folder_unread_emails(self, mailboxes: List[str], limit: int = 50) -> List[EmailRecord]:
+        """Unread listing records of several folders, synced in parallel and de-duplicated"""
+        return await asyncio.to_thread(self.folders(mailboxes).get_unread_emails, limit)
+
+    async def probe_folder_states(self, mailboxes: List[str]) -> Dict[str, Optional[Dict[str, int]]]:
+        """STATUS of several folders, one pooled session each"""
+        return await asyncio.to_thread(self.folders(mailboxes).probe_states)
+
+    async def get_attachments(self, email_message) -> List[Dict]:
+        """Extract attachment information from email"""
+        return await asyncio.to_thread(self.service.get_attachments, email_message)
+
+    async def find_message_uid(self, message_id: str) -> Optional[int]:
+        """Find the UID of a message by its Message-ID header"""
+        return await asyncio.to_thread(self.service.find_message_uid, message_id)
+
+    async def get_message_attachments(self, uid: int) -> List[Dict]:
+        """Describe the attachments of one message using only its BODYSTRUCTURE"""
+        return await asyncio.to_thread(self.service.get_message_attachments, uid)
+
+    async def find_message_uids(self, message_ids: List[str]) -> Dict[str, Optional[int]]:
+        """Resolve several Message-IDs on one connection"""
+        return await asyncio.to_thread(self.service.find_message_uids, message_ids)
+    
+    async def get_attachments_by_uid(self, uids: List[int]) -> Dict[int, List[Dict]]:
+        """Describe the attachments of many messages with batched BODYSTRUCTURE fetches"""
+        return await asyncio.to_thread(self.service.get_attachments_by_uid, uids)
+    
+    async def _iterate(self, items):
+        """Drive a blocking generator from the event loop, one step per worker-thread call"""
+        done = object()
+        try:
+            while True:
+                item = await asyncio.to_thread(next, items, done)
+                if item is done:
+                    break
+                yield item
+        finally:
+            items.close()
+    
+    def iter_emails(self, after_uid: int = 0, limit: int = 50) -> AsyncIterator[EmailRecord]:
+        """Page through the mailbox by UID, fetching each batch in a worker thread"""
+        return self._iterate(self.service.iter_emails(after_uid, limit))
+    
+    def iter_attachment_data(self, uid: int, attachment: Dict) -> AsyncIterator[bytes]:
+        """Stream one decoded attachment, fetching each chunk in a worker thread"""
+        return self._iterate(self.service.iter_attachment_data(uid, attachment))
+    
+    def iter_attachments(self, targets: List[Tuple[int, Dict]]) -> AsyncIterator[Tuple[int, Dict, bytes]]:
+        """Fetch and decode many attachments with batched part fetches"""
+        return self._iterate(self.service.iter_attachments(targets))
@@ -0,0 +1,67 @@
+"""
+Local blob index
+Maps attachment SHA-256 hashes to the S3 objects that already hold them
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class BlobIndex:
+    """SQLite-backed lookup of content hashes already stored in S3"""
+
+    def __init__(self, path: str = "blob_index.db"):
+        """
+        Open (or create) the index database
+
+        Args:
+            path: SQLite database file; ":memory:" keeps the index in process
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                bucket TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                key TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (bucket, sha256)
+            )
+        """)
+        self._db.commit()
+
+    def lookup(self, bucket: str, sha256: str) -> Optional[Dict]:
+        """Return the stored object for a hash, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT key, size FROM blobs WHERE bucket = ? AND sha256 = ?",
+                (bucket, sha256)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def record(self, bucket: str, sha256: str, key: str, size: int):
+        """Remember the object holding a hash; the first object recorded wins"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?)",
+                (bucket, sha256, key, size, time.time())
+            )
+            self._db.commit()
+
+    def forget(self, bucket: str, sha256: str):
+        """Drop a hash, e.g. after its object was deleted from the bucket"""
+        with self._lock:
+            self._db.execute("DELETE FROM blobs WHERE bucket = ? AND sha256 = ?", (bucket, sha256))
+            self._db.commit()
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._db.close()
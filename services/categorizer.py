@@ -0,0 +1,300 @@
+"""
+Job title categorizer
+Compiles every job title of every category into one regex and classifies emails in batches
+"""
+
+import math
+import re
+import time
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+UNCATEGORIZED = "Uncategorized"
+
+# End-of-keyword marker inside the trie
+_END = ""
+
+
+def _normalize_keyword(keyword: str) -> str:
+    """Lowercase and collapse whitespace so 'Prompt  Engineer' and 'prompt engineer' are one title"""
+    return " ".join(keyword.lower().split())
+
+
+def _trie_pattern(node: Dict) -> str:
+    """
+    Turn a character trie into a regex with shared prefixes factored out
+
+    'software engineer' and 'software architect' become 'software (?:architect|engineer)',
+    so the regex engine walks each subject once instead of trying every title in turn.
+    """
+    branches = []
+    for char, child in sorted((item for item in node.items() if item[0] != _END)):
+        # A space in a title matches any run of whitespace, but never the newline between batched subjects
+        atom = r"[^\S\n]+" if char == " " else re.escape(char)
+        branches.append(atom + _trie_pattern(child))
+
+    if not branches:
+        return ""
+    if len(branches) == 1 and _END not in node:
+        return branches[0]
+
+    group = "(?:" + "|".join(branches) + ")"
+    # Titles that end here are optional continuations; greedy matching prefers the longest title
+    return group + "?" if _END in node else group
+
+
+class _Engine:
+    """Immutable compiled form of one category configuration"""
+
+    def __init__(self, job_categories: Dict[str, List[str]]):
+        self.source = {category: list(keywords) for category, keywords in job_categories.items()}
+        self.category_order = {category: index for index, category in enumerate(self.source)}
+
+        # Normalized title -> categories listing it, in config order
+        self.keyword_categories: Dict[str, List[str]] = {}
+        for category, keywords in self.source.items():
+            for keyword in keywords:
+                normalized = _normalize_keyword(keyword)
+                if not normalized:
+                    continue
+                categories = self.keyword_categories.setdefault(normalized, [])
+                if category not in categories:
+                    categories.append(category)
+
+        trie: Dict = {}
+        for keyword in self.keyword_categories:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[_END] = True
+
+        if trie:
+            # Zero-width lookahead so titles nested in longer ones ('engineer' in 'software engineer') are found too;
+            # (?<!\w) and (?!\w) are the whole-word checks of the old per-keyword \b...\b patterns
+            self.pattern = re.compile(r"(?<!\w)(?=(" + _trie_pattern(trie) + r")(?!\w))")
+        else:
+            self.pattern = None
+
+    def keyword_score(self, keyword: str) -> float:
+        """Longer, multi-word titles are more specific than single words"""
+        return float(keyword.count(" ") + 1)
+
+
+class Categorizer:
+    """Classifies email subjects into job categories with one compiled multi-title pattern"""
+
+    def __init__(self, job_categories: Optional[Dict[str, List[str]]] = None):
+        """
+        Build the categorizer
+
+        Args:
+            job_categories: Mapping of category name to the job titles and aliases that identify it
+        """
+        self._engine = _Engine(job_categories or {})
+
+    @property
+    def job_categories(self) -> Dict[str, List[str]]:
+        """Category configuration the current engine was built from"""
+        return self._engine.source
+
+    def rebuild(self, job_categories: Dict[str, List[str]]):
+        """Compile a new configuration and swap it in; calls in flight keep using the old engine"""
+        # Built off to the side, then published with a single reference assignment
+        self._engine = _Engine(job_categories)
+
+    def update(self, job_categories: Dict[str, List[str]]) -> bool:
+        """Rebuild only if the configuration changed; returns True if it did"""
+        if job_categories == self._engine.source:
+            return False
+        self.rebuild(job_categories)
+        return True
+
+    def _scan(self, engine: _Engine, subjects: List[str]) -> List[List[Tuple[str, int]]]:
+        """Find (title, position) matches for every subject in a single regex pass"""
+        found: List[List[Tuple[str, int]]] = [[] for _ in subjects]
+        if engine.pattern is None or not subjects:
+            return found
+
+        # Join the batch with newlines (a word boundary) and map match offsets back to subjects
+        starts = []
+        offset = 0
+        texts = []
+        for subject in subjects:
+            # Lowercase per subject: lower() can change a string's length, which would skew the offsets
+            text = (subject or "").replace("\n", " ").lower()
+            starts.append(offset)
+            texts.append(text)
+            offset += len(text) + 1
+        haystack = "\n".join(texts)
+
+        for match in engine.pattern.finditer(haystack):
+            index = bisect_right(starts, match.start()) - 1
+            found[index].append((_normalize_keyword(match.group(1)), match.start() - starts[index]))
+        return found
+
+    def _matches_from(self, engine: _Engine, keywords: List[Tuple[str, int]]) -> List[Dict]:
+        matches = []
+        for keyword, position in keywords:
+            for category in engine.keyword_categories.get(keyword, []):
+                matches.append({
+                    "category": category,
+                    "keyword": keyword,
+                    "position": position,
+                    "score": engine.keyword_score(keyword)
+                })
+        return matches
+
+    def _best_category(self, engine: _Engine, keywords: List[Tuple[str, int]]) -> str:
+        scores: Dict[str, float] = {}
+        for keyword, _ in keywords:
+            score = engine.keyword_score(keyword)
+            for category in engine.keyword_categories.get(keyword, []):
+                scores[category] = scores.get(category, 0.0) + score
+        if not scores:
+            return UNCATEGORIZED
+        # Highest score wins; ties go to the category listed first in the config
+        return min(scores, key=lambda category: (-scores[category], engine.category_order[category]))
+
+    def match(self, subject: str) -> List[Dict]:
+        """Job titles found in a subject (the longest one at each position), with category, position and score"""
+        engine = self._engine
+        return self._matches_from(engine, self._scan(engine, [subject])[0])
+
+    def match_batch(self, subjects: List[str]) -> List[List[Dict]]:
+        """match() for a list of subjects in one pass"""
+        engine = self._engine
+        return [self._matches_from(engine, keywords) for keywords in self._scan(engine, subjects)]
+
+    def scores(self, subject: str) -> Dict[str, float]:
+        """Total score per matched category"""
+        scores: Dict[str, float] = {}
+        for match in self.match(subject):
+            scores[match["category"]] = scores.get(match["category"], 0.0) + match["score"]
+        return scores
+
+    def categorize(self, subject: str) -> str:
+        """Best category for a subject, or 'Uncategorized'"""
+        return self.categorize_batch([subject])[0]
+
+    def categorize_batch(self, subjects: List[str]) -> List[str]:
+        """Best category for each subject, computed in one pass over the batch"""
+        engine = self._engine
+        return [self._best_category(engine, keywords) for keywords in self._scan(engine, subjects)]
+
+
+class EmailClassifier:
+    """Scores whole emails across several fields with per-field weights, one batched pass per field"""
+
+    # Relative trust in each field; subjects are written for triage, previews and domains are noisier
+    DEFAULT_FIELD_WEIGHTS = {
+        "subject": 1.0,
+        "attachments": 0.8,
+        "body": 0.5,
+        "sender_domain": 0.3
+    }
+
+    # Best score an email needs before it leaves "Uncategorized"
+    MIN_SCORE = 0.5
+
+    # Classification time allowed per email; later fields are skipped once the batch runs over
+    TIME_BUDGET_MS = 1.0
+
+    # Characters of each field that are scanned
+    MAX_FIELD_CHARS = 500
+
+    def __init__(self, categorizer: Categorizer, field_weights: Optional[Dict[str, float]] = None,
+                 sender_domains: Optional[Dict[str, str]] = None, min_score: float = MIN_SCORE,
+                 time_budget_ms: float = TIME_BUDGET_MS):
+        """
+        Initialize the classifier
+
+        Args:
+            categorizer: Compiled job title matcher used for the text fields
+            field_weights: Weight per field; fields are evaluated in descending weight order
+            sender_domains: Optional mapping of sender domain to category, e.g. a recruiter's agency
+            min_score: Best score needed for a category to be assigned
+            time_budget_ms: Per-email time budget in milliseconds
+        """
+        self.categorizer = categorizer
+        self.field_weights = dict(field_weights or self.DEFAULT_FIELD_WEIGHTS)
+        self.sender_domains = {domain.lower(): category for domain, category in (sender_domains or {}).items()}
+        self.min_score = min_score
+        self.time_budget_ms = time_budget_ms
+
+    def _field_text(self, email_data: Dict, field: str) -> str:
+        if field == "subject":
+            text = email_data.get("subject") or ""
+        elif field == "body":
+            text = email_data.get("body") or ""
+        elif field == "attachments":
+            # 'prompt_engineer-cv.pdf' -> 'prompt engineer cv pdf' so titles match across separators
+            names = " ".join(attachment.get("filename") or "" for attachment in email_data.get("attachments") or [])
+            text = re.sub(r"[_\-.]+", " ", names)
+        else:
+            text = ""
+        return text[:self.MAX_FIELD_CHARS]
+
+    def _sender_domain(self, email_data: Dict) -> str:
+        match = re.search(r"@([\w.-]+)", email_data.get("sender") or "")
+        return match.group(1).lower().rstrip(".") if match else ""
+
+    def _domain_category(self, domain: str) -> Optional[str]:
+        # 'mail.agency.com' also matches a configured 'agency.com'
+        while domain:
+            if domain in self.sender_domains:
+                return self.sender_domains[domain]
+            domain = domain.partition(".")[2]
+        return None
+
+    def classify_batch(self, emails: List[Dict]) -> List[Dict]:
+        """
+        Classify a page of emails
+
+        Returns:
+            One dict per email with category, confidence (0-1), per-category scores and
+            partial=True if the time budget cut off lower-weight fields
+        """
+        deadline = time.perf_counter() + self.time_budget_ms * len(emails) / 1000.0
+        engine = self.categorizer._engine
+        scores: List[Dict[str, float]] = [{} for _ in emails]
+        partial = False
+
+        for field, weight in sorted(self.field_weights.items(), key=lambda item: -item[1]):
+            if weight <= 0:
+                continue
+            if time.perf_counter() > deadline:
+                partial = True
+                break
+
+            if field == "sender_domain":
+                for row, email_data in zip(scores, emails):
+                    category = self._domain_category(self._sender_domain(email_data))
+                    if category is not None:
+                        row[category] = row.get(category, 0.0) + weight
+                continue
+
+            # One regex pass over the whole column of this field
+            column = self.categorizer._scan(engine, [self._field_text(email_data, field) for email_data in emails])
+            for row, keywords in zip(scores, column):
+                for keyword, _ in keywords:
+                    score = weight * engine.keyword_score(keyword)
+                    for category in engine.keyword_categories.get(keyword, []):
+                        row[category] = row.get(category, 0.0) + score
+
+        results = []
+        for row in scores:
+            category, confidence = UNCATEGORIZED, 0.0
+            if row:
+                order = engine.category_order
+                best = min(row, key=lambda name: (-row[name], order.get(name, len(order))))
+                if row[best] >= self.min_score:
+                    category = best
+                    # Share of the evidence the winner holds, damped when that evidence is thin
+                    confidence = row[best] / sum(row.values()) * (1.0 - math.exp(-row[best]))
+            results.append({
+                "category": category,
+                "confidence": round(confidence, 2),
+                "scores": row,
+                "partial": partial
+            })
+        return results
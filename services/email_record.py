@@ -0,0 +1,188 @@
+"""
+Compact email records
+Slotted records with interned repeated strings and tuple-backed attachment metadata
+"""
+
+import sys
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Tuple
+
+FILE_ICONS = {
+    'pdf': '📄',
+    'doc': '📝', 'docx': '📝',
+    'xls': '📊', 'xlsx': '📊',
+    'ppt': '📽️', 'pptx': '📽️',
+    'txt': '📄',
+    'jpg': '🖼️', 'jpeg': '🖼️', 'png': '🖼️', 'gif': '🖼️',
+    'zip': '🗜️', 'rar': '🗜️', '7z': '🗜️',
+    'mp4': '🎥', 'avi': '🎥', 'mov': '🎥',
+    'mp3': '🎵', 'wav': '🎵',
+    'exe': '⚙️', 'msi': '⚙️',
+    'html': '🌐', 'htm': '🌐',
+    'css': '🎨', 'js': '📜'
+}
+
+
+def format_size(size_bytes: int) -> str:
+    """Format a byte count for display"""
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+    elif size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} KB"
+    else:
+        return f"{size_bytes / (1024 * 1024):.1f} MB"
+
+
+def file_icon(extension: str) -> str:
+    """Icon for a file extension"""
+    return FILE_ICONS.get(extension, '📎')
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Attachment(NamedTuple):
+    """Attachment metadata; display fields are derived on access instead of stored"""
+
+    filename: str
+    content_type: str
+    size: int
+    part: Optional[str] = None
+    encoding: Optional[str] = None
+
+    @property
+    def extension(self) -> str:
+        return self.filename.split('.')[-1].lower() if '.' in self.filename else 'file'
+
+    @property
+    def size_display(self) -> str:
+        return format_size(self.size)
+
+    @property
+    def icon(self) -> str:
+        return file_icon(self.extension)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Attachment":
+        return cls(
+            data["filename"],
+            _intern(data.get("content_type") or "application/octet-stream"),
+            data.get("size") or 0,
+            _intern(data.get("part")),
+            _intern(data.get("encoding"))
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "filename": self.filename,
+            "content_type": self.content_type,
+            "size": self.size,
+            "size_display": self.size_display,
+            "icon": self.icon,
+            "extension": self.extension
+        }
+        if self.part is not None:
+            data["part"] = self.part
+            data["encoding"] = self.encoding
+        return data
+
+
+class EmailRecord:
+    """
+    One listed email
+
+    Attribute access (templates) returns the compact values; mapping access
+    (record["subject"], record.get(...), dict(record), JSON encoding) returns
+    exactly what the plain dict records held, with attachments as dicts.
+    """
+
+    __slots__ = ("uid", "subject", "sender", "recipient", "date", "body", "message_id",
+                 "has_attachments", "attachments", "mailbox", "gm_msgid", "timestamp")
+
+    # Left out of the mapping view while unset, so records without them look as they always did
+    OPTIONAL_FIELDS = ("uid", "mailbox", "gm_msgid", "timestamp")
+
+    def __init__(self, uid: Optional[int], subject: str, sender: str, recipient: str, date: str,
+                 body: str, message_id: str, has_attachments: bool, attachments: Tuple[Attachment, ...] = (),
+                 mailbox: Optional[str] = None, gm_msgid: Optional[int] = None,
+                 timestamp: Optional[float] = None):
+        self.uid = uid
+        self.subject = subject
+        # The same senders, recipients and dates recur across a mailbox; keep one copy of each
+        self.sender = _intern(sender)
+        self.recipient = _intern(recipient)
+        self.date = _intern(date)
+        self.body = body
+        self.message_id = message_id
+        self.has_attachments = has_attachments
+        self.attachments = attachments
+        # Folder the record was listed from, and Gmail's message id shared by all its labels
+        self.mailbox = _intern(mailbox)
+        self.gm_msgid = gm_msgid
+        # UTC seconds since the epoch; date is formatted in the sender's timezone
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "EmailRecord":
+        """Build a record from a parse_email / parse_listing dict"""
+        return cls(
+            data.get("uid"),
+            data.get("subject", ""),
+            data.get("sender", ""),
+            data.get("recipient", ""),
+            data.get("date", ""),
+            data.get("body", ""),
+            data.get("message_id", ""),
+            bool(data.get("has_attachments")),
+            tuple(Attachment.from_dict(attachment) for attachment in data.get("attachments") or []),
+            data.get("mailbox"),
+            data.get("gm_msgid"),
+            data.get("timestamp")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The plain dict form, e.g. for json.dumps"""
+        return {key: self[key] for key in self.keys()}
+
+    def keys(self) -> Tuple[str, ...]:
+        return tuple(key for key in self.__slots__
+                     if key not in self.OPTIONAL_FIELDS or getattr(self, key) is not None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        if key == "attachments":
+            return [attachment.to_dict() for attachment in self.attachments]
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        if key == "attachments":
+            value = tuple(Attachment.from_dict(attachment) if isinstance(attachment, dict) else attachment
+                          for attachment in value)
+        setattr(self, key, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self.__slots__ else default
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, EmailRecord):
+            return all(getattr(self, key) == getattr(other, key) for key in self.__slots__)
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return self.__class__, tuple(getattr(self, key) for key in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"EmailRecord(uid={self.uid!r}, subject={self.subject!r})"
@@ -1,15 +1,78 @@
 import imaplib
 import email
+import hashlib
+import json
 from email.header import decode_header
-from datetime import datetime
-from typing import List, Dict
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
 import ssl
 import re
+from .imap_pool import IMAPConnectionPool
+from .message_cache import MessageCache
+from .categorizer import UNCATEGORIZED, Categorizer, EmailClassifier
+from .preview import extract_preview, preview_from_chunks
+from .email_record import EmailRecord, file_icon, format_size
+from .search_planner import SearchPlanner, imap_string
+from .imap_parser import (
+    TransferDecoder,
+    estimate_decoded_size,
+    format_uid_set,
+    parse_bodystructure,
+    parse_fetch_response,
+    parse_internaldate
+)
 
 class EmailService:
-    def __init__(self, email_address: str, password: str):
+    # Number of messages requested per FETCH round trip
+    DEFAULT_FETCH_BATCH_SIZE = 50
+    
+    # Headers and body prefix fetched in listing mode
+    LISTING_HEADER_FIELDS = "SUBJECT FROM TO DATE MESSAGE-ID"
+    PREVIEW_FETCH_BYTES = 2048
+    
+    # Visible characters kept in an email record's body preview
+    PREVIEW_CHARS = 200
+    
+    # Encoded bytes requested per partial FETCH when streaming an attachment
+    ATTACHMENT_CHUNK_BYTES = 1024 * 1024
+    
+    # Unread messages loaded into an empty cache on the first sync
+    CACHE_SEED_LIMIT = 500
+    
+    # Attachment bytes requested per batched FETCH in bulk uploads
+    BULK_FETCH_BYTES = 16 * 1024 * 1024
+    
+    # Compiled job title matcher shared by every instance; rebuilt when job_categories changes
+    categorizer = Categorizer()
+
+    def __init__(self, email_address: str, password: str, fetch_batch_size: int = DEFAULT_FETCH_BATCH_SIZE,
+                 pool: Optional[IMAPConnectionPool] = None, cache: Optional[MessageCache] = None,
+                 parser_pool=None, mailbox: str = "INBOX"):
         self.email_address = email_address
         self.password = password
+        self.fetch_batch_size = max(1, fetch_batch_size)
+        
+        # Optional shared pool of warm sessions; without it every connect() opens a new connection
+        self.pool = pool
+        self._session = None
+        
+        # Optional persistent cache of listing records, synced incrementally
+        self.cache = cache
+        
+        # Folder (Gmail label) every command works on; connect() selects it
+        self.mailbox = mailbox
+        
+        # Optional MimeParserPool that parses large listing and full-message batches in worker processes
+        self.parser_pool = parser_pool
+        
+        # Messages fetched by the most recent sync_cache, and new arrivals it left for the next call
+        self.last_sync = {"fetched": 0, "pending": 0}
+        
+        # Cursor state of the most recent iter_emails page
+        self.last_page = {"next_after_uid": 0, "has_more": False, "count": 0}
+        
+        # Round-trip statistics for the most recent batched fetch
+        self.last_fetch_stats = {"messages": 0, "round_trips": 0, "round_trips_saved": 0}
         
         # Gmail-only configuration
         self.imap_server = "imap.gmail.com"
@@ -29,35 +92,53 @@ class EmailService:
             ]
         }
         
+        # Sender domains (e.g. recruiting agencies) that hint at a category
+        self.sender_domain_categories = {}
+        
+    def _open_connection(self):
+        """Open a new authenticated IMAP connection with the service's mailbox selected"""
+        # Create SSL context with more permissive settings
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        
+        # Connect to Gmail IMAP server
+        mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port, ssl_context=context)
+        
+        # Login with credentials - this will raise an exception if authentication fails
+        try:
+            mail.login(self.email_address, self.password)
+        except imaplib.IMAP4.error as auth_error:
+            error_msg = str(auth_error)
+            if "Authentication failed" in error_msg or "Invalid credentials" in error_msg or "LOGIN failed" in error_msg:
+                raise Exception("Invalid Gmail credentials. Please check your email and password.")
+            else:
+                raise Exception(f"Gmail authentication failed: {error_msg}")
+        
+        # Select the mailbox and remember its UIDVALIDITY for UID-based lookups
+        status, _ = mail.select(imap_string(self.mailbox))
+        if status != "OK":
+            raise Exception(f"Mailbox {self.mailbox} not found")
+        typ, data = mail.response("UIDVALIDITY")
+        mail.selected_uidvalidity = int(data[0]) if data and data[0] else None
+        
+        # Test the connection by trying to get mailbox status
+        status, messages = mail.status(imap_string(self.mailbox), "(MESSAGES)")
+        if status != "OK":
+            raise Exception("Failed to access mailbox")
+        
+        return mail
+    
     def connect(self):
-        """Connect to Gmail IMAP server"""
+        """Connect to Gmail IMAP server, leasing a warm session when a pool is configured"""
         try:
-            
-            # Create SSL context with more permissive settings
-            context = ssl.create_default_context()
-            context.check_hostname = False
-            context.verify_mode = ssl.CERT_NONE
-            
-            # Connect to Gmail IMAP server
-            self.mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port, ssl_context=context)
-            
-            # Login with credentials - this will raise an exception if authentication fails
-            try:
-                self.mail.login(self.email_address, self.password)
-            except imaplib.IMAP4.error as auth_error:
-                error_msg = str(auth_error)
-                if "Authentication failed" in error_msg or "Invalid credentials" in error_msg or "LOGIN failed" in error_msg:
-                    raise Exception("Invalid Gmail credentials. Please check your email and password.")
-                else:
-                    raise Exception(f"Gmail authentication failed: {error_msg}")
-            
-            # Select INBOX
-            self.mail.select("INBOX")
-            
-            # Test the connection by trying to get mailbox status
-            status, messages = self.mail.status("INBOX", "(MESSAGES)")
-            if status != "OK":
-                raise Exception("Failed to access mailbox")
+            if self.pool is not None:
+                self._session = self.pool.acquire(
+                    self.email_address, self.password, self._open_connection, mailbox=self.mailbox
+                )
+                self.mail = self._session
+            else:
+                self.mail = self._open_connection()
             
             return True
                     
@@ -86,7 +167,12 @@ class EmailService:
                 raise Exception(f"Gmail connection failed: {error_msg}")
     
     def disconnect(self):
-        """Disconnect from the IMAP server"""
+        """Disconnect from the IMAP server, or hand a pooled session back to the pool"""
+        if self._session is not None:
+            session, self._session = self._session, None
+            self.pool.release(session)
+            return
+        
         try:
             self.mail.close()
             self.mail.logout()
@@ -109,14 +195,195 @@ class EmailService:
                 decoded_string += part
         return decoded_string
     
-    def get_all_emails(self, limit: int = 50) -> List[Dict]:
+    def fetch_messages(self, uids: List[bytes], items: str = "RFC822") -> Dict[int, Dict]:
+        """Fetch many messages per round trip and return their FETCH fields keyed by UID"""
+        results = {}
+        round_trips = 0
+        bytes_transferred = 0
+        
+        for start in range(0, len(uids), self.fetch_batch_size):
+            chunk = uids[start:start + self.fetch_batch_size]
+            
+            # One UID FETCH covers the whole chunk
+            status, msg_data = self.mail.uid("FETCH", format_uid_set(chunk), f"(UID {items})")
+            round_trips += 1
+            
+            if status != "OK":
+                continue
+            
+            for _, fields in parse_fetch_response(msg_data):
+                uid = fields.get("UID")
+                if uid is not None:
+                    results[int(uid)] = fields
+                    bytes_transferred += sum(len(value) for value in fields.values() if isinstance(value, bytes))
+        
+        self.last_fetch_stats = {
+            "messages": len(uids),
+            "round_trips": round_trips,
+            "round_trips_saved": max(len(uids) - round_trips, 0),
+            "bytes": bytes_transferred
+        }
+        return results
+    
+    def _fetch_and_parse(self, uids: List[bytes]) -> List[Dict]:
+        """Batch fetch full messages and parse them, newest first"""
+        fetched = self.fetch_messages(uids, "RFC822")
+        emails = []
+        
+        if self.parser_pool is not None:
+            # Hand the raw bytes to the worker processes
+            raw_uids = []
+            raw_messages = []
+            for uid in reversed(uids):
+                raw_message = (fetched.get(int(uid)) or {}).get("RFC822")
+                if isinstance(raw_message, bytes):
+                    raw_uids.append(int(uid))
+                    raw_messages.append(raw_message)
+            
+            for uid, email_data in zip(raw_uids, self.parser_pool.parse(raw_messages)):
+                if email_data is not None:
+                    email_data["uid"] = uid
+                    emails.append(email_data)
+            return emails
+        
+        for uid in reversed(uids):
+            # Drop each raw message once parsed so a batch of CVs isn't held twice
+            fields = fetched.pop(int(uid), None)
+            if not fields:
+                continue
+            try:
+                raw_message = fields.get("RFC822")
+                if not isinstance(raw_message, bytes):
+                    continue
+                
+                # Parse the email
+                email_message = email.message_from_bytes(raw_message)
+                
+                # Extract email details
+                email_data = self.parse_email(email_message)
+                email_data["uid"] = int(uid)
+                emails.append(email_data)
+                
+            except Exception as e:
+                continue
+        
+        return emails
+    
+    def _fetch_listing(self, uids: List[bytes], with_flags: bool = False) -> List[Dict]:
+        """Build email records from headers, BODYSTRUCTURE and a body prefix without downloading attachments"""
+        items = f"INTERNALDATE RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({self.LISTING_HEADER_FIELDS})]"
+        if with_flags:
+            items = "FLAGS " + items
+        if self.is_gmail():
+            # Gmail's message id is the same in every label, so folders can be merged without duplicates
+            items = "X-GM-MSGID " + items
+        fetched = self.fetch_messages(uids, items)
+        stats = dict(self.last_fetch_stats)
+        
+        # Work out which part carries the preview text for each message
+        structures = {}
+        preview_groups = {}
+        for uid, fields in fetched.items():
+            parts = parse_bodystructure(fields.get("BODYSTRUCTURE"))
+            structures[uid] = parts
+            text_part = self._find_text_part(parts)
+            if text_part:
+                preview_groups.setdefault(text_part["part"], []).append(str(uid).encode())
+        
+        # One batched partial fetch per distinct preview section
+        previews = {}
+        for section, section_uids in preview_groups.items():
+            partial = self.fetch_messages(section_uids, f"BODY.PEEK[{section}]<0.{self.PREVIEW_FETCH_BYTES}>")
+            for key in ("round_trips", "bytes"):
+                stats[key] += self.last_fetch_stats[key]
+            for uid, fields in partial.items():
+                previews[uid] = self._find_section(fields, section)
+        
+        stats["round_trips_saved"] = max(stats["messages"] - stats["round_trips"], 0)
+        self.last_fetch_stats = stats
+        
+        listing_uids = []
+        listing_fields = []
+        for uid in reversed(uids):
+            uid = int(uid)
+            if fetched.get(uid):
+                listing_uids.append(uid)
+                listing_fields.append((
+                    self._find_section(fetched[uid], "HEADER.FIELDS"), structures[uid], previews.get(uid, b"")
+                ))
+        
+        if self.parser_pool is not None:
+            # Header decoding dominates a listing; big batches go to the worker processes
+            records = self.parser_pool.parse_listings(listing_fields)
+        else:
+            records = []
+            for header_bytes, parts, preview in listing_fields:
+                try:
+                    records.append(self.parse_listing(header_bytes, parts, preview))
+                except Exception as e:
+                    records.append(None)
+        
+        emails = []
+        for uid, email_data in zip(listing_uids, records):
+            if email_data is None:
+                continue
+            fields = fetched[uid]
+            try:
+                email_data["uid"] = uid
+                if with_flags:
+                    email_data["flags"] = [str(flag) for flag in fields.get("FLAGS") or []]
+                if fields.get("X-GM-MSGID") is not None:
+                    email_data["gm_msgid"] = int(fields["X-GM-MSGID"])
+                if email_data["timestamp"] is None:
+                    # No usable Date header; fall back to when the server received the message
+                    email_data["timestamp"] = parse_internaldate(fields.get("INTERNALDATE"))
+                emails.append(email_data)
+            except Exception as e:
+                continue
+        
+        # Every listing fetch feeds the Message-ID index
+        uidvalidity = self.current_uidvalidity()
+        if self.cache is not None and uidvalidity:
+            self.cache.index_message_ids(
+                self.email_address.lower(), self.mailbox, uidvalidity,
+                [(email_data["message_id"], email_data["uid"]) for email_data in emails]
+            )
+        
+        return emails
+    
+    def current_uidvalidity(self) -> Optional[int]:
+        """UIDVALIDITY of the selected mailbox, as reported by SELECT"""
+        return getattr(self.mail, "selected_uidvalidity", None)
+    
+    def is_gmail(self) -> bool:
+        """Whether the server supports the Gmail IMAP extensions"""
+        return "X-GM-EXT-1" in getattr(self.mail, "capabilities", ())
+    
+    def _find_section(self, fields: Dict, section: str) -> bytes:
+        """Return the literal for a BODY[<section>] FETCH item"""
+        prefix = f"BODY[{section}"
+        for key, value in fields.items():
+            if key.startswith(prefix) and key[len(prefix):len(prefix) + 1] in ("]", " ") and isinstance(value, bytes):
+                return value
+        return b""
+    
+    def _find_text_part(self, parts: List[Dict]):
+        """Pick the part used for the body preview, preferring text/plain"""
+        inline_parts = [part for part in parts if part["disposition"] != "attachment"]
+        for content_type in ("text/plain", "text/html"):
+            for part in inline_parts:
+                if part["content_type"] == content_type:
+                    return part
+        return None
+    
+    def get_all_emails(self, limit: int = 50, listing_mode: bool = False) -> List[EmailRecord]:
         """Get all emails from the inbox"""
         if not self.connect():
             raise Exception("Failed to connect to Gmail. Please check your credentials.")
         
         try:
             # Search for all emails
-            status, messages = self.mail.search(None, "ALL")
+            status, messages = self.mail.uid("SEARCH", None, "ALL")
             
             if status != "OK":
                 raise Exception("Failed to search emails. Please check your Gmail settings.")
@@ -128,45 +395,37 @@ class EmailService:
                 return []
             
             email_ids = email_ids[-limit:] if len(email_ids) > limit else email_ids
-            emails = []
-            
-            for email_id in reversed(email_ids):
-                try:
-                    # Fetch the email
-                    status, msg_data = self.mail.fetch(email_id, "(RFC822)")
-                    
-                    if status != "OK":
-                        continue
-                    
-                    # Parse the email
-                    email_message = email.message_from_bytes(msg_data[0][1])
-                    
-                    # Extract email details
-                    email_data = self.parse_email(email_message)
-                    emails.append(email_data)
-                    
-                except Exception as e:
-                    continue
+            if listing_mode:
+                emails = self._fetch_listing(email_ids)
+            else:
+                emails = self._fetch_and_parse(email_ids)
             
             # Verify we actually got some emails
             if not emails:
                 return []
             
-            return emails
+            return [EmailRecord.from_dict(email_data) for email_data in emails]
             
         except Exception as e:
             raise e
         finally:
             self.disconnect()
     
-    def get_unread_emails(self, limit: int = 50) -> List[Dict]:
+    def get_unread_emails(self, limit: int = 50, listing_mode: bool = False) -> List[EmailRecord]:
         """Get only unread emails from the inbox"""
         if not self.connect():
             raise Exception("Failed to connect to Gmail. Please check your credentials.")
         
         try:
+            # Serve listings from the local cache after an incremental sync
+            if listing_mode and self.cache is not None:
+                mailbox_state = self.sync_cache()
+                return [EmailRecord.from_dict(row) for row in self.cache.get_unread(
+                    self.email_address.lower(), self.mailbox, mailbox_state["UIDVALIDITY"], limit
+                )]
+            
             # Search for unread emails using IMAP UNSEEN flag
-            status, messages = self.mail.search(None, "UNSEEN")
+            status, messages = self.mail.uid("SEARCH", None, "UNSEEN")
             
             if status != "OK":
                 raise Exception("Failed to search for unread emails. Please check your Gmail settings.")
@@ -178,37 +437,375 @@ class EmailService:
                 return []
             
             email_ids = email_ids[-limit:] if len(email_ids) > limit else email_ids
-            emails = []
-            
-            for email_id in reversed(email_ids):
-                try:
-                    # Fetch the email
-                    status, msg_data = self.mail.fetch(email_id, "(RFC822)")
-                    
-                    if status != "OK":
-                        continue
-                    
-                    # Parse the email
-                    email_message = email.message_from_bytes(msg_data[0][1])
-                    
-                    # Extract email details
-                    email_data = self.parse_email(email_message)
-                    emails.append(email_data)
-                    
-                except Exception as e:
-                    continue
+            if listing_mode:
+                emails = self._fetch_listing(email_ids)
+            else:
+                emails = self._fetch_and_parse(email_ids)
             
             # Verify we actually got some emails
             if not emails:
                 return []
             
-            return emails
+            return [EmailRecord.from_dict(email_data) for email_data in emails]
             
         except Exception as e:
             raise e
         finally:
             self.disconnect()
     
+    def get_mailbox_status(self) -> Dict[str, int]:
+        """Read UIDVALIDITY, UIDNEXT, message counts and (with CONDSTORE) HIGHESTMODSEQ"""
+        items = "MESSAGES UIDNEXT UIDVALIDITY UNSEEN"
+        if self.supports_condstore():
+            items += " HIGHESTMODSEQ"
+        
+        status, data = self.mail.status(imap_string(self.mailbox), f"({items})")
+        if status != "OK" or not data or not data[0]:
+            raise Exception("Failed to read mailbox status")
+        
+        values = re.findall(rb'([A-Z]+) (\d+)', data[0].upper())
+        return {name.decode(): int(value) for name, value in values}
+    
+    def probe_mailbox_state(self) -> Dict[str, int]:
+        """Mailbox status in one STATUS command on a (pooled) session, e.g. to validate cached responses"""
+        if not self.connect():
+            raise Exception("Failed to connect to Gmail. Please check your credentials.")
+        try:
+            return self.get_mailbox_status()
+        finally:
+            self.disconnect()
+    
+    def category_version(self) -> str:
+        """Short hash of the category configuration; changes whenever classification could"""
+        config = json.dumps([self.job_categories, self.sender_domain_categories], sort_keys=True)
+        return hashlib.sha256(config.encode()).hexdigest()[:16]
+    
+    def supports_condstore(self) -> bool:
+        """Whether the server advertises CONDSTORE"""
+        return "CONDSTORE" in getattr(self.mail, "capabilities", ())
+    
+    def _search_uids(self, *criteria) -> List[int]:
+        """Run UID SEARCH and return the matching UIDs; a trailing bytes criterion goes as a literal"""
+        if criteria and isinstance(criteria[-1], bytes):
+            # imaplib sends its literal after the other arguments; a pooled session resends it on retry
+            self.mail.literal = criteria[-1]
+            criteria = criteria[:-1]
+        status, messages = self.mail.uid("SEARCH", None, *criteria)
+        if status != "OK":
+            raise Exception("Failed to search emails. Please check your Gmail settings.")
+        return [int(uid) for uid in (messages[0] or b"").split()]
+    
+    def search_planner(self, **options) -> SearchPlanner:
+        """A SearchPlanner over this service's job categories; options as for SearchPlanner"""
+        return SearchPlanner(self.job_categories, **options)
+    
+    def run_search_plan(self, planner: SearchPlanner, per_category: bool = False,
+                        categories: Optional[List[str]] = None) -> Dict[Optional[str], List[int]]:
+        """
+        Run a search plan on the selected mailbox: X-GM-RAW on Gmail, plain SEARCH elsewhere
+        
+        Returns:
+            Matching UIDs keyed by category, or by None for the combined query
+        """
+        gmail = self.is_gmail()
+        results = {}
+        for name, plan in planner.plans(gmail, per_category, categories).items():
+            if not gmail:
+                results[name] = sorted({uid for criteria in plan for uid in self._search_uids(*criteria)})
+                continue
+            if plan.isascii():
+                results[name] = self._search_uids("X-GM-RAW", imap_string(plan))
+            else:
+                # Non-ASCII titles go as a UTF-8 literal
+                results[name] = self._search_uids("CHARSET", "UTF-8", "X-GM-RAW", plan.encode("utf-8"))
+        return results
+    
+    def get_matching_emails(self, planner: SearchPlanner, limit: int = 50,
+                            categories: Optional[List[str]] = None) -> List[EmailRecord]:
+        """
+        Listing records of the newest messages matching a plan, fetching only those UIDs
+        
+        Args:
+            planner: Filter to run on the server
+            limit: Maximum number of records
+            categories: Restrict the search to these categories' job titles
+        """
+        if not self.connect():
+            raise Exception("Failed to connect to Gmail. Please check your credentials.")
+        
+        try:
+            uids = sorted({uid for matches in self.run_search_plan(planner, categories=categories).values()
+                           for uid in matches})
+            if not uids:
+                return []
+            emails = self._fetch_listing([str(uid).encode() for uid in uids[-limit:]])
+            return [EmailRecord.from_dict(email_data) for email_data in emails]
+        finally:
+            self.disconnect()
+    
+    def _cache_listing(self, uids: List[int], uidvalidity: int):
+        """Fetch listing records with flags and store them in the cache"""
+        if not uids:
+            return
+        records = self._fetch_listing([str(uid).encode() for uid in sorted(uids)], with_flags=True)
+        entries = []
+        for record in records:
+            flags = record.pop("flags", [])
+            entries.append((record["uid"], flags, record))
+        self.cache.store_records(self.email_address.lower(), self.mailbox, uidvalidity, entries)
+    
+    def sync_cache(self, max_fetch: Optional[int] = None) -> Dict[str, int]:
+        """
+        Bring the local cache up to date with the selected mailbox
+        
+        With CONDSTORE an unchanged mailbox costs a single STATUS; without it,
+        STATUS can't show a message being read or marked unread, so the UNSEEN
+        set is searched on every call. Only UIDs at or above the last UIDNEXT
+        are fetched, flag changes are pulled with CHANGEDSINCE when the server
+        supports CONDSTORE, and a UIDVALIDITY change discards the whole cache.
+        
+        Args:
+            max_fetch: Fetch at most this many new arrivals, oldest first; the rest are
+                left for the next call (see last_sync["pending"])
+        
+        Returns:
+            The mailbox status the cache is now in sync with
+        """
+        account = self.email_address.lower()
+        mailbox_state = self.get_mailbox_status()
+        uidvalidity = mailbox_state["UIDVALIDITY"]
+        modseq = mailbox_state.get("HIGHESTMODSEQ")
+        
+        state = self.cache.get_state(account, self.mailbox)
+        if state and state["uidvalidity"] != uidvalidity:
+            # UIDs were renumbered, nothing cached is trustworthy any more
+            self.cache.invalidate(account, self.mailbox)
+            state = None
+        
+        self.last_sync = {"fetched": 0, "pending": 0}
+        if state and modseq is not None and state["highestmodseq"] == modseq \
+                and state["uidnext"] == mailbox_state["UIDNEXT"] \
+                and state["messages"] == mailbox_state["MESSAGES"]:
+            return mailbox_state
+        
+        # Where the cache stands once this call returns; short of the mailbox if max_fetch cut it off
+        synced_uidnext = mailbox_state["UIDNEXT"]
+        synced_messages = mailbox_state["MESSAGES"]
+        
+        if state is None:
+            # First sync: seed with the most recent unread messages
+            unread_uids = self._search_uids("UNSEEN")[-self.CACHE_SEED_LIMIT:]
+            self._cache_listing(unread_uids, uidvalidity)
+            self.last_sync["fetched"] += len(unread_uids)
+        else:
+            # New arrivals since the last sync
+            new_uids = []
+            if mailbox_state["UIDNEXT"] != state["uidnext"]:
+                new_uids = [uid for uid in self._search_uids("UID", f"{state['uidnext']}:*") if uid >= state["uidnext"]]
+            if max_fetch is not None and len(new_uids) > max_fetch:
+                self.last_sync["pending"] = len(new_uids) - max_fetch
+                new_uids = new_uids[:max_fetch]
+                synced_uidnext = new_uids[-1] + 1 if new_uids else state["uidnext"]
+                synced_messages = state["messages"] + len(new_uids)
+            self._cache_listing(new_uids, uidvalidity)
+            self.last_sync["fetched"] += len(new_uids)
+            
+            cached = set(self.cache.cached_uids(account, self.mailbox, uidvalidity))
+            
+            if modseq is not None and state["highestmodseq"]:
+                # Flag changes since the last sync (CONDSTORE)
+                status, data = self.mail.uid(
+                    "FETCH", "1:*", "(UID FLAGS)", f"(CHANGEDSINCE {state['highestmodseq']})"
+                )
+                changed = {}
+                if status == "OK":
+                    for _, fields in parse_fetch_response(data):
+                        if fields.get("UID") is not None:
+                            changed[int(fields["UID"])] = [str(flag) for flag in fields.get("FLAGS") or []]
+                self.cache.update_flags(account, self.mailbox, uidvalidity, changed)
+                
+                # Older messages marked unread again are not cached yet; arrivals left pending are not older
+                missing = [uid for uid, flags in changed.items()
+                           if uid < synced_uidnext and uid not in cached and "\\Seen" not in flags]
+                self._cache_listing(missing, uidvalidity)
+                self.last_sync["fetched"] += len(missing)
+            else:
+                # Without CONDSTORE the UNSEEN set is the source of truth
+                unread_uids = set(self._search_uids("UNSEEN"))
+                self.cache.update_flags(account, self.mailbox, uidvalidity, {
+                    uid: [] if uid in unread_uids else ["\\Seen"] for uid in cached
+                })
+                missing = sorted(uid for uid in unread_uids - cached if uid < synced_uidnext)[-self.CACHE_SEED_LIMIT:]
+                self._cache_listing(missing, uidvalidity)
+                self.last_sync["fetched"] += len(missing)
+            
+            # Fewer messages than expected means something was expunged
+            if synced_messages < state["messages"] + len(new_uids) and cached:
+                remaining = set(self._search_uids("UID", format_uid_set(cached)))
+                self.cache.delete_uids(account, self.mailbox, uidvalidity, cached - remaining)
+        
+        self.cache.save_state(account, self.mailbox, uidvalidity, synced_uidnext, modseq, synced_messages)
+        return mailbox_state
+    
+    def iter_emails(self, after_uid: int = 0, limit: int = 50) -> Iterator[EmailRecord]:
+        """
+        Page through the mailbox by UID, oldest first, yielding listing records one FETCH batch at a time
+        
+        Args:
+            after_uid: Cursor; only messages with a higher UID are returned
+            limit: Maximum records in this page
+        
+        last_page holds the cursor for the next page once the first record is yielded.
+        """
+        if not self.connect():
+            raise Exception("Failed to connect to Gmail. Please check your credentials.")
+        
+        try:
+            # "n:*" always matches the newest message, even when its UID is below n
+            uids = [uid for uid in self._search_uids("UID", f"{after_uid + 1}:*") if uid > after_uid]
+            page = uids[:limit]
+            self.last_page = {
+                "next_after_uid": page[-1] if page else after_uid,
+                "has_more": len(uids) > len(page),
+                "count": len(page)
+            }
+            
+            for start in range(0, len(page), self.fetch_batch_size):
+                batch = [str(uid).encode() for uid in page[start:start + self.fetch_batch_size]]
+                for email_data in sorted(self._fetch_listing(batch), key=lambda row: row["uid"]):
+                    yield EmailRecord.from_dict(email_data)
+        finally:
+            self.disconnect()
+    
+    def find_message_uid(self, message_id: str) -> Optional[int]:
+        """Find the UID of a message by its Message-ID header, using the local index when possible"""
+        account = self.email_address.lower()
+        uidvalidity = self.current_uidvalidity()
+        
+        if self.cache is not None and uidvalidity:
+            uid = self.cache.lookup_message_id(account, self.mailbox, message_id, uidvalidity)
+            if uid is not None:
+                return uid
+        
+        escaped = message_id.replace('\\', '\\\\').replace('"', '\\"')
+        if self.is_gmail():
+            # Gmail resolves rfc822msgid: from its own index instead of scanning headers
+            criteria = ("X-GM-RAW", f'"rfc822msgid:{escaped.strip("<>")}"')
+        else:
+            criteria = ("HEADER", "Message-ID", f'"{escaped}"')
+        
+        uids = self._search_uids(*criteria)
+        if not uids:
+            return None
+        
+        if self.cache is not None and uidvalidity:
+            self.cache.index_message_ids(account, self.mailbox, uidvalidity, [(message_id, uids[0])])
+        return uids[0]
+    
+    def get_message_attachments(self, uid: int) -> List[Dict]:
+        """Describe the attachments of one message using only its BODYSTRUCTURE"""
+        fetched = self.fetch_messages([str(uid).encode()], "BODYSTRUCTURE")
+        fields = fetched.get(int(uid))
+        if not fields:
+            raise Exception("Failed to fetch email structure")
+        return self.get_listing_attachments(parse_bodystructure(fields.get("BODYSTRUCTURE")))
+    
+    def find_message_uids(self, message_ids: List[str]) -> Dict[str, Optional[int]]:
+        """Resolve several Message-IDs on one connection"""
+        return {message_id: self.find_message_uid(message_id) for message_id in dict.fromkeys(message_ids)}
+    
+    def fetch_listing(self, uids: List[int]) -> List[Dict]:
+        """Listing records for the given UIDs on the open connection, oldest first"""
+        records = self._fetch_listing([str(uid).encode() for uid in sorted(uids)])
+        return sorted(records, key=lambda record: record["uid"])
+    
+    def get_attachments_by_uid(self, uids: List[int]) -> Dict[int, List[Dict]]:
+        """Describe the attachments of many messages with batched BODYSTRUCTURE fetches"""
+        fetched = self.fetch_messages([str(uid).encode() for uid in dict.fromkeys(uids)], "BODYSTRUCTURE")
+        return {
+            uid: self.get_listing_attachments(parse_bodystructure(fields.get("BODYSTRUCTURE")))
+            for uid, fields in fetched.items()
+        }
+    
+    def iter_attachments(self, targets: List[Tuple[int, Dict]]) -> Iterator[Tuple[int, Dict, bytes]]:
+        """
+        Fetch and decode many attachments with as few round trips as possible
+        
+        Attachments stored at the same MIME part number are fetched together with one
+        UID FETCH per BULK_FETCH_BYTES; larger ones are streamed on their own.
+        
+        Yields:
+            (uid, attachment, decoded bytes) in fetch order
+        """
+        groups: Dict[str, List[Tuple[int, Dict]]] = {}
+        for uid, attachment in targets:
+            if attachment["size"] > self.BULK_FETCH_BYTES:
+                yield uid, attachment, b"".join(self.iter_attachment_data(uid, attachment))
+            else:
+                groups.setdefault(attachment["part"], []).append((uid, attachment))
+        
+        for section, members in groups.items():
+            batch: List[Tuple[int, Dict]] = []
+            batch_bytes = 0
+            for position, member in enumerate(members):
+                batch.append(member)
+                batch_bytes += member[1]["size"]
+                if batch_bytes < self.BULK_FETCH_BYTES and position < len(members) - 1:
+                    continue
+                
+                fetched = self.fetch_messages([str(uid).encode() for uid, _ in batch], f"BODY.PEEK[{section}]")
+                for uid, attachment in batch:
+                    fields = fetched.get(uid)
+                    if not fields:
+                        raise Exception(f"Failed to fetch attachment {attachment['filename']}")
+                    decoder = TransferDecoder(attachment.get("encoding", "7bit"))
+                    yield uid, attachment, decoder.decode(self._find_section(fields, section)) + decoder.flush()
+                batch, batch_bytes = [], 0
+    
+    def find_attachment(self, attachments: List[Dict], filename: str) -> Optional[Dict]:
+        """Match a requested filename against an attachment list"""
+        for attachment in attachments:
+            # Try exact match first
+            if attachment["filename"] == filename:
+                return attachment
+            # Try URL decoded match
+            elif attachment["filename"] == filename.replace('%20', ' '):
+                return attachment
+            # Try case insensitive match
+            elif attachment["filename"].lower() == filename.lower():
+                return attachment
+        return None
+    
+    def iter_attachment_data(self, uid: int, attachment: Dict) -> Iterator[bytes]:
+        """Stream one decoded attachment by fetching only its MIME part in partial chunks"""
+        decoder = TransferDecoder(attachment.get("encoding", "7bit"))
+        section = attachment["part"]
+        offset = 0
+        
+        while True:
+            status, msg_data = self.mail.uid(
+                "FETCH", str(uid), f"(BODY.PEEK[{section}]<{offset}.{self.ATTACHMENT_CHUNK_BYTES}>)"
+            )
+            if status != "OK":
+                raise Exception("Failed to fetch attachment data")
+            
+            chunk = b""
+            for _, fields in parse_fetch_response(msg_data):
+                chunk = self._find_section(fields, section) or chunk
+            
+            decoded = decoder.decode(chunk)
+            if decoded:
+                yield decoded
+            
+            # A short read means the end of the part was reached
+            if len(chunk) < self.ATTACHMENT_CHUNK_BYTES:
+                break
+            offset += len(chunk)
+        
+        remainder = decoder.flush()
+        if remainder:
+            yield remainder
+    
     def test_connection(self) -> bool:
         """Test if we can actually connect and access emails"""
         try:
@@ -245,14 +842,17 @@ class EmailService:
         
         # Get date
         date_str = email_message.get("Date", "")
+        timestamp = None
         try:
             date_obj = email.utils.parsedate_to_datetime(date_str)
             formatted_date = date_obj.strftime("%Y-%m-%d %H:%M:%S")
+            # The formatted date is in the sender's timezone; the timestamp orders mail across senders
+            timestamp = (date_obj if date_obj.tzinfo else date_obj.replace(tzinfo=timezone.utc)).timestamp()
         except:
             formatted_date = date_str
         
-        # Get email body
-        body = self.get_email_body(email_message)
+        # Get a body preview; one extra character tells whether it was cut short
+        body = extract_preview(email_message, self.PREVIEW_CHARS + 1)
         
         # Get email ID
         message_id = email_message.get("Message-ID", "")
@@ -265,38 +865,63 @@ class EmailService:
             "sender": sender,
             "recipient": recipient,
             "date": formatted_date,
-            "body": body[:200] + "..." if len(body) > 200 else body,
+            "body": body[:self.PREVIEW_CHARS] + "..." if len(body) > self.PREVIEW_CHARS else body,
             "message_id": message_id,
             "has_attachments": self.has_attachments(email_message),
-            "attachments": attachments
+            "attachments": attachments,
+            "timestamp": timestamp
         }
     
-    def get_email_body(self, email_message) -> str:
-        """Extract email body text"""
-        body = ""
+    def parse_listing(self, header_bytes: bytes, parts: List[Dict], preview: bytes) -> Dict:
+        """Build an email record from listing-mode FETCH data"""
+        header_message = email.message_from_bytes(header_bytes)
         
-        if email_message.is_multipart():
-            for part in email_message.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition"))
-                
-                if content_type == "text/plain" and "attachment" not in content_disposition:
-                    try:
-                        body += part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                    except:
-                        pass
-                elif content_type == "text/html" and "attachment" not in content_disposition and not body:
-                    try:
-                        body += part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                    except:
-                        pass
-        else:
-            try:
-                body = email_message.get_payload(decode=True).decode('utf-8', errors='ignore')
-            except:
-                pass
+        # Reuse the regular header handling; the header-only message has no body or parts
+        email_data = self.parse_email(header_message)
         
-        return body.strip()
+        # Body preview from the partially fetched text part
+        text_part = self._find_text_part(parts)
+        body = ""
+        if text_part:
+            body = preview_from_chunks(
+                [preview], text_part["encoding"], text_part["charset"],
+                text_part["content_type"], self.PREVIEW_CHARS + 1
+            )
+        email_data["body"] = body[:self.PREVIEW_CHARS] + "..." if len(body) > self.PREVIEW_CHARS else body
+        
+        # Attachment names and sizes straight from BODYSTRUCTURE
+        email_data["has_attachments"] = any(part["disposition"] == "attachment" for part in parts)
+        email_data["attachments"] = self.get_listing_attachments(parts)
+        return email_data
+    
+    def get_listing_attachments(self, parts: List[Dict]) -> List[Dict]:
+        """Describe attachments from BODYSTRUCTURE parts without their payloads"""
+        attachments = []
+        for part in parts:
+            if part["disposition"] != "attachment" or not part["filename"]:
+                continue
+            
+            filename = self.decode_mime_words(part["filename"])
+            size_bytes = estimate_decoded_size(part["size"], part["encoding"])
+            if not size_bytes:
+                continue
+            
+            file_extension = filename.split('.')[-1].lower() if '.' in filename else 'file'
+            attachments.append({
+                "filename": filename,
+                "content_type": part["content_type"],
+                "size": size_bytes,
+                "size_display": self.format_size(size_bytes),
+                "icon": self.get_file_icon(file_extension),
+                "extension": file_extension,
+                "part": part["part"],
+                "encoding": part["encoding"]
+            })
+        return attachments
+    
+    def format_size(self, size_bytes: int) -> str:
+        """Format a byte count for display"""
+        return format_size(size_bytes)
     
     def has_attachments(self, email_message) -> bool:
         """Check if email has attachments"""
@@ -307,84 +932,91 @@ class EmailService:
                     return True
         return False
     
+    def _numbered_parts(self, part, number: str = "") -> Iterator[Tuple[str, object]]:
+        """Leaf parts with their IMAP section numbers, numbered the way BODYSTRUCTURE numbers them"""
+        # An attached message is one leaf, as in BODYSTRUCTURE; its own parts aren't listed
+        if part.is_multipart() and part.get_content_type() != "message/rfc822":
+            for index, child in enumerate(part.get_payload(), 1):
+                yield from self._numbered_parts(child, f"{number}.{index}" if number else str(index))
+        else:
+            yield number or "1", part
+    
+    def _estimated_part_size(self, part, encoding: str) -> int:
+        """Decoded size of a part from its encoded payload or Content-Length, without decoding it"""
+        content_length = str(part.get("Content-Length", "")).strip()
+        if content_length.isdigit():
+            return int(content_length)
+        
+        payload = part.get_payload()
+        if not isinstance(payload, str):
+            # An attached message: its serialized size
+            return len(payload[0].as_bytes()) if payload else 0
+        if encoding == "base64":
+            # Every 4 base64 characters carry 3 bytes; line breaks and padding carry none
+            characters = len(payload) - payload.count("\n") - payload.count("\r") - payload.count(" ")
+            padding = len(payload.rstrip()) - len(payload.rstrip().rstrip("="))
+            return max(characters * 3 // 4 - padding, 0)
+        return estimate_decoded_size(len(payload), encoding)
+    
     def get_attachments(self, email_message) -> List[Dict]:
-        """Extract attachment information from email"""
+        """
+        Describe attachments without decoding their payloads
+        
+        Returns:
+            List of dicts with filename, content_type, estimated size, size_display, icon,
+            extension, part (IMAP section number) and encoding; the payload is fetched by
+            part only when a download or upload asks for it
+        """
         attachments = []
-        if email_message.is_multipart():
-            for part in email_message.walk():
-                content_disposition = str(part.get("Content-Disposition"))
-                if "attachment" in content_disposition:
-                    # Get filename
-                    filename = part.get_filename()
-                    if filename:
-                        # Decode filename if it's encoded
-                        filename = self.decode_mime_words(filename)
-                        
-                        # Get content type
-                        content_type = part.get_content_type()
-                        
-                        # Get attachment data
-                        attachment_data = part.get_payload(decode=True)
-                        
-                        if attachment_data:
-                            # Format file size for display
-                            size_bytes = len(attachment_data)
-                            if size_bytes < 1024:
-                                size_display = f"{size_bytes} B"
-                            elif size_bytes < 1024 * 1024:
-                                size_display = f"{size_bytes / 1024:.1f} KB"
-                            else:
-                                size_display = f"{size_bytes / (1024 * 1024):.1f} MB"
-                            
-                            # Get file extension for icon
-                            file_extension = filename.split('.')[-1].lower() if '.' in filename else 'file'
-                            icon = self.get_file_icon(file_extension)
-                            
-                            attachments.append({
-                                "filename": filename,
-                                "content_type": content_type,
-                                "size": size_bytes,
-                                "size_display": size_display,
-                                "data": attachment_data,
-                                "icon": icon,
-                                "extension": file_extension
-                            })
+        for number, part in self._numbered_parts(email_message):
+            content_disposition = str(part.get("Content-Disposition"))
+            if "attachment" not in content_disposition:
+                continue
+            
+            # Get filename
+            filename = part.get_filename()
+            if not filename:
+                continue
+            
+            # Decode filename if it's encoded
+            filename = self.decode_mime_words(filename)
+            encoding = str(part.get("Content-Transfer-Encoding", "7bit")).strip().lower()
+            
+            size_bytes = self._estimated_part_size(part, encoding)
+            if not size_bytes:
+                continue
+            
+            # Get file extension for icon
+            file_extension = filename.split('.')[-1].lower() if '.' in filename else 'file'
+            attachments.append({
+                "filename": filename,
+                "content_type": part.get_content_type(),
+                "size": size_bytes,
+                "size_display": self.format_size(size_bytes),
+                "icon": self.get_file_icon(file_extension),
+                "extension": file_extension,
+                "part": number,
+                "encoding": encoding
+            })
         return attachments
     
     def get_file_icon(self, extension: str) -> str:
         """Get appropriate icon for file extension"""
-        icon_map = {
-            'pdf': '📄',
-            'doc': '📝', 'docx': '📝',
-            'xls': '📊', 'xlsx': '📊',
-            'ppt': '📽️', 'pptx': '📽️',
-            'txt': '📄',
-            'jpg': '🖼️', 'jpeg': '🖼️', 'png': '🖼️', 'gif': '🖼️',
-            'zip': '🗜️', 'rar': '🗜️', '7z': '🗜️',
-            'mp4': '🎥', 'avi': '🎥', 'mov': '🎥',
-            'mp3': '🎵', 'wav': '🎵',
-            'exe': '⚙️', 'msi': '⚙️',
-            'html': '🌐', 'htm': '🌐',
-            'css': '🎨', 'js': '📜'
-        }
-        return icon_map.get(extension, '📎')
+        return file_icon(extension)
     
     def categorize_email_by_subject(self, subject: str) -> str:
         """Categorize email based on job title keywords in the subject"""
         if not subject:
-            return "Uncategorized"
+            return UNCATEGORIZED
         
-        subject_lower = subject.lower()
-        
-        # Check each job category for matching keywords
-        for category, keywords in self.job_categories.items():
-            for keyword in keywords:
-                # Use word boundary regex to match whole words only
-                pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-                if re.search(pattern, subject_lower):
-                    return category
-        
-        return "Uncategorized"
+        self.categorizer.update(self.job_categories)
+        return self.categorizer.categorize(subject)
+    
+    def classify_emails(self, emails: List[Dict]) -> List[Dict]:
+        """Score each email across subject, preview, attachment names and sender domain"""
+        self.categorizer.update(self.job_categories)
+        classifier = EmailClassifier(self.categorizer, sender_domains=self.sender_domain_categories)
+        return classifier.classify_batch(emails)
     
     def categorize_emails(self, emails: List[Dict]) -> Dict[str, List[Dict]]:
         """Categorize a list of emails by job titles"""
@@ -393,11 +1025,10 @@ class EmailService:
         # Initialize categories
         for category in self.job_categories.keys():
             categorized[category] = []
-        categorized["Uncategorized"] = []
+        categorized[UNCATEGORIZED] = []
         
-        # Categorize each email
-        for email_data in emails:
-            category = self.categorize_email_by_subject(email_data.get("subject", ""))
-            categorized[category].append(email_data)
+        # Classify the whole page at once
+        for email_data, result in zip(emails, self.classify_emails(emails)):
+            categorized.setdefault(result["category"], []).append(email_data)
         
         return categorized
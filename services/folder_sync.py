@@ -0,0 +1,125 @@
+"""
+Multi-folder sync
+Lists unread email across several mailboxes (Gmail labels) of one account, one pooled session per folder
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from .email_record import EmailRecord
+from .email_service import EmailService
+from .imap_pool import IMAPConnectionPool
+from .message_cache import MessageCache
+
+
+def parse_folders(value: Optional[str]) -> List[str]:
+    """Folder list from a comma-separated setting, e.g. "INBOX,Jobs/Applications,[Gmail]/All Mail" """
+    folders = [folder.strip() for folder in (value or "").split(",") if folder.strip()]
+    return list(dict.fromkeys(folders)) or ["INBOX"]
+
+
+def _sort_key(record: EmailRecord) -> Tuple[bool, float]:
+    if record.timestamp is not None:
+        return True, record.timestamp
+    try:
+        # Cached before timestamps were recorded: the sender's local time is the best guess
+        return True, datetime.strptime(record.date, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return False, 0.0
+
+
+class FolderSync:
+    """
+    Syncs a set of folders of one account in parallel and merges their unread listings
+
+    Every folder keeps its own incremental cache state (the cache is keyed by mailbox),
+    so each sync costs what the slowest folder costs rather than the sum. A message
+    filed under several labels is listed once: Gmail's X-GM-MSGID identifies it in
+    every folder, with the Message-ID header as the fallback elsewhere.
+    """
+
+    def __init__(self, email_address: str, password: str, mailboxes: List[str],
+                 pool: Optional[IMAPConnectionPool] = None, cache: Optional[MessageCache] = None):
+        """
+        Initialize the folder sync
+
+        Args:
+            email_address: Account to sync
+            password: Account password
+            mailboxes: Folders in priority order; a message in several keeps the first one
+            pool: Shared IMAP pool, leased one session per folder
+            cache: Message cache; without it each folder's unread messages are fetched every time
+        """
+        self.email_address = email_address
+        self.password = password
+        self.mailboxes = list(dict.fromkeys(mailboxes)) or ["INBOX"]
+        self.pool = pool
+        self.cache = cache
+
+        # Per-folder outcome of the most recent call: listed count, seconds and error
+        self.last_sync: Dict[str, Dict] = {}
+
+    def _service(self, mailbox: str) -> EmailService:
+        return EmailService(self.email_address, self.password, pool=self.pool, cache=self.cache, mailbox=mailbox)
+
+    def _map(self, task) -> Dict[str, Dict]:
+        """Run task(service) for every folder in parallel; returns per-folder result, seconds and error"""
+        def run(mailbox):
+            started = time.perf_counter()
+            try:
+                result, error = task(self._service(mailbox)), None
+            except Exception as e:
+                result, error = None, str(e)
+            return mailbox, {"result": result, "seconds": round(time.perf_counter() - started, 3), "error": error}
+
+        with ThreadPoolExecutor(max_workers=len(self.mailboxes)) as executor:
+            outcomes = dict(executor.map(run, self.mailboxes))
+
+        # One missing label shouldn't hide the others, but nothing to show at all is an error
+        if all(outcome["error"] for outcome in outcomes.values()):
+            raise Exception(outcomes[self.mailboxes[0]]["error"])
+        return outcomes
+
+    def probe_states(self) -> Dict[str, Optional[Dict[str, int]]]:
+        """STATUS of every folder, e.g. to validate a cached response; None for folders that failed"""
+        outcomes = self._map(lambda service: service.probe_mailbox_state())
+        return {mailbox: outcome["result"] for mailbox, outcome in outcomes.items()}
+
+    @staticmethod
+    def merge(listings: Dict[str, List[EmailRecord]], limit: int) -> List[EmailRecord]:
+        """
+        Merge per-folder listings, newest first, dropping copies of the same message
+
+        Args:
+            listings: Records per folder, in folder priority order
+            limit: Records to return
+        """
+        seen = set()
+        merged = []
+        for mailbox, records in listings.items():
+            for record in records:
+                identity = record.gm_msgid or record.message_id or (mailbox, record.uid)
+                if identity in seen:
+                    continue
+                seen.add(identity)
+                record.mailbox = mailbox
+                merged.append(record)
+
+        # Newest first by UTC time; messages without a usable date go last. The sort is stable for ties
+        merged.sort(key=_sort_key, reverse=True)
+        return merged[:limit]
+
+    def get_unread_emails(self, limit: int = 50) -> List[EmailRecord]:
+        """Unread listing records of every folder, synced in parallel and de-duplicated"""
+        outcomes = self._map(lambda service: service.get_unread_emails(limit=limit, listing_mode=True))
+        self.last_sync = {
+            mailbox: {
+                "count": len(outcome["result"] or []),
+                "seconds": outcome["seconds"],
+                "error": outcome["error"]
+            }
+            for mailbox, outcome in outcomes.items()
+        }
+        return self.merge({mailbox: outcome["result"] or [] for mailbox, outcome in outcomes.items()}, limit)
@@ -0,0 +1,77 @@
+"""
+Background health monitor
+Probes shared backends on a timer so request handlers can read a cached state instead of probing themselves
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class HealthMonitor:
+    """Runs registered async health checks periodically and caches their last result"""
+
+    def __init__(self, interval: float = 60.0):
+        """
+        Initialize the monitor
+
+        Args:
+            interval: Seconds between rounds of checks
+        """
+        self.interval = interval
+        self._checks: Dict[str, Callable[[], Awaitable[bool]]] = {}
+        self._states: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, check: Callable[[], Awaitable[bool]]):
+        """Add a check; its state is unknown until the first round runs"""
+        self._checks[name] = check
+        self._states[name] = {"healthy": None, "checked_at": None, "latency_ms": None, "error": None}
+
+    def mark(self, name: str, healthy: bool, error: Optional[str] = None):
+        """Record an outcome observed outside the timer, e.g. a successful upload"""
+        state = self._states.setdefault(name, {"healthy": None, "checked_at": None, "latency_ms": None, "error": None})
+        state.update({"healthy": healthy, "checked_at": time.time(), "error": error})
+
+    def is_healthy(self, name: str) -> bool:
+        """False only if the last check failed; unknown counts as healthy"""
+        return self._states.get(name, {}).get("healthy") is not False
+
+    def status(self) -> Dict[str, Dict]:
+        """Last known state of every check"""
+        return {name: dict(state) for name, state in self._states.items()}
+
+    async def check_now(self, name: str) -> bool:
+        """Run one check immediately and cache its result"""
+        started = time.perf_counter()
+        try:
+            healthy, error = bool(await self._checks[name]()), None
+        except Exception as e:
+            healthy, error = False, str(e)
+        self._states[name] = {
+            "healthy": healthy,
+            "checked_at": time.time(),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "error": error
+        }
+        return healthy
+
+    async def _run(self):
+        while True:
+            await asyncio.gather(*(self.check_now(name) for name in list(self._checks)))
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start checking in the background of the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background checks"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
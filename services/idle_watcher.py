@@ -0,0 +1,271 @@
+"""
+IMAP IDLE watcher
+Holds one IDLE connection per account and pushes new or changed email rows to subscribers
+"""
+
+import asyncio
+import hashlib
+import imaplib
+import re
+import select
+import ssl
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .email_service import EmailService
+from .message_cache import MessageCache
+
+# Untagged responses that mean the mailbox changed while idling
+_MAILBOX_EVENT = re.compile(rb'^\* \d+ (EXISTS|EXPUNGE|FETCH)\b', re.IGNORECASE)
+
+
+class MailboxWatcher:
+    """Watches one account's INBOX with IMAP IDLE and publishes row updates"""
+
+    # Servers drop IDLE after 30 minutes; re-issue it a little earlier
+    IDLE_RENEW_SECONDS = 29 * 60
+    POLL_INTERVAL_SECONDS = 1.0
+    RECONNECT_DELAY_SECONDS = 5
+
+    def __init__(self, email_address: str, password: str, cache: MessageCache, limit: int = 100):
+        """
+        Initialize the watcher
+
+        Args:
+            email_address: Gmail account to watch
+            password: Account password
+            cache: Message cache the watcher syncs through
+            limit: Number of newest unread emails a page shows
+        """
+        # IDLE ties up its connection, so the watcher owns one outside the pool
+        self.service = EmailService(email_address, password, cache=cache)
+        self.limit = limit
+
+        self._subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._known: Optional[Dict[int, Dict]] = None
+        # Subscribers waiting for the first sync to catch up from the UIDs their page rendered
+        self._pending: Dict[asyncio.Queue, Tuple[asyncio.AbstractEventLoop, Set[int]]] = {}
+        self._tag_counter = 0
+
+    def start(self):
+        """Start the background IDLE loop"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="imap-idle-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop idling; the watcher thread ends IDLE and logs out within one poll interval"""
+        self._stop.set()
+
+    def subscribe(self, rendered_uids: Optional[Set[int]] = None) -> asyncio.Queue:
+        """
+        Register the calling event loop for updates
+
+        Args:
+            rendered_uids: UIDs of the rows the subscriber's page shows; the subscriber is first
+                sent whatever differs between them and the watcher's latest sync
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.add((loop, queue))
+            known = self._known
+            if rendered_uids is not None and known is None:
+                self._pending[queue] = (loop, set(rendered_uids))
+        if rendered_uids is not None and known is not None:
+            for event in self._catch_up_events(known, rendered_uids):
+                queue.put_nowait(event)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> int:
+        """Remove a subscriber and return how many remain"""
+        with self._lock:
+            self._subscribers = {entry for entry in self._subscribers if entry[1] is not queue}
+            self._pending.pop(queue, None)
+            return len(self._subscribers)
+
+    def _send(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, event: Dict):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def _publish(self, event: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            self._send(loop, queue, event)
+
+    def _events(self, changed: List[Dict], removed: List[int], total: int) -> List[Dict]:
+        """Events that move a page from one set of unread rows to another"""
+        events = []
+        if changed:
+            categorized = self.service.categorize_emails(sorted(changed, key=lambda row: row["uid"]))
+            for category, emails in categorized.items():
+                for email_data in emails:
+                    events.append({"type": "upsert", "category": category, "email": email_data})
+        events += [{"type": "remove", "uid": uid} for uid in removed]
+        if changed or removed:
+            events.append({"type": "status", "total": total})
+        return events
+
+    def _catch_up_events(self, current: Dict[int, Dict], rendered_uids: Set[int]) -> List[Dict]:
+        """Events for a page that rendered rendered_uids, covering mail that arrived or was read since"""
+        changed = [row for uid, row in current.items() if uid not in rendered_uids]
+        removed = [uid for uid in rendered_uids if uid not in current]
+        return self._events(changed, removed, len(current))
+
+    def _current_rows(self) -> Dict[int, Dict]:
+        """Sync the cache and return the unread rows a page would show, keyed by UID"""
+        mailbox_state = self.service.sync_cache()
+        rows = self.service.cache.get_unread(
+            self.service.email_address.lower(), self.service.mailbox, mailbox_state["UIDVALIDITY"], self.limit
+        )
+        return {row["uid"]: row for row in rows}
+
+    def _publish_changes(self):
+        """Diff the unread rows against the last published set and push the difference"""
+        current = self._current_rows()
+
+        with self._lock:
+            known, self._known = self._known, current
+            pending, self._pending = self._pending, {}
+
+        # Pages that subscribed before the first sync catch up from what they rendered
+        for queue, (loop, rendered_uids) in pending.items():
+            for event in self._catch_up_events(current, rendered_uids):
+                self._send(loop, queue, event)
+
+        if known is None:
+            return
+
+        changed = [row for uid, row in current.items() if known.get(uid) != row]
+        removed = [uid for uid in known if uid not in current]
+        for event in self._events(changed, removed, len(current)):
+            self._publish(event)
+
+    def _buffered(self, mail) -> bool:
+        """True if imaplib's reader holds unread bytes, or the socket has some ready right now"""
+        sock = mail.sock
+        timeout = sock.gettimeout()
+        # A timed-out read poisons the socket file, so peek without blocking instead
+        sock.setblocking(False)
+        try:
+            return bool(mail.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(timeout)
+
+    def _wait_readable(self, mail) -> bool:
+        """Wait up to one poll interval for server data, including lines imaplib already buffered"""
+        # select only sees the socket, not lines imaplib read ahead together with an earlier one
+        if self._buffered(mail):
+            return True
+        readable, _, _ = select.select([mail.sock], [], [], self.POLL_INTERVAL_SECONDS)
+        return bool(readable)
+
+    def _idle_once(self, mail) -> bool:
+        """
+        Run one IDLE command until the mailbox changes, the renew interval passes or stop() is called
+
+        Returns:
+            True if EXISTS, EXPUNGE or FETCH was seen while idling
+        """
+        self._tag_counter += 1
+        tag = b"IDLE%d" % self._tag_counter
+        mail.send(tag + b" IDLE\r\n")
+
+        line = mail.readline()
+        if not line.startswith(b"+"):
+            raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+
+        # Everything runs on this thread; the socket is never read and written concurrently
+        deadline = time.monotonic() + self.IDLE_RENEW_SECONDS
+        changed = False
+        while not changed and not self._stop.is_set() and time.monotonic() < deadline:
+            if not self._wait_readable(mail):
+                continue
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            if line.startswith(b"* BYE"):
+                raise imaplib.IMAP4.abort(line.decode(errors='ignore').strip())
+            if _MAILBOX_EVENT.match(line):
+                changed = True
+
+        mail.send(b"DONE\r\n")
+        while True:
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed while ending IDLE")
+            if line.startswith(tag + b" "):
+                break
+            if _MAILBOX_EVENT.match(line):
+                changed = True
+
+        return changed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.service.connect()
+                # Catch up on anything missed while disconnected
+                self._publish_changes()
+                while not self._stop.is_set():
+                    if self._idle_once(self.service.mail) and not self._stop.is_set():
+                        self._publish_changes()
+            except Exception as e:
+                # Not "error": that name is reserved for EventSource connection errors
+                self._publish({"type": "warning", "message": str(e)})
+                self._stop.wait(self.RECONNECT_DELAY_SECONDS)
+            finally:
+                self.service.disconnect()
+
+
+class WatcherRegistry:
+    """Shares one MailboxWatcher per account between every open page"""
+
+    def __init__(self, cache: MessageCache, limit: int = 100):
+        self.cache = cache
+        self.limit = limit
+        self._watchers: Dict[Tuple[str, str], MailboxWatcher] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, email_address: str, password: str) -> Tuple[str, str]:
+        return (email_address.lower(), hashlib.sha256(password.encode('utf-8')).hexdigest())
+
+    def subscribe(self, email_address: str, password: str,
+                  rendered_uids: Optional[Set[int]] = None) -> Tuple[MailboxWatcher, asyncio.Queue]:
+        """Subscribe to an account's updates, starting its watcher if needed"""
+        key = self._key(email_address, password)
+        with self._lock:
+            watcher = self._watchers.get(key)
+            if watcher is None:
+                watcher = MailboxWatcher(email_address, password, self.cache, self.limit)
+                self._watchers[key] = watcher
+                watcher.start()
+            queue = watcher.subscribe(rendered_uids)
+        return watcher, queue
+
+    def unsubscribe(self, watcher: MailboxWatcher, queue: asyncio.Queue):
+        """Drop a subscription and stop the watcher once nobody is listening"""
+        with self._lock:
+            if watcher.unsubscribe(queue) == 0:
+                watcher.stop()
+                for key, registered in list(self._watchers.items()):
+                    if registered is watcher:
+                        del self._watchers[key]
+
+    def stop_all(self):
+        """Stop every watcher"""
+        with self._lock:
+            watchers = list(self._watchers.values())
+            self._watchers.clear()
+        for watcher in watchers:
+            watcher.stop()
@@ -0,0 +1,310 @@
+"""
+IMAP response parsing helpers
+Turns raw imaplib FETCH responses into per-message field dictionaries
+"""
+
+import base64
+import email.utils
+import quopri
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_MESSAGE_START = re.compile(rb'^(\d+) \(')
+_LITERAL_MARKER = re.compile(rb'\{(\d+)\}$')
+
+# Sentinels for list delimiters so they never clash with quoted strings
+_OPEN = object()
+_CLOSE = object()
+
+
+def format_uid_set(uids: Iterable) -> str:
+    """Build a compact IMAP sequence set such as 1:4,7,9:10 from a list of UIDs"""
+    numbers = sorted({int(uid) for uid in uids})
+    if not numbers:
+        return ""
+
+    ranges = []
+    start = prev = numbers[0]
+    for number in numbers[1:]:
+        if number == prev + 1:
+            prev = number
+            continue
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        start = prev = number
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ",".join(ranges)
+
+
+def _tokenize(segments: List[Tuple[str, bytes]]) -> List[Any]:
+    """Split FETCH response text into atoms, strings, literals and list delimiters"""
+    tokens = []
+    for kind, value in segments:
+        if kind == "literal":
+            tokens.append(value)
+            continue
+
+        text = value
+        i, n = 0, len(text)
+        while i < n:
+            char = text[i:i + 1]
+            if char in (b' ', b'\r', b'\n'):
+                i += 1
+            elif char == b'(':
+                tokens.append(_OPEN)
+                i += 1
+            elif char == b')':
+                tokens.append(_CLOSE)
+                i += 1
+            elif char == b'"':
+                # Quoted string with backslash escapes
+                j = i + 1
+                buf = bytearray()
+                while j < n and text[j:j + 1] != b'"':
+                    if text[j:j + 1] == b'\\':
+                        j += 1
+                    buf += text[j:j + 1]
+                    j += 1
+                tokens.append(buf.decode('utf-8', errors='replace'))
+                i = j + 1
+            else:
+                # Atom; section specs like BODY[HEADER.FIELDS (FROM)] keep their brackets
+                j = i
+                depth = 0
+                while j < n:
+                    ch = text[j:j + 1]
+                    if ch == b'[':
+                        depth += 1
+                    elif ch == b']':
+                        depth -= 1
+                    elif depth == 0 and ch in (b' ', b'(', b')', b'\r', b'\n'):
+                        break
+                    j += 1
+                atom = text[i:j].decode('utf-8', errors='replace')
+                tokens.append(None if atom.upper() == "NIL" else atom)
+                i = j
+    return tokens
+
+
+def _nest(tokens: List[Any]) -> List[Any]:
+    """Turn a flat token stream into nested Python lists"""
+    stack = [[]]
+    for token in tokens:
+        if token is _OPEN:
+            stack.append([])
+        elif token is _CLOSE:
+            if len(stack) > 1:
+                closed = stack.pop()
+                stack[-1].append(closed)
+        else:
+            stack[-1].append(token)
+    # Tolerate unbalanced input by folding any open lists back in
+    while len(stack) > 1:
+        closed = stack.pop()
+        stack[-1].append(closed)
+    return stack[0]
+
+
+def parse_fetch_response(data: List[Any]) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Parse the data list returned by imaplib for a (UID) FETCH command
+
+    Args:
+        data: Response data as returned by imaplib, a mix of bytes lines and
+              (header, literal) tuples, possibly covering many messages
+
+    Returns:
+        List of (sequence number, fields) pairs where fields maps upper-cased
+        FETCH item names (UID, RFC822, BODYSTRUCTURE, BODY[1]<0> ...) to values
+    """
+    messages = []
+    current = None
+
+    for item in data or []:
+        if item is None:
+            continue
+        head = item[0] if isinstance(item, tuple) else item
+        if not isinstance(head, (bytes, bytearray)):
+            continue
+
+        if _MESSAGE_START.match(head):
+            current = []
+            messages.append(current)
+        elif current is None:
+            continue
+
+        if isinstance(item, tuple):
+            current.append(("text", _LITERAL_MARKER.sub(b'', head)))
+            current.append(("literal", item[1]))
+        else:
+            current.append(("text", head))
+
+    results = []
+    for segments in messages:
+        parsed = _nest(_tokenize(segments))
+        if len(parsed) < 2 or not isinstance(parsed[1], list):
+            continue
+        try:
+            seq = int(parsed[0])
+        except (TypeError, ValueError):
+            continue
+
+        pairs = parsed[1]
+        fields = {}
+        for index in range(0, len(pairs) - 1, 2):
+            key = pairs[index]
+            if isinstance(key, str):
+                fields[key.upper()] = pairs[index + 1]
+        results.append((seq, fields))
+
+    return results
+
+
+def _text(value: Any) -> str:
+    """Normalise an atom, quoted string or literal to str"""
+    if value is None:
+        return ""
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode('utf-8', errors='replace')
+    return str(value)
+
+
+def _params(value: Any) -> Dict[str, str]:
+    """Turn a BODYSTRUCTURE parameter list ("NAME" "x" ...) into a dict"""
+    if not isinstance(value, list):
+        return {}
+    params = {}
+    for index in range(0, len(value) - 1, 2):
+        params[_text(value[index]).lower()] = _text(value[index + 1])
+    return params
+
+
+def _part_filename(params: Dict[str, str], disposition_params: Dict[str, str]) -> str:
+    """Pick the filename of a part, honouring RFC 2231 encoded parameters"""
+    for source in (disposition_params, params):
+        for key in ("filename", "name"):
+            if source.get(key):
+                return source[key]
+            encoded = source.get(key + "*")
+            if encoded:
+                try:
+                    return email.utils.collapse_rfc2231_value(email.utils.decode_rfc2231(encoded))
+                except Exception:
+                    return encoded
+    return ""
+
+
+def _walk_structure(node: Any, number: str, parts: List[Dict[str, Any]]):
+    """Recursively collect leaf parts of a BODYSTRUCTURE tree"""
+    if not isinstance(node, list) or not node:
+        return
+
+    if isinstance(node[0], list):
+        # Multipart: child bodies come first, then the subtype and extension data
+        index = 0
+        for child in node:
+            if not isinstance(child, list):
+                break
+            index += 1
+            _walk_structure(child, f"{number}.{index}" if number else str(index), parts)
+        return
+
+    maintype = _text(node[0]).lower()
+    subtype = _text(node[1]).lower() if len(node) > 1 else ""
+    params = _params(node[2]) if len(node) > 2 else {}
+    encoding = _text(node[5]).lower() if len(node) > 5 and node[5] else "7bit"
+    try:
+        size = int(node[6]) if len(node) > 6 else 0
+    except (TypeError, ValueError):
+        size = 0
+
+    # Extension data starts after the type-specific fields
+    if maintype == "text":
+        extension_start = 8
+    elif maintype == "message" and subtype == "rfc822":
+        extension_start = 10
+    else:
+        extension_start = 7
+
+    disposition = node[extension_start + 1] if len(node) > extension_start + 1 else None
+    disposition_type = ""
+    disposition_params = {}
+    if isinstance(disposition, list) and disposition:
+        disposition_type = _text(disposition[0]).lower()
+        disposition_params = _params(disposition[1]) if len(disposition) > 1 else {}
+
+    parts.append({
+        "part": number or "1",
+        "content_type": f"{maintype}/{subtype}",
+        "charset": params.get("charset", ""),
+        "encoding": encoding,
+        "size": size,
+        "disposition": disposition_type,
+        "filename": _part_filename(params, disposition_params)
+    })
+
+
+def parse_bodystructure(structure: Any) -> List[Dict[str, Any]]:
+    """
+    Flatten a parsed BODYSTRUCTURE into leaf part descriptors
+
+    Returns:
+        List of dicts with part (IMAP section number such as "2" or "1.1"),
+        content_type, charset, encoding, size (encoded octets), disposition
+        and filename
+    """
+    parts = []
+    _walk_structure(structure, "", parts)
+    return parts
+
+
+def estimate_decoded_size(size: int, encoding: str) -> int:
+    """Estimate the decoded size of a part from its encoded size"""
+    if encoding == "base64":
+        # 76 base64 characters plus CRLF per line carry 57 bytes
+        return size * 57 // 78
+    return size
+
+
+def parse_internaldate(value: Any) -> Optional[float]:
+    """UTC timestamp of an INTERNALDATE value such as "17-Jul-1996 02:44:25 -0700", or None"""
+    try:
+        return datetime.strptime(_text(value).strip(), "%d-%b-%Y %H:%M:%S %z").timestamp()
+    except ValueError:
+        return None
+
+
+class TransferDecoder:
+    """Incrementally decode a transfer-encoded body that arrives in arbitrary chunks"""
+
+    def __init__(self, encoding: str):
+        self.encoding = (encoding or "7bit").lower()
+        self._pending = b""
+
+    def decode(self, chunk: bytes) -> bytes:
+        """Decode as much of the buffered input as is safely complete"""
+        if self.encoding == "base64":
+            data = self._pending + b"".join(chunk.split())
+            cut = len(data) - len(data) % 4
+            self._pending = data[cut:]
+            return base64.b64decode(data[:cut]) if cut else b""
+
+        if self.encoding == "quoted-printable":
+            # Only decode whole lines so escape sequences are never split
+            data = self._pending + chunk
+            cut = data.rfind(b"\n") + 1
+            self._pending = data[cut:]
+            return quopri.decodestring(data[:cut]) if cut else b""
+
+        return chunk
+
+    def flush(self) -> bytes:
+        """Decode whatever is left once the input is exhausted"""
+        data, self._pending = self._pending, b""
+        if not data:
+            return b""
+        if self.encoding == "base64":
+            return base64.b64decode(data + b"=" * (-len(data) % 4))
+        if self.encoding == "quoted-printable":
+            return quopri.decodestring(data)
+        return data
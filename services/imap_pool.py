@@ -0,0 +1,275 @@
+"""
+IMAP connection pool
+Keeps authenticated, selected Gmail sessions warm and shares them across requests
+"""
+
+import hashlib
+import imaplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+
+class PooledSession:
+    """An authenticated, selected IMAP session owned by the pool"""
+
+    def __init__(self, key: Tuple[str, str, str], factory: Callable[[], imaplib.IMAP4]):
+        self.key = key
+        self._factory = factory
+        self.conn = factory()
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.broken = False
+        # Literal for the next command, as on imaplib.IMAP4; kept here so a retry can send it again
+        self.literal = None
+
+    def reconnect(self):
+        """Replace the underlying connection with a fresh one"""
+        try:
+            self.conn.logout()
+        except Exception:
+            pass
+        self.conn = self._factory()
+        self.created_at = time.monotonic()
+
+    def logout(self):
+        """Log out and drop the underlying connection"""
+        try:
+            self.conn.logout()
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        attr = getattr(self.conn, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            literal, self.literal = self.literal, None
+
+            def attempt():
+                # imaplib clears its literal once sent, and a reconnect starts without one
+                self.conn.literal = literal
+                return getattr(self.conn, name)(*args, **kwargs)
+
+            try:
+                return attempt()
+            except (imaplib.IMAP4.abort, OSError):
+                # BYE, dropped socket or timeout: reconnect and retry the command once
+                try:
+                    self.reconnect()
+                    return attempt()
+                except Exception:
+                    self.broken = True
+                    raise
+
+        return call
+
+
+class IMAPConnectionPool:
+    """Per-account pool of warm IMAP sessions with health checks and idle eviction"""
+
+    def __init__(self, max_sessions_per_account: int = 4, idle_timeout: float = 300.0,
+                 health_check_interval: float = 30.0, acquire_timeout: float = 30.0):
+        """
+        Initialize the connection pool
+
+        Args:
+            max_sessions_per_account: Upper bound on open sessions per account, across all its mailboxes
+            idle_timeout: Seconds an unused session is kept before it is logged out
+            health_check_interval: Idle seconds after which a NOOP verifies a session
+            acquire_timeout: Seconds to wait for a free session before giving up
+        """
+        self.max_sessions_per_account = max(1, max_sessions_per_account)
+        # Per-account overrides of max_sessions_per_account, keyed by lowercased address
+        self.account_limits: Dict[str, int] = {}
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._condition = threading.Condition()
+        self._idle: Dict[Tuple[str, str, str], List[PooledSession]] = {}
+        self._in_use: Dict[Tuple[str, str, str], int] = {}
+        self._reaper = None
+        self._closed = False
+
+    def _account_key(self, email_address: str, password: str, mailbox: str) -> Tuple[str, str, str]:
+        """Key idle sessions by account, credentials and mailbox so leases never cross accounts"""
+        password_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
+        return (email_address.lower(), password_hash, mailbox)
+
+    def set_account_limit(self, email_address: str, limit: int):
+        """Cap the sessions one account may hold across its mailboxes, e.g. a provider's per-user connection limit"""
+        with self._condition:
+            self.account_limits[email_address.lower()] = max(1, limit)
+            self._condition.notify_all()
+
+    def _limit_for(self, account: str) -> int:
+        return self.account_limits.get(account, self.max_sessions_per_account)
+
+    def _open_count(self, account: str) -> int:
+        """Open sessions of an account under any credentials and mailbox; caller must hold the lock"""
+        in_use = sum(count for key, count in self._in_use.items() if key[0] == account)
+        idle = sum(len(sessions) for key, sessions in self._idle.items() if key[0] == account)
+        return in_use + idle
+
+    def _take_idle_of(self, account: str):
+        """Remove the least recently used idle session of an account; caller must hold the lock"""
+        candidates = [(session.last_used, key) for key, sessions in self._idle.items()
+                      if key[0] == account for session in sessions[:1]]
+        if not candidates:
+            return None
+        _, key = min(candidates)
+        session = self._idle[key].pop(0)
+        if not self._idle[key]:
+            del self._idle[key]
+        return session
+
+    def _take_expired(self) -> List[PooledSession]:
+        """Remove idle sessions past the idle timeout; caller must hold the lock"""
+        now = time.monotonic()
+        expired = []
+        for key, sessions in list(self._idle.items()):
+            keep = []
+            for session in sessions:
+                if now - session.last_used > self.idle_timeout:
+                    expired.append(session)
+                else:
+                    keep.append(session)
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        return expired
+
+    def _is_healthy(self, session: PooledSession) -> bool:
+        """Check a session with NOOP if it has been idle for a while"""
+        if time.monotonic() - session.last_used < self.health_check_interval:
+            return True
+        try:
+            status, _ = session.conn.noop()
+            return status == "OK"
+        except Exception:
+            return False
+
+    def acquire(self, email_address: str, password: str, factory: Callable[[], imaplib.IMAP4],
+                mailbox: str = "INBOX") -> PooledSession:
+        """
+        Lease a session for an account, opening a new one if needed
+
+        Args:
+            email_address: Account the session belongs to
+            password: Account password, used to keep sessions of different credentials apart
+            factory: Callable returning a new authenticated connection with the mailbox selected
+            mailbox: Mailbox the session has selected
+
+        Returns:
+            A PooledSession that must be handed back with release()
+        """
+        key = self._account_key(email_address, password, mailbox)
+        account = key[0]
+        deadline = time.monotonic() + self.acquire_timeout
+        session = None
+
+        with self._condition:
+            expired = self._take_expired()
+            while True:
+                idle = self._idle.get(key)
+                if idle:
+                    session = idle.pop()
+                    break
+                if self._open_count(account) < self._limit_for(account):
+                    break
+                # At the cap: an idle session on another mailbox gives up its slot
+                spare = self._take_idle_of(account)
+                if spare is not None:
+                    expired.append(spare)
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception("Too many concurrent Gmail sessions for this account. Please try again shortly.")
+                self._condition.wait(remaining)
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        for stale in expired:
+            stale.logout()
+
+        try:
+            if session is not None and not self._is_healthy(session):
+                session.reconnect()
+            if session is None:
+                session = PooledSession(key, factory)
+        except Exception:
+            with self._condition:
+                self._in_use[key] -= 1
+                self._condition.notify_all()
+            raise
+
+        session.broken = False
+        return session
+
+    def release(self, session: PooledSession, discard: bool = False):
+        """Return a leased session to the pool, or drop it if it is broken"""
+        with self._condition:
+            self._in_use[session.key] = max(self._in_use.get(session.key, 1) - 1, 0)
+            keep = not (discard or session.broken or self._closed)
+            if keep:
+                session.last_used = time.monotonic()
+                self._idle.setdefault(session.key, []).append(session)
+            self._condition.notify_all()
+
+        if not keep:
+            session.logout()
+
+    @contextmanager
+    def lease(self, email_address: str, password: str, factory: Callable[[], imaplib.IMAP4],
+              mailbox: str = "INBOX"):
+        """Context manager around acquire() and release()"""
+        session = self.acquire(email_address, password, factory, mailbox)
+        try:
+            yield session
+        except (imaplib.IMAP4.abort, OSError):
+            session.broken = True
+            raise
+        finally:
+            self.release(session)
+
+    def evict_idle(self):
+        """Log out sessions that have been idle longer than the idle timeout"""
+        with self._condition:
+            expired = self._take_expired()
+        for session in expired:
+            session.logout()
+
+    def start_reaper(self, interval: float = 60.0):
+        """Evict idle sessions periodically from a background thread"""
+        if self._reaper is not None:
+            return
+
+        def reap():
+            while not self._closed:
+                time.sleep(interval)
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name="imap-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def close_all(self):
+        """Log out every idle session and stop pooling new ones"""
+        with self._condition:
+            self._closed = True
+            sessions = [session for idle in self._idle.values() for session in idle]
+            self._idle.clear()
+        for session in sessions:
+            session.logout()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Open and idle session counts per account and mailbox"""
+        with self._condition:
+            stats = {}
+            for key in set(self._idle) | set(self._in_use):
+                entry = stats.setdefault(f"{key[0]}/{key[2]}", {"in_use": 0, "idle": 0})
+                entry["in_use"] += self._in_use.get(key, 0)
+                entry["idle"] += len(self._idle.get(key, []))
+            return stats
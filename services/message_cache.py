@@ -0,0 +1,173 @@
+"""
+Local message metadata cache
+Persists parsed email records per (account, mailbox, UIDVALIDITY, UID) in SQLite
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class MessageCache:
+    """SQLite-backed store of listing records and mailbox sync state"""
+
+    def __init__(self, path: str = "email_cache.db"):
+        """
+        Open (or create) the cache database
+
+        Args:
+            path: SQLite database file; ":memory:" keeps the cache in process
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS mailbox_state (
+                account TEXT NOT NULL,
+                mailbox TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                uidnext INTEGER NOT NULL,
+                highestmodseq INTEGER,
+                messages INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (account, mailbox)
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                account TEXT NOT NULL,
+                mailbox TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                uid INTEGER NOT NULL,
+                seen INTEGER NOT NULL,
+                flags TEXT NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (account, mailbox, uidvalidity, uid)
+            );
+            CREATE TABLE IF NOT EXISTS message_ids (
+                account TEXT NOT NULL,
+                mailbox TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                uid INTEGER NOT NULL,
+                PRIMARY KEY (account, mailbox, message_id)
+            );
+        """)
+        self._db.commit()
+
+    def get_state(self, account: str, mailbox: str) -> Optional[Dict]:
+        """Return the last synced mailbox state, or None if never synced"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM mailbox_state WHERE account = ? AND mailbox = ?",
+                (account, mailbox)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def save_state(self, account: str, mailbox: str, uidvalidity: int, uidnext: int,
+                   highestmodseq: Optional[int], messages: int):
+        """Record the mailbox state the cache is now in sync with"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO mailbox_state VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (account, mailbox, uidvalidity, uidnext, highestmodseq, messages, time.time())
+            )
+            self._db.commit()
+
+    def invalidate(self, account: str, mailbox: str):
+        """Drop every cached record and the sync state for a mailbox"""
+        with self._lock:
+            self._db.execute("DELETE FROM messages WHERE account = ? AND mailbox = ?", (account, mailbox))
+            self._db.execute("DELETE FROM message_ids WHERE account = ? AND mailbox = ?", (account, mailbox))
+            self._db.execute("DELETE FROM mailbox_state WHERE account = ? AND mailbox = ?", (account, mailbox))
+            self._db.commit()
+
+    def store_records(self, account: str, mailbox: str, uidvalidity: int,
+                      entries: Iterable[Tuple[int, List[str], Dict]]):
+        """Insert or replace (uid, flags, record) entries"""
+        rows = [
+            (account, mailbox, uidvalidity, uid, int("\\Seen" in flags), " ".join(flags), json.dumps(record))
+            for uid, flags, record in entries
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def update_flags(self, account: str, mailbox: str, uidvalidity: int, flags_by_uid: Dict[int, List[str]]):
+        """Apply flag changes to cached records"""
+        rows = [
+            (int("\\Seen" in flags), " ".join(flags), account, mailbox, uidvalidity, uid)
+            for uid, flags in flags_by_uid.items()
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "UPDATE messages SET seen = ?, flags = ? "
+                "WHERE account = ? AND mailbox = ? AND uidvalidity = ? AND uid = ?",
+                rows
+            )
+            self._db.commit()
+
+    def delete_uids(self, account: str, mailbox: str, uidvalidity: int, uids: Iterable[int]):
+        """Forget expunged messages"""
+        rows = [(account, mailbox, uidvalidity, uid) for uid in uids]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM messages WHERE account = ? AND mailbox = ? AND uidvalidity = ? AND uid = ?",
+                rows
+            )
+            self._db.executemany(
+                "DELETE FROM message_ids WHERE account = ? AND mailbox = ? AND uidvalidity = ? AND uid = ?",
+                rows
+            )
+            self._db.commit()
+
+    def cached_uids(self, account: str, mailbox: str, uidvalidity: int) -> List[int]:
+        """UIDs currently held for a mailbox"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT uid FROM messages WHERE account = ? AND mailbox = ? AND uidvalidity = ?",
+                (account, mailbox, uidvalidity)
+            ).fetchall()
+        return [row["uid"] for row in rows]
+
+    def get_unread(self, account: str, mailbox: str, uidvalidity: int, limit: int = 50) -> List[Dict]:
+        """Newest unread records first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT record FROM messages WHERE account = ? AND mailbox = ? AND uidvalidity = ? AND seen = 0 "
+                "ORDER BY uid DESC LIMIT ?",
+                (account, mailbox, uidvalidity, limit)
+            ).fetchall()
+        return [json.loads(row["record"]) for row in rows]
+
+    def index_message_ids(self, account: str, mailbox: str, uidvalidity: int, pairs: Iterable[Tuple[str, int]]):
+        """Remember which UID carries each Message-ID"""
+        rows = [(account, mailbox, message_id, uidvalidity, uid) for message_id, uid in pairs if message_id]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO message_ids VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def lookup_message_id(self, account: str, mailbox: str, message_id: str, uidvalidity: int) -> Optional[int]:
+        """Resolve a Message-ID to a UID valid under the given UIDVALIDITY"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT uid FROM message_ids WHERE account = ? AND mailbox = ? AND message_id = ? AND uidvalidity = ?",
+                (account, mailbox, message_id, uidvalidity)
+            ).fetchone()
+        return row["uid"] if row else None
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,137 @@
+"""
+Parallel MIME parsing
+Parses fetched messages in worker processes so large fetch batches use every core
+
+An EmailService given a parser_pool parses its listing fetches (headers, BODYSTRUCTURE and a
+body prefix) and full-message fetches here; utils/backfill.py starts one with --parse-workers.
+"""
+
+import email
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .email_service import EmailService
+
+# Per-process parser; EmailService holds no connection until connect() is called
+_parser: Optional[EmailService] = None
+
+# Listing FETCH data of one message: header fields, parsed BODYSTRUCTURE parts and the body prefix
+ListingFields = Tuple[bytes, List[Dict], bytes]
+
+
+def _get_parser() -> EmailService:
+    global _parser
+    if _parser is None:
+        _parser = EmailService("", "")
+    return _parser
+
+
+def parse_message_bytes(raw_message: bytes) -> Optional[Dict]:
+    """
+    Parse one raw RFC822 message into a compact email record
+
+    The record is that of EmailService.parse_email, whose attachment descriptors carry
+    no payloads, so records stay cheap to send between processes.
+    Returns None if the message can't be parsed.
+    """
+    try:
+        return _get_parser().parse_email(email.message_from_bytes(raw_message))
+    except Exception:
+        return None
+
+
+def parse_listing_fields(fields: ListingFields) -> Optional[Dict]:
+    """Build one listing record with EmailService.parse_listing; None if it can't be parsed"""
+    try:
+        return _get_parser().parse_listing(*fields)
+    except Exception:
+        return None
+
+
+def parse_chunk(raw_messages: List[bytes]) -> List[Optional[Dict]]:
+    """Worker entry point: parse a chunk of raw messages"""
+    return [parse_message_bytes(raw_message) for raw_message in raw_messages]
+
+
+def parse_listing_chunk(items: List[ListingFields]) -> List[Optional[Dict]]:
+    """Worker entry point: build the listing records of a chunk of messages"""
+    return [parse_listing_fields(fields) for fields in items]
+
+
+class MimeParserPool:
+    """Splits batches of raw messages into chunks and parses them on a process pool"""
+
+    # Messages sent to a worker per task; bigger chunks amortize pickling, smaller ones balance load
+    DEFAULT_CHUNK_SIZE = 25
+
+    # Batches smaller than this are parsed in the calling thread; a round trip to the pool costs more
+    DEFAULT_MIN_BATCH = 50
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 min_batch: int = DEFAULT_MIN_BATCH):
+        """
+        Initialize the pool; worker processes start on first use
+
+        Args:
+            workers: Worker processes (defaults to the CPU count)
+            chunk_size: Messages per task
+            min_batch: Smallest batch worth sending to the workers
+        """
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_size = max(1, chunk_size)
+        self.min_batch = min_batch
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned rather than forked: the server process runs threads (IMAP pool, IDLE watchers)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _map(self, parse_function: Callable[[List], List[Optional[Dict]]], items: List) -> List[Optional[Dict]]:
+        if len(items) < self.min_batch:
+            return parse_function(items)
+
+        chunks = [items[start:start + self.chunk_size] for start in range(0, len(items), self.chunk_size)]
+        records = []
+        for chunk_records in self._get_executor().map(parse_function, chunks):
+            records.extend(chunk_records)
+        return records
+
+    def parse(self, raw_messages: List[bytes]) -> List[Optional[Dict]]:
+        """
+        Parse raw messages, keeping input order
+
+        Returns:
+            One compact record per message, or None where parsing failed
+        """
+        return self._map(parse_chunk, raw_messages)
+
+    def parse_listings(self, items: List[ListingFields]) -> List[Optional[Dict]]:
+        """
+        Build listing records from (header bytes, BODYSTRUCTURE parts, body prefix), keeping input order
+
+        Returns:
+            One record per message, or None where parsing failed
+        """
+        return self._map(parse_listing_chunk, items)
+
+    def warm_up(self):
+        """Start the worker processes ahead of the first large batch"""
+        executor = self._get_executor()
+        list(executor.map(parse_chunk, [[] for _ in range(self.workers)]))
+
+    def close(self):
+        """Shut down the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
@@ -1,6 +1,8 @@
 import motor.motor_asyncio
-from pymongo import MongoClient
-from typing import Dict, Any, Optional
+from pymongo import InsertOne, MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
+from typing import Dict, Any, List, Optional
 import os
 from datetime import datetime
 from dotenv import load_dotenv
@@ -8,8 +10,14 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class MongoDBService:
-    def __init__(self):
-        """Initialize MongoDB connection"""
+    def __init__(self, max_pool_size: int = 100, min_pool_size: int = 0):
+        """
+        Initialize MongoDB connection
+        
+        Args:
+            max_pool_size: Upper bound on pooled connections
+            min_pool_size: Connections kept open even when idle, so the first insert after a quiet spell is warm
+        """
         self.database_url = os.getenv("DATABASE_URL")
         
         if not self.database_url:
@@ -17,7 +25,13 @@ class MongoDBService:
         
         try:
             # Create async client
-            self.client = motor.motor_asyncio.AsyncIOMotorClient(self.database_url)
+            self.client = motor.motor_asyncio.AsyncIOMotorClient(
+                self.database_url,
+                maxPoolSize=max_pool_size,
+                minPoolSize=min_pool_size,
+                serverSelectionTimeoutMS=5000,
+                connectTimeoutMS=5000
+            )
             self.db = self.client.recruitment
             self.expected_candidates = self.db.expected_candidate
         except Exception as e:
@@ -32,7 +46,34 @@ class MongoDBService:
         except Exception as e:
             return False
     
-    async def create_expected_candidate(self, name: str, job_posting: str, cv_file_path: str) -> Dict[str, Any]:
+    async def ensure_indexes(self):
+        """Create the unique CV hash index; records saved before hashing existed are left out of it"""
+        await self.expected_candidates.create_index(
+            "cvSha256",
+            unique=True,
+            partialFilterExpression={"cvSha256": {"$exists": True}},
+            name="cvSha256_unique"
+        )
+    
+    def _candidate_upsert(self, name: str, job_posting: str, cv_file_path: str, sha256: str,
+                          now: datetime, candidate_id: ObjectId):
+        """Filter and update that create a candidate for a CV hash, or add the job posting to an existing one"""
+        update = {
+            "$setOnInsert": {
+                "_id": candidate_id,
+                "name": name,
+                "jobPosting": job_posting,
+                "cvFilePath": cv_file_path,
+                "cvSha256": sha256,
+                "createdAt": now
+            },
+            "$addToSet": {"jobPostings": job_posting},
+            "$set": {"updatedAt": now}
+        }
+        return {"cvSha256": sha256}, update
+    
+    async def create_expected_candidate(self, name: str, job_posting: str, cv_file_path: str,
+                                        sha256: Optional[str] = None) -> Dict[str, Any]:
         """
         Create a new expected candidate record
         
@@ -40,11 +81,42 @@ class MongoDBService:
             name: Name of the candidate (PDF filename)
             job_posting: Job category from email
             cv_file_path: S3 file path
+            sha256: Content hash of the CV; a CV already on file gets the job posting linked instead
             
         Returns:
             Dict with creation result
         """
         try:
+            if sha256:
+                now = datetime.utcnow()
+                candidate_id = ObjectId()
+                query, update = self._candidate_upsert(name, job_posting, cv_file_path, sha256, now, candidate_id)
+                try:
+                    existing = await self.expected_candidates.find_one_and_update(
+                        query, update, upsert=True, return_document=ReturnDocument.BEFORE
+                    )
+                except DuplicateKeyError:
+                    # Lost an insert race on the unique index; the other writer's record now matches
+                    existing = await self.expected_candidates.find_one_and_update(
+                        query, update, return_document=ReturnDocument.BEFORE
+                    )
+                
+                if existing is not None:
+                    return {
+                        "success": True,
+                        "message": f"Linked existing candidate {existing['name']} to {job_posting}",
+                        "candidate_id": str(existing["_id"]),
+                        "duplicate": True,
+                        "data": {"name": existing["name"], "jobPosting": job_posting, "cvFilePath": existing["cvFilePath"]}
+                    }
+                return {
+                    "success": True,
+                    "message": f"Successfully saved candidate {name} to database",
+                    "candidate_id": str(candidate_id),
+                    "duplicate": False,
+                    "data": {"name": name, "jobPosting": job_posting, "cvFilePath": cv_file_path}
+                }
+            
             candidate_data = {
                 "name": name,
                 "jobPosting": job_posting,
@@ -77,6 +149,77 @@ class MongoDBService:
                 "message": "Failed to save candidate to database"
             }
     
+    async def create_expected_candidates(self, candidates: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Create many expected candidate records with one bulk write
+        
+        Args:
+            candidates: Dicts with name, job_posting, cv_file_path and optionally sha256
+            
+        Returns:
+            Dict with one candidate_id (or None), duplicate flag and error (or None) per input, in input order
+        """
+        if not candidates:
+            return {"success": True, "candidate_ids": [], "duplicates": [], "errors": []}
+        
+        now = datetime.utcnow()
+        candidate_ids = [ObjectId() for _ in candidates]
+        operations = []
+        for candidate, candidate_id in zip(candidates, candidate_ids):
+            if candidate.get("sha256"):
+                query, update = self._candidate_upsert(
+                    candidate["name"], candidate["job_posting"], candidate["cv_file_path"],
+                    candidate["sha256"], now, candidate_id
+                )
+                operations.append(UpdateOne(query, update, upsert=True))
+            else:
+                operations.append(InsertOne({
+                    "_id": candidate_id,
+                    "name": candidate["name"],
+                    "jobPosting": candidate["job_posting"],
+                    "cvFilePath": candidate["cv_file_path"],
+                    "createdAt": now,
+                    "updatedAt": now
+                }))
+        
+        errors = [None] * len(candidates)
+        try:
+            # Unordered, so one bad document doesn't stop the rest of the batch
+            await self.expected_candidates.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                errors[write_error["index"]] = write_error.get("errmsg", "Write failed")
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Database error: {str(e)}",
+                "message": "Failed to save candidates to database",
+                "candidate_ids": [None] * len(candidates),
+                "duplicates": [False] * len(candidates),
+                "errors": [str(e)] * len(candidates)
+            }
+        
+        # Upserts that matched an existing CV keep that record's id; look those up in one query
+        hashes = [candidate.get("sha256") for candidate in candidates if candidate.get("sha256")]
+        stored = {}
+        if hashes:
+            cursor = self.expected_candidates.find({"cvSha256": {"$in": hashes}}, {"cvSha256": 1})
+            async for document in cursor:
+                stored[document["cvSha256"]] = document["_id"]
+        
+        ids = []
+        duplicates = []
+        for candidate, candidate_id, error in zip(candidates, candidate_ids, errors):
+            final_id = stored.get(candidate.get("sha256"), candidate_id) if candidate.get("sha256") else candidate_id
+            ids.append(str(final_id) if error is None else None)
+            duplicates.append(error is None and final_id != candidate_id)
+        return {
+            "success": all(error is None for error in errors),
+            "candidate_ids": ids,
+            "duplicates": duplicates,
+            "errors": errors
+        }
+    
     async def get_expected_candidates(self, limit: int = 50) -> Dict[str, Any]:
         """
         Get all expected candidates
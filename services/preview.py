@@ -0,0 +1,179 @@
+"""
+Body preview extraction
+Builds a short visible-text preview from a message, decoding only as much of the body as the preview needs
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import Iterable, Optional
+
+from .imap_parser import TransferDecoder
+
+# Encoded characters handed to the decoders per step
+PREVIEW_CHUNK_CHARS = 1024
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _PreviewText:
+    """Collects whitespace-collapsed text up to a character limit"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._parts = []
+        self._length = 0
+        self._pending_space = False
+
+    @property
+    def full(self) -> bool:
+        return self._length >= self.limit
+
+    def add(self, text: str):
+        if self.full or not text:
+            return
+        if text[:1].isspace():
+            self._pending_space = True
+        words = _WHITESPACE.sub(" ", text).strip()
+        if words:
+            if self._pending_space and self._length:
+                words = " " + words
+            self._parts.append(words[:self.limit - self._length])
+            self._length += len(self._parts[-1])
+            self._pending_space = False
+        if text[-1:].isspace():
+            self._pending_space = True
+
+    def separate(self):
+        """Force a space before the next text, e.g. at an HTML block boundary"""
+        self._pending_space = True
+
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+class _HTMLText(HTMLParser):
+    """Streaming HTML-to-text: drops tags, comments, scripts and styles; resolves entities"""
+
+    HIDDEN_TAGS = {"script", "style", "head", "title", "template", "noscript"}
+    BLOCK_TAGS = {"br", "p", "div", "li", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6",
+                  "table", "ul", "ol", "blockquote", "hr", "section", "article"}
+
+    def __init__(self, preview: _PreviewText):
+        super().__init__(convert_charrefs=True)
+        self.preview = preview
+        self._hidden_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.HIDDEN_TAGS:
+            self._hidden_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.preview.separate()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.BLOCK_TAGS:
+            self.preview.separate()
+
+    def handle_endtag(self, tag):
+        if tag in self.HIDDEN_TAGS:
+            self._hidden_depth = max(0, self._hidden_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.preview.separate()
+
+    def handle_data(self, data):
+        if not self._hidden_depth:
+            self.preview.add(data)
+
+
+def _text_decoder(charset: str):
+    try:
+        return codecs.getincrementaldecoder(charset or "utf-8")(errors="ignore")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+
+def preview_from_chunks(chunks: Iterable[bytes], encoding: str, charset: str = "",
+                        content_type: str = "text/plain", limit: int = 200,
+                        preview: Optional[_PreviewText] = None) -> str:
+    """
+    Visible text from transfer-encoded body chunks, stopping once limit characters are collected
+
+    Args:
+        chunks: Encoded body, in order; may end early (e.g. a partial FETCH)
+        encoding: Content-Transfer-Encoding of the part
+        charset: Charset of the decoded text
+        content_type: text/plain or text/html; HTML is reduced to its visible text
+        limit: Characters wanted
+
+    Returns:
+        Up to limit characters with whitespace collapsed
+    """
+    preview = preview or _PreviewText(limit)
+    transfer = TransferDecoder(encoding)
+    text = _text_decoder(charset)
+    html = _HTMLText(preview) if content_type == "text/html" else None
+    feed = html.feed if html is not None else preview.add
+
+    for chunk in chunks:
+        try:
+            feed(text.decode(transfer.decode(chunk)))
+        except Exception:
+            break
+        if preview.full:
+            return preview.text()
+
+    try:
+        feed(text.decode(transfer.flush(), final=True))
+        if html is not None:
+            html.close()
+    except Exception:
+        pass
+    return preview.text()
+
+
+def _payload_chunks(part) -> Iterable[bytes]:
+    """A part's still-encoded payload in slices, the way Message.get_payload(decode=True) would read it"""
+    payload = part.get_payload()
+    if not isinstance(payload, str):
+        return
+    for start in range(0, len(payload), PREVIEW_CHUNK_CHARS):
+        piece = payload[start:start + PREVIEW_CHUNK_CHARS]
+        try:
+            yield piece.encode("ascii", "surrogateescape")
+        except UnicodeEncodeError:
+            yield piece.encode("raw-unicode-escape")
+
+
+def extract_preview(email_message, limit: int = 200) -> str:
+    """
+    Preview of a parsed message's body
+
+    Uses the inline text/plain parts when there are any and only falls back to the first
+    inline text/html part otherwise; either way decoding stops once limit characters are found.
+    """
+    plain_parts = []
+    html_part = None
+    for part in email_message.walk():
+        if part.is_multipart() or "attachment" in str(part.get("Content-Disposition")):
+            continue
+        content_type = part.get_content_type()
+        if content_type == "text/plain":
+            plain_parts.append(part)
+        elif content_type == "text/html" and html_part is None:
+            html_part = part
+
+    parts = plain_parts or ([html_part] if html_part is not None else [])
+    preview = _PreviewText(limit)
+    for part in parts:
+        preview.separate()
+        preview_from_chunks(
+            _payload_chunks(part),
+            str(part.get("Content-Transfer-Encoding", "7bit")).strip(),
+            part.get_content_charset() or "",
+            part.get_content_type(),
+            limit,
+            preview
+        )
+        if preview.full:
+            break
+    return preview.text()
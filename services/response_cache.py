@@ -0,0 +1,106 @@
+"""
+Response cache
+Rendered responses keyed by request and validated against the mailbox state they were built from
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+
+def state_etag(*parts) -> str:
+    """Strong ETag over everything a response depends on (mailbox state, config version, request)"""
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers the given ETag"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 asks for on If-None-Match
+    return "*" in candidates or etag in [candidate[2:] if candidate.startswith("W/") else candidate
+                                         for candidate in candidates]
+
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: float) -> bool:
+    """Whether an If-Modified-Since header is at or after last_modified"""
+    if not if_modified_since:
+        return False
+    try:
+        return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered responses with a TTL"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300.0):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Responses kept; the least recently used is evicted first
+            ttl: Seconds a response may be served, even if its mailbox state still matches
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Cache key for a request; hashed so credentials in the query never sit in memory as keys"""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str, etag: str) -> Optional[Dict]:
+        """The cached response for key if it was built for this ETag and hasn't expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["etag"] != etag or time.time() - entry["created_at"] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, etag: str, body: bytes, media_type: str, headers: Optional[Dict[str, str]] = None,
+            last_modified: Optional[float] = None) -> Dict:
+        """Store a rendered response and return its entry"""
+        now = time.time()
+        entry = {
+            "etag": etag,
+            "body": body,
+            "media_type": media_type,
+            "headers": dict(headers or {}),
+            "last_modified": last_modified or now,
+            "created_at": now
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
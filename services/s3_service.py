@@ -1,12 +1,48 @@
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 import os
-from typing import Dict, Any
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, BinaryIO, Iterable, Iterator, Optional, Union
 import uuid
 from datetime import datetime
+from .blob_index import BlobIndex
+
+def s3_relative_path(upload_result: dict) -> str:
+    """Path of an uploaded file as stored in MongoDB"""
+    s3_url = upload_result["s3_url"]
+    # Remove the base URL part: https://bridge-cv-dev.s3.us-east-2.amazonaws.com
+    base_url = "https://bridge-cv-dev.s3.us-east-2.amazonaws.com"
+    if s3_url.startswith(base_url):
+        return s3_url.replace(base_url, "")
+    # Fallback: try to extract path from any S3 URL format
+    return "/" + upload_result["key"]
 
 class S3Service:
-    def __init__(self, access_key: str, secret_key: str, region: str = 'us-east-1'):
+    # S3 rejects multipart parts smaller than 5 MB (except the last one)
+    MIN_PART_SIZE = 5 * 1024 * 1024
+    
+    # Attachments at or above this size are sent as multipart uploads
+    DEFAULT_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+    DEFAULT_PART_SIZE = 8 * 1024 * 1024
+    DEFAULT_MAX_CONCURRENCY = 4
+    
+    # Decoded chunks read ahead of a streaming upload
+    STREAM_BUFFER_CHUNKS = 2
+    
+    # S3 error codes worth retrying later
+    RETRYABLE_ERROR_CODES = {
+        'RequestTimeout', 'RequestTimeTooSkewed', 'SlowDown', 'InternalError',
+        'ServiceUnavailable', 'Throttling', 'ThrottlingException'
+    }
+
+    def __init__(self, access_key: str, secret_key: str, region: str = 'us-east-1',
+                 max_pool_connections: int = 10, multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+                 part_size: int = DEFAULT_PART_SIZE, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 blob_index: Optional[BlobIndex] = None):
         """
         Initialize S3 service with AWS credentials
         
@@ -14,10 +50,25 @@ class S3Service:
             access_key: AWS Access Key ID
             secret_key: AWS Secret Access Key
             region: AWS region (default: us-east-1)
+            max_pool_connections: HTTP connections kept open to S3; the client is thread-safe and
+                meant to be shared, so size this to the number of concurrent uploads
+            multipart_threshold: Size in bytes from which uploads switch to multipart
+            part_size: Size in bytes of each multipart part (at least 5 MB)
+            max_concurrency: Parts uploaded in parallel per upload
+            blob_index: Optional index of content hashes already in S3; matching uploads are skipped
         """
         self.access_key = access_key
         self.secret_key = secret_key
         self.region = region
+        self.part_size = max(part_size, self.MIN_PART_SIZE)
+        self.multipart_threshold = max(multipart_threshold, 1)
+        self.max_concurrency = max(1, max_concurrency)
+        self.blob_index = blob_index
+        
+        # Streaming uploads block on their source, so they get threads apart from the default executor
+        self._stream_executor = ThreadPoolExecutor(
+            max_workers=max(1, max_pool_connections), thread_name_prefix="s3-stream"
+        )
         
         try:
             # Initialize S3 client
@@ -25,7 +76,13 @@ class S3Service:
                 's3',
                 aws_access_key_id=access_key,
                 aws_secret_access_key=secret_key,
-                region_name=region
+                region_name=region,
+                config=Config(
+                    max_pool_connections=max_pool_connections,
+                    connect_timeout=5,
+                    read_timeout=60,
+                    retries={'max_attempts': 3, 'mode': 'standard'}
+                )
             )
         except Exception as e:
             raise e
@@ -44,59 +101,140 @@ class S3Service:
         Returns:
             Dict with upload result information
         """
+        return self.upload_stream(bucket_name, attachment_data, filename, folder)
+    
+    def _iter_source(self, source: Union[bytes, BinaryIO, Iterable[bytes]]) -> Iterator[bytes]:
+        """Yield chunks from bytes, a file-like object or an iterable of bytes"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            yield bytes(source)
+        elif hasattr(source, "read"):
+            while True:
+                chunk = source.read(self.part_size)
+                if not chunk:
+                    break
+                yield chunk
+        else:
+            for chunk in source:
+                if chunk:
+                    yield chunk
+    
+    def _hashing(self, chunks: Iterator[bytes], digest) -> Iterator[bytes]:
+        """Feed every chunk into a hash as it streams past"""
+        for chunk in chunks:
+            digest.update(chunk)
+            yield chunk
+    
+    def _upload_result(self, bucket_name: str, s3_key: str, filename: str, size: int, sha256: str,
+                       deduplicated: bool) -> Dict[str, Any]:
+        # Generate S3 URL
+        s3_url = f"https://{bucket_name}.s3.{self.region}.amazonaws.com/{s3_key}"
+        
+        return {
+            "success": True,
+            "message": f"{filename} already in S3" if deduplicated else f"Successfully uploaded {filename} to S3",
+            "s3_url": s3_url,
+            "bucket": bucket_name,
+            "key": s3_key,
+            "filename": s3_key.split("/")[-1],
+            "original_filename": filename,
+            "size": size,
+            "sha256": sha256,
+            "deduplicated": deduplicated
+        }
+    
+    def upload_stream(self, bucket_name: str, source: Union[bytes, BinaryIO, Iterable[bytes]], filename: str,
+                      folder: str = "emailCV") -> Dict[str, Any]:
+        """
+        Upload an attachment from a stream without holding all of it in memory
+        
+        Uploads up to the multipart threshold go out as one PutObject; larger ones switch to a
+        multipart upload with up to max_concurrency parts in flight, so memory stays around
+        part_size x (max_concurrency + 1).
+        
+        The SHA-256 of the content is computed while it streams. With a blob index, content
+        already in the bucket is not uploaded again: small files skip the PutObject, and a
+        multipart upload that turns out to be a duplicate is deleted once its hash is known.
+        
+        Args:
+            bucket_name: Name of the S3 bucket
+            source: bytes, a file-like object or an iterable of decoded chunks
+            filename: Original filename
+            folder: Folder name in bucket (default: emailCV)
+            
+        Returns:
+            Dict with upload result information
+        """
+        upload_id = None
+        s3_key = None
         try:
-            # Generate unique filename to avoid conflicts
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_extension = os.path.splitext(filename)[1] if '.' in filename else ''
-            unique_filename = f"{timestamp}_{uuid.uuid4().hex[:8]}_{filename}"
-            
-            # Create S3 key (path) for the file
-            s3_key = f"{folder}/{unique_filename}"
-            
-            # Upload file to S3
-            self.s3_client.put_object(
-                Bucket=bucket_name,
-                Key=s3_key,
-                Body=attachment_data,
-                ContentType=self._get_content_type(filename),
-                Metadata={
+            object_args = {
+                "Bucket": bucket_name,
+                "ContentType": self._get_content_type(filename),
+                "Metadata": {
                     'original-filename': filename,
                     'upload-timestamp': timestamp,
                     'uploaded-by': 'email-parser-app'
                 }
-            )
+            }
             
-            # Generate S3 URL
-            s3_url = f"https://{bucket_name}.s3.{self.region}.amazonaws.com/{s3_key}"
+            digest = hashlib.sha256()
+            chunks = self._hashing(self._iter_source(source), digest)
+            buffer = bytearray()
             
-            result = {
-                "success": True,
-                "message": f"Successfully uploaded {filename} to S3",
-                "s3_url": s3_url,
-                "bucket": bucket_name,
-                "key": s3_key,
-                "filename": unique_filename,
-                "original_filename": filename,
-                "size": len(attachment_data)
-            }
+            # Buffer up to the threshold; anything smaller is a single PutObject
+            for chunk in chunks:
+                buffer += chunk
+                if len(buffer) >= self.multipart_threshold:
+                    break
+            
+            if len(buffer) < self.multipart_threshold:
+                sha256 = digest.hexdigest()
+                existing = self.blob_index.lookup(bucket_name, sha256) if self.blob_index else None
+                if existing is not None:
+                    return self._upload_result(bucket_name, existing["key"], filename, existing["size"], sha256, True)
+                
+                # The content hash replaces the random part of the key
+                s3_key = f"{folder}/{timestamp}_{sha256[:8]}_{filename}"
+                object_args["Metadata"]["sha256"] = sha256
+                self.s3_client.put_object(Key=s3_key, Body=bytes(buffer), **object_args)
+                size = len(buffer)
+            else:
+                # The hash is only known once every part has streamed through
+                s3_key = f"{folder}/{timestamp}_{uuid.uuid4().hex[:8]}_{filename}"
+                upload_id = self.s3_client.create_multipart_upload(Key=s3_key, **object_args)["UploadId"]
+                size = self._upload_parts(bucket_name, s3_key, upload_id, buffer, chunks)
+                upload_id = None
+                
+                sha256 = digest.hexdigest()
+                existing = self.blob_index.lookup(bucket_name, sha256) if self.blob_index else None
+                if existing is not None:
+                    self.s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
+                    return self._upload_result(bucket_name, existing["key"], filename, existing["size"], sha256, True)
+            
+            if self.blob_index is not None:
+                self.blob_index.record(bucket_name, sha256, s3_key, size)
             
-            return result
+            return self._upload_result(bucket_name, s3_key, filename, size, sha256, False)
             
         except NoCredentialsError:
             error_msg = "AWS credentials not found or invalid"
             return {
                 "success": False,
                 "error": error_msg,
-                "message": "Please check your AWS credentials"
+                "message": "Please check your AWS credentials",
+                "retryable": False
             }
             
         except ClientError as e:
             error_code = e.response['Error']['Code']
             error_msg = f"AWS S3 error: {error_code} - {e.response['Error']['Message']}"
+            status_code = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
             return {
                 "success": False,
                 "error": error_msg,
-                "message": f"Failed to upload to S3: {error_code}"
+                "message": f"Failed to upload to S3: {error_code}",
+                "retryable": error_code in self.RETRYABLE_ERROR_CODES or status_code >= 500
             }
             
         except Exception as e:
@@ -104,8 +242,127 @@ class S3Service:
             return {
                 "success": False,
                 "error": error_msg,
-                "message": "An unexpected error occurred during upload"
+                "message": "An unexpected error occurred during upload",
+                "retryable": True
             }
+        
+        finally:
+            if upload_id is not None:
+                # Don't leave billed, invisible parts behind after a failure
+                try:
+                    self.s3_client.abort_multipart_upload(Bucket=bucket_name, Key=s3_key, UploadId=upload_id)
+                except Exception:
+                    pass
+    
+    def _upload_parts(self, bucket_name: str, s3_key: str, upload_id: str, buffer: bytearray,
+                      chunks: Iterator[bytes]) -> int:
+        """Upload buffered and remaining chunks as parts in parallel; returns the total size"""
+        in_flight = threading.BoundedSemaphore(self.max_concurrency)
+        futures = []
+        size = 0
+        
+        def upload_part(number: int, data: bytes) -> Dict[str, Any]:
+            try:
+                response = self.s3_client.upload_part(
+                    Bucket=bucket_name, Key=s3_key, UploadId=upload_id, PartNumber=number, Body=data
+                )
+                return {"PartNumber": number, "ETag": response["ETag"]}
+            finally:
+                in_flight.release()
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            def submit(data: bytes):
+                # Wait for a free slot so at most max_concurrency parts sit in memory
+                in_flight.acquire()
+                futures.append(executor.submit(upload_part, len(futures) + 1, data))
+            
+            while True:
+                while len(buffer) >= self.part_size:
+                    submit(bytes(buffer[:self.part_size]))
+                    del buffer[:self.part_size]
+                    size += self.part_size
+                    # Surface a failed part before reading more of the source
+                    for future in futures:
+                        if future.done():
+                            future.result()
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                buffer += chunk
+            
+            if buffer:
+                submit(bytes(buffer))
+                size += len(buffer)
+            
+            parts = [future.result() for future in futures]
+        
+        self.s3_client.complete_multipart_upload(
+            Bucket=bucket_name, Key=s3_key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+        return size
+    
+    async def upload_stream_async(self, bucket_name: str, chunks: AsyncIterator[bytes], filename: str,
+                                  folder: str = "emailCV") -> Dict[str, Any]:
+        """
+        Upload from an async iterator of decoded chunks, e.g. AsyncEmailService.iter_attachment_data
+        
+        A task on the event loop reads the source into a small bounded buffer, so it is read no
+        faster than S3 accepts it. The upload blocks on that buffer from a thread of its own
+        executor: sources like AsyncEmailService fetch each chunk on the default executor, and an
+        upload waiting there could starve the very thread it waits for.
+        """
+        loop = asyncio.get_running_loop()
+        buffer = asyncio.Queue(maxsize=self.STREAM_BUFFER_CHUNKS)
+        end = object()
+        stop = asyncio.Event()
+        
+        async def produce():
+            source = chunks.__aiter__()
+            try:
+                # Checked before every fetch, so a stopped upload pulls no further chunk from IMAP
+                while not stop.is_set():
+                    try:
+                        chunk = await source.__anext__()
+                    except StopAsyncIteration:
+                        await buffer.put(end)
+                        return
+                    await buffer.put(chunk)
+            except Exception as e:
+                if not stop.is_set():
+                    await buffer.put(e)
+        
+        def pull() -> Iterator[bytes]:
+            while True:
+                item = asyncio.run_coroutine_threadsafe(buffer.get(), loop).result()
+                if item is end:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        
+        producer = asyncio.create_task(produce())
+        try:
+            return await loop.run_in_executor(
+                self._stream_executor, self.upload_stream, bucket_name, pull(), filename, folder
+            )
+        finally:
+            # Free a producer blocked on a full buffer; it stops before reading another chunk
+            stop.set()
+            while not buffer.empty():
+                buffer.get_nowait()
+            await producer
+            # A cancelled upload may still wait for data in its thread; make it abort, not hang
+            while not buffer.empty():
+                buffer.get_nowait()
+            buffer.put_nowait(Exception("Upload stopped before the source was read"))
+            # Only close the source once no read is in flight
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+    
+    def close(self):
+        """Shut down the streaming upload threads; call once no upload is running"""
+        self._stream_executor.shutdown(wait=True, cancel_futures=True)
     
     def _get_content_type(self, filename: str) -> str:
         """Get content type based on file extension"""
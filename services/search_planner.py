@@ -0,0 +1,155 @@
+"""
+Search planner
+Turns job categories and listing options into server-side searches so only relevant UIDs are fetched
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+
+def _gmail_phrase(text: str) -> str:
+    # Gmail has no escape for quotes inside a phrase; they only split words anyway
+    return '"' + " ".join(text.replace('"', " ").split()) + '"'
+
+
+def imap_string(text: str) -> str:
+    """Quote a string argument for an IMAP command"""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class SearchPlanner:
+    """
+    Builds Gmail X-GM-RAW queries, or plain IMAP SEARCH criteria for other servers
+
+    The server-side match is a prefilter: Gmail matches whole words and IMAP SUBJECT
+    matches substrings, so results are still classified locally.
+    """
+
+    def __init__(self, job_categories: Dict[str, List[str]], unread_only: bool = True,
+                 has_attachment: bool = False, newer_than_days: Optional[int] = None,
+                 after: Optional[date] = None, label: Optional[str] = None):
+        """
+        Initialize the planner
+
+        Args:
+            job_categories: Mapping of category name to the job titles that identify it
+            unread_only: Only unread messages
+            has_attachment: Only messages with attachments
+            newer_than_days: Only messages received within this many days
+            after: Only messages received on or after this date
+            label: Only messages with this Gmail label; plain IMAP searches the selected mailbox instead
+        """
+        self.job_categories = job_categories
+        self.unread_only = unread_only
+        self.has_attachment = has_attachment
+        self.newer_than_days = newer_than_days
+        self.after = after
+        self.label = label
+
+    def keywords(self, categories: Optional[List[str]] = None) -> List[str]:
+        """Distinct job titles of the given categories (all of them by default), in config order"""
+        names = categories if categories is not None else list(self.job_categories)
+        seen = {}
+        for name in names:
+            for keyword in self.job_categories.get(name, []):
+                normalized = " ".join(keyword.lower().split())
+                if normalized:
+                    seen.setdefault(normalized, None)
+        return list(seen)
+
+    def _since(self) -> Optional[date]:
+        """Earliest date allowed by newer_than_days and after together"""
+        dates = []
+        if self.newer_than_days is not None:
+            dates.append((datetime.now() - timedelta(days=self.newer_than_days)).date())
+        if self.after is not None:
+            dates.append(self.after)
+        return max(dates) if dates else None
+
+    def gmail_query(self, categories: Optional[List[str]] = None) -> str:
+        """
+        X-GM-RAW query, e.g. 'is:unread has:attachment newer_than:7d subject:("software engineer" OR "prompt engineer")'
+
+        Returns an empty string if the categories have no job titles; nothing can match.
+        """
+        keywords = self.keywords(categories)
+        if not keywords:
+            return ""
+
+        terms = []
+        if self.unread_only:
+            terms.append("is:unread")
+        if self.has_attachment:
+            terms.append("has:attachment")
+        if self.newer_than_days is not None:
+            terms.append(f"newer_than:{self.newer_than_days}d")
+        if self.after is not None:
+            terms.append(f"after:{self.after.strftime('%Y/%m/%d')}")
+        if self.label:
+            terms.append(f"label:{_gmail_phrase(self.label)}")
+
+        phrases = [_gmail_phrase(keyword) for keyword in keywords]
+        terms.append(f"subject:{phrases[0]}" if len(phrases) == 1 else f"subject:({' OR '.join(phrases)})")
+        return " ".join(terms)
+
+    def imap_criteria(self, categories: Optional[List[str]] = None) -> List[List[Union[str, bytes]]]:
+        """
+        Plain IMAP SEARCH criteria for the same filter, as searches whose results are combined
+
+        ASCII titles share one OR search. imaplib sends one literal per command, so every
+        non-ASCII title gets a CHARSET UTF-8 search of its own, with the title as a bytes
+        item at the end to be sent as a literal. has_attachment is approximated by a
+        multipart/mixed Content-Type header, and label is ignored (select the label's mailbox
+        instead). Returns an empty list if nothing can match.
+        """
+        keywords = self.keywords(categories)
+        if not keywords:
+            return []
+
+        criteria = []
+        if self.unread_only:
+            criteria.append("UNSEEN")
+        if self.has_attachment:
+            criteria += ["HEADER", "Content-Type", imap_string("multipart/mixed")]
+        since = self._since()
+        if since is not None:
+            criteria += ["SINCE", since.strftime("%d-%b-%Y")]
+
+        searches = []
+        # OR takes two keys, so n titles need n - 1 nested ORs in prefix form
+        subject_keys = [["SUBJECT", imap_string(keyword)] for keyword in keywords if keyword.isascii()]
+        if subject_keys:
+            search = criteria + ["OR"] * (len(subject_keys) - 1)
+            for key in subject_keys:
+                search += key
+            searches.append(search)
+        for keyword in keywords:
+            if not keyword.isascii():
+                searches.append(["CHARSET", "UTF-8"] + criteria + ["SUBJECT", keyword.encode("utf-8")])
+        return searches
+
+    def plans(self, gmail: bool, per_category: bool = False,
+              categories: Optional[List[str]] = None) -> Dict[Optional[str], object]:
+        """
+        Searches to run: one combined OR query keyed by None, or one per category
+
+        Values are an X-GM-RAW string on Gmail and a list of searches elsewhere; categories
+        without job titles are left out.
+
+        Args:
+            gmail: Whether the server supports X-GM-RAW
+            per_category: One search per category instead of a combined one
+            categories: Only these categories (all of them by default)
+        """
+        build = self.gmail_query if gmail else self.imap_criteria
+        names = categories if categories is not None else list(self.job_categories)
+        if not per_category:
+            plan = build(names)
+            return {None: plan} if plan else {}
+
+        plans = {}
+        for name in names:
+            plan = build([name])
+            if plan:
+                plans[name] = plan
+        return plans
@@ -0,0 +1,344 @@
+"""
+Upload job queue
+Persists upload jobs in SQLite and runs them on a pool of asyncio workers with retry and backoff
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RetryableJobError(Exception):
+    """A transient failure; the job is retried with backoff until it runs out of attempts"""
+
+    def __init__(self, message: str, result: Optional[Dict] = None):
+        super().__init__(message)
+        self.result = result
+
+
+class JobStore:
+    """
+    SQLite-backed record of queued, running and finished jobs
+
+    Several processes may share the database (e.g. uvicorn --workers). A job's password lives
+    only in the memory of the process that accepted it, so every job records that process as
+    its owner and only the owner claims it. Owners heartbeat while running; the unfinished jobs
+    of an owner that stopped heartbeating can never run and are failed by the next sweep.
+    """
+
+    def __init__(self, path: str = "upload_jobs.db", owner: Optional[str] = None):
+        """
+        Open (or create) the job database
+
+        Args:
+            path: SQLite database file; ":memory:" keeps jobs in process
+            owner: Id of this process in the job table; unique per process start by default
+        """
+        self.path = path
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                next_run_at REAL NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, next_run_at);
+            CREATE TABLE IF NOT EXISTS owners (
+                owner TEXT PRIMARY KEY,
+                heartbeat_at REAL NOT NULL
+            );
+        """)
+        # Databases created before jobs had owners
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._db.commit()
+
+    def _row(self, row) -> Dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def enqueue(self, payload: Dict, max_attempts: int, job_id: Optional[str] = None) -> str:
+        """Store a new queued job and return its id (a new one unless job_id is given)"""
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, payload, max_attempts, next_run_at, created_at, updated_at, owner) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(payload), max_attempts, now, now, now, self.owner)
+            )
+            self._db.commit()
+        return job_id
+
+    def claim(self) -> Optional[Dict]:
+        """Mark this process's oldest due job as running and return it"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND owner = ? AND next_run_at <= ? "
+                "ORDER BY next_run_at LIMIT 1",
+                (self.owner, now)
+            ).fetchone()
+            if row is None:
+                return None
+            # The status guard keeps the claim exclusive even if another connection races for the row
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (now, row["id"])
+            )
+            self._db.commit()
+            if cursor.rowcount == 0:
+                return None
+        job = self._row(row)
+        job["status"] = "running"
+        job["attempts"] += 1
+        return job
+
+    def finish(self, job_id: str, status: str, result: Optional[Dict], error: Optional[str] = None):
+        """Record a final outcome: 'succeeded' or 'failed'"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+            self._db.commit()
+
+    def reschedule(self, job_id: str, delay: float, error: str, result: Optional[Dict] = None):
+        """Put a job back in the queue after a transient failure"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', next_run_at = ?, error = ?, result = ?, updated_at = ? WHERE id = ?",
+                (now + delay, error, json.dumps(result) if result is not None else None, now, job_id)
+            )
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a job, or None if unknown"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def next_due_at(self) -> Optional[float]:
+        """When this process's earliest queued job becomes due"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(next_run_at) AS due FROM jobs WHERE status = 'queued' AND owner = ?", (self.owner,)
+            ).fetchone()
+        return row["due"]
+
+    def heartbeat(self):
+        """Record that this process is alive and still running its jobs"""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO owners (owner, heartbeat_at) VALUES (?, ?) "
+                "ON CONFLICT (owner) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (self.owner, time.time())
+            )
+            self._db.commit()
+
+    def retire(self):
+        """Stop heartbeating for good; unfinished jobs of this process become orphans"""
+        with self._lock:
+            self._db.execute("DELETE FROM owners WHERE owner = ?", (self.owner,))
+            self._db.commit()
+
+    def fail_unfinished(self, error: str, stale_after: float) -> int:
+        """
+        Fail the queued or running jobs of owners that stopped heartbeating
+
+        Their in-memory credentials died with the process, so nothing can run them. Jobs of
+        live processes, including this one, are left alone.
+
+        Args:
+            error: Error recorded on the failed jobs
+            stale_after: Seconds without a heartbeat after which an owner counts as gone
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? "
+                "WHERE status IN ('queued', 'running') AND owner IS NOT ? "
+                "AND (owner IS NULL OR owner NOT IN (SELECT owner FROM owners WHERE heartbeat_at >= ?))",
+                (error, now, self.owner, now - stale_after)
+            )
+            self._db.execute("DELETE FROM owners WHERE heartbeat_at < ?", (now - stale_after,))
+            self._db.commit()
+        return cursor.rowcount
+
+    def prune(self, older_than: float) -> int:
+        """Delete finished jobs last updated more than older_than seconds ago"""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+                (time.time() - older_than,)
+            )
+            self._db.commit()
+        return cursor.rowcount
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._db.close()
+
+
+class UploadWorkerPool:
+    """
+    Runs queued jobs on asyncio workers; secrets such as passwords stay in memory only
+
+    Every JobStore call runs in a worker thread, so SQLite never blocks the event loop.
+    """
+
+    # How often this process heartbeats and sweeps up the jobs of processes that stopped
+    HEARTBEAT_SECONDS = 30
+    # Owners silent this long are gone
+    STALE_AFTER_SECONDS = 3 * HEARTBEAT_SECONDS
+    # Pause after a worker's store call fails, so a broken database isn't retried in a tight loop
+    ERROR_DELAY_SECONDS = 5
+    ORPHANED_ERROR = "Server restarted before the upload finished; please upload again"
+
+    def __init__(self, store: JobStore, handler: Callable[[Dict, str], Awaitable[Tuple[bool, Dict]]],
+                 workers: int = 4, max_attempts: int = 5, base_delay: float = 2.0, max_delay: float = 120.0):
+        """
+        Initialize the worker pool
+
+        Args:
+            store: Where jobs are persisted
+            handler: Coroutine taking (payload, secret) and returning (succeeded, result);
+                raises RetryableJobError for transient failures
+            workers: Jobs run concurrently
+            max_attempts: Attempts before a job is failed for good
+            base_delay: First retry delay in seconds; doubles per attempt
+            max_delay: Upper bound on the retry delay
+        """
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._secrets: Dict[str, str] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks = []
+
+    async def submit(self, payload: Dict, secret: str) -> str:
+        """Queue a job and return its id"""
+        # The secret is in place before the row exists, so a worker never claims a job without it
+        job_id = uuid.uuid4().hex
+        self._secrets[job_id] = secret
+        try:
+            await asyncio.to_thread(self.store.enqueue, payload, self.max_attempts, job_id)
+        except Exception:
+            self._secrets.pop(job_id, None)
+            raise
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with jitter so retries of a shared outage don't arrive together"""
+        delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _run_job(self, job: Dict):
+        job_id = job["id"]
+        secret = self._secrets.get(job_id)
+        if secret is None:
+            await asyncio.to_thread(
+                self.store.finish, job_id, "failed", None, "Credentials are no longer available; please upload again"
+            )
+            return
+
+        try:
+            succeeded, result = await self.handler(job["payload"], secret)
+        except Exception as e:
+            result = e.result if isinstance(e, RetryableJobError) else None
+            if isinstance(e, RetryableJobError) and job["attempts"] < job["max_attempts"]:
+                await asyncio.to_thread(self.store.reschedule, job_id, self.retry_delay(job["attempts"]), str(e), result)
+                return
+            await asyncio.to_thread(self.store.finish, job_id, "failed", result, str(e))
+        else:
+            await asyncio.to_thread(self.store.finish, job_id, "succeeded" if succeeded else "failed", result)
+
+        # Finished for good; the password is no longer needed
+        self._secrets.pop(job_id, None)
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+                if job is not None:
+                    await self._run_job(job)
+                    continue
+                due = await asyncio.to_thread(self.store.next_due_at)
+            except Exception:
+                # A database error must not end the worker; the job stays for the next claim or sweep
+                logger.exception("Upload worker could not reach the job store")
+                await asyncio.sleep(self.ERROR_DELAY_SECONDS)
+                continue
+
+            # Sleep until a job is submitted or the next retry falls due
+            timeout = max(0.0, due - time.time()) if due is not None else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_SECONDS)
+            try:
+                await asyncio.to_thread(self.store.heartbeat)
+                # Another process may have died since the last sweep
+                await asyncio.to_thread(self.store.fail_unfinished, self.ORPHANED_ERROR, self.STALE_AFTER_SECONDS)
+            except Exception:
+                # One missed beat is harmless; a dead heartbeat task would let other processes fail our jobs
+                logger.exception("Upload job heartbeat failed")
+
+    def start(self):
+        """Start the workers on the running event loop"""
+        if self._tasks:
+            return
+        self.store.heartbeat()
+        # Jobs left over from a dead process can't run: their passwords were never persisted
+        self.store.fail_unfinished(self.ORPHANED_ERROR, self.STALE_AFTER_SECONDS)
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._heartbeat()))
+
+    async def stop(self):
+        """Cancel the workers; jobs in progress are failed by the next sweep of any process"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.store.retire)
@@ -0,0 +1,220 @@
+"""
+Minimal threaded IMAP server for tests
+Serves text messages, optionally with one attachment, with just the commands EmailService uses
+"""
+
+import email
+import re
+import socketserver
+import threading
+import time
+from email.message import EmailMessage
+from typing import List, Optional, Tuple
+
+
+def make_message(index: int, subject: str, attachment: Optional[Tuple[str, bytes]] = None) -> bytes:
+    """A message from candidate index; attachment is a (filename, data) PDF"""
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = f"Candidate {index} <candidate{index}@example.org>"
+    message["To"] = "jobs@example.com"
+    message["Date"] = "Mon, 01 Jan 2024 10:00:%02d +0000" % (index % 60)
+    message["Message-ID"] = f"<message{index}@example.org>"
+    message.set_content(f"Please find my application number {index}.")
+    if attachment is not None:
+        filename, data = attachment
+        message.add_attachment(data, maintype="application", subtype="pdf", filename=filename)
+    return message.as_bytes().replace(b"\n", b"\r\n")
+
+
+def _sections(message) -> List[Tuple[str, object, bytes]]:
+    """(section number, part, transfer-encoded body) of every leaf part, one multipart level deep"""
+    parts = message.get_payload() if message.is_multipart() else [message]
+    return [
+        (str(number), part, part.get_payload().replace("\r\n", "\n").replace("\n", "\r\n").encode())
+        for number, part in enumerate(parts, 1)
+    ]
+
+
+def _bodystructure(message) -> str:
+    leaves = []
+    for _, part, body in _sections(message):
+        maintype, subtype = part.get_content_type().upper().split("/")
+        encoding = (part.get("Content-Transfer-Encoding") or "7bit").upper()
+        if part.get_filename():
+            filename = part.get_filename()
+            leaves.append(
+                f'("{maintype}" "{subtype}" ("NAME" "{filename}") NIL NIL "{encoding}" {len(body)} NIL '
+                f'("ATTACHMENT" ("FILENAME" "{filename}")) NIL)'
+            )
+        else:
+            charset = part.get_content_charset() or "us-ascii"
+            lines = body.count(b"\r\n")
+            leaves.append(f'("{maintype}" "{subtype}" ("CHARSET" "{charset}") NIL NIL "{encoding}" {len(body)} {lines})')
+    return "(" + "".join(leaves) + ' "MIXED")' if message.is_multipart() else leaves[0]
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    """
+    One INBOX of messages, unread unless their UID is in seen; every command sleeps for delay seconds
+
+    The server has no CONDSTORE, so clients learn about flag changes only by searching.
+    max_in_flight records the most commands the server was handling at the same time,
+    across all connections.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, messages: List[bytes], delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.messages = messages
+        self.delay = delay
+        self.seen = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "FakeIMAPServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def command_started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def command_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def _parse_set(text: str, largest: int) -> set:
+    uids = set()
+    for part in text.split(","):
+        low, _, high = part.partition(":")
+        low = largest if low == "*" else int(low)
+        high = low if not high else (largest if high == "*" else int(high))
+        uids.update(range(min(low, high), max(low, high) + 1))
+    return uids
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def send(self, line):
+        self.wfile.write((line.encode() if isinstance(line, str) else line) + b"\r\n")
+        self.wfile.flush()
+
+    def handle(self):
+        self.send("* OK fake IMAP ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode().rstrip("\r\n").partition(" ")
+            command, _, arguments = rest.partition(" ")
+            command = command.upper()
+
+            self.server.command_started()
+            try:
+                time.sleep(self.server.delay)
+                getattr(self, f"do_{command.lower()}", self.do_unknown)(tag, arguments)
+            finally:
+                self.server.command_finished()
+            if command == "LOGOUT":
+                return
+
+    def do_unknown(self, tag, arguments):
+        self.send(f"{tag} BAD unknown command")
+
+    def do_capability(self, tag, arguments):
+        self.send("* CAPABILITY IMAP4rev1")
+        self.send(f"{tag} OK done")
+
+    def do_login(self, tag, arguments):
+        self.send(f"{tag} OK logged in")
+
+    def do_select(self, tag, arguments):
+        messages = self.server.messages
+        self.send(f"* {len(messages)} EXISTS")
+        self.send("* OK [UIDVALIDITY 1] UIDs valid")
+        self.send(f"* OK [UIDNEXT {len(messages) + 1}] next UID")
+        self.send(f"{tag} OK [READ-WRITE] SELECT completed")
+
+    def do_status(self, tag, arguments):
+        count = len(self.server.messages)
+        values = {"MESSAGES": count, "UIDNEXT": count + 1, "UIDVALIDITY": 1, "UNSEEN": count - len(self.server.seen)}
+        name, _, items = arguments.partition(" (")
+        self.send(f"* STATUS {name} (" + " ".join(f"{item} {values[item]}" for item in items.rstrip(")").split()) + ")")
+        self.send(f"{tag} OK done")
+
+    def do_noop(self, tag, arguments):
+        self.send(f"{tag} OK done")
+
+    def do_close(self, tag, arguments):
+        self.send(f"{tag} OK done")
+
+    def do_logout(self, tag, arguments):
+        self.send("* BYE")
+        self.send(f"{tag} OK done")
+
+    def do_uid(self, tag, arguments):
+        subcommand, _, rest = arguments.partition(" ")
+        count = len(self.server.messages)
+        if subcommand.upper() == "SEARCH":
+            match = re.search(r"UID (\S+)", rest)
+            uids = sorted(_parse_set(match.group(1), count) & set(range(1, count + 1))) if match else range(1, count + 1)
+            if "UNSEEN" in rest.upper().split():
+                uids = [uid for uid in uids if uid not in self.server.seen]
+            header = re.search(r'HEADER Message-ID "([^"]*)"', rest, re.IGNORECASE)
+            if header:
+                uids = [uid for uid in uids
+                        if email.message_from_bytes(self.server.messages[uid - 1])["Message-ID"] == header.group(1)]
+            # SUBJECT keys only ever come OR-ed together, so any one of them matches
+            subjects = [subject.lower() for subject in re.findall(r'SUBJECT "([^"]*)"', rest, re.IGNORECASE)]
+            if subjects:
+                uids = [uid for uid in uids if any(
+                    subject in email.message_from_bytes(self.server.messages[uid - 1])["Subject"].lower()
+                    for subject in subjects
+                )]
+            self.send("* SEARCH" + "".join(f" {uid}" for uid in uids))
+        elif subcommand.upper() == "FETCH":
+            uid_set, _, items = rest.partition(" ")
+            for uid in sorted(_parse_set(uid_set, count) & set(range(1, count + 1))):
+                self.send(self._fetch(uid, items))
+        self.send(f"{tag} OK done")
+
+    def _fetch(self, uid: int, items: str) -> bytes:
+        raw = self.server.messages[uid - 1]
+        header = raw.partition(b"\r\n\r\n")[0]
+        message = email.message_from_bytes(raw)
+        fields = [f"UID {uid}".encode()]
+        if "FLAGS" in items:
+            fields.append(b"FLAGS (\\Seen)" if uid in self.server.seen else b"FLAGS ()")
+        if "RFC822.SIZE" in items:
+            fields.append(f"RFC822.SIZE {len(raw)}".encode())
+        if "BODYSTRUCTURE" in items:
+            fields.append(f"BODYSTRUCTURE {_bodystructure(message)}".encode())
+        header_fields = re.search(r"HEADER\.FIELDS \(([^)]*)\)", items)
+        if header_fields:
+            names = header_fields.group(1).lower().split()
+            lines = [line for line in header.split(b"\r\n") if line.split(b":")[0].decode().lower() in names]
+            data = b"\r\n".join(lines) + b"\r\n\r\n"
+            fields.append(f"BODY[HEADER.FIELDS ({header_fields.group(1)})] {{{len(data)}}}\r\n".encode() + data)
+        sections = {number: body for number, _, body in _sections(message)}
+        for section, start, length in re.findall(r"BODY\.PEEK\[(\d+)\](?:<(\d+)\.(\d+)>)?", items):
+            body = sections.get(section, b"")
+            if start:
+                data = body[int(start):int(start) + int(length)]
+                fields.append(f"BODY[{section}]<{start}> {{{len(data)}}}\r\n".encode() + data)
+            else:
+                fields.append(f"BODY[{section}] {{{len(body)}}}\r\n".encode() + body)
+        return f"* {uid} FETCH (".encode() + b" ".join(fields) + b")"
@@ -0,0 +1,83 @@
+"""
+"Upload all in category" must expand the category from the same classified listing /emails
+renders, so an email filed under a title only because of its attachment name is uploaded too.
+"""
+
+import asyncio
+import imaplib
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Keep the app's local stores out of the working tree
+os.environ.setdefault("EMAIL_CACHE_PATH", ":memory:")
+os.environ.setdefault("BLOB_INDEX_PATH", ":memory:")
+os.environ.setdefault("UPLOAD_JOBS_PATH", ":memory:")
+
+import main
+from fake_imap import FakeIMAPServer, make_message
+from services.imap_pool import IMAPConnectionPool
+from services.message_cache import MessageCache
+
+CV = b"%PDF-1.4 software engineer resume"
+
+
+class FakeS3:
+    def __init__(self):
+        self.uploads = {}
+
+    def upload_attachment(self, bucket_name, attachment_data, filename, folder):
+        self.uploads[filename] = attachment_data
+        return {
+            "success": True,
+            "s3_url": f"https://{bucket_name}.s3.amazonaws.com/{folder}/{filename}",
+            "key": f"{folder}/{filename}",
+            "size": len(attachment_data),
+            "sha256": "0" * 64,
+            "deduplicated": False
+        }
+
+
+@pytest.fixture
+def fake_imap(monkeypatch):
+    messages = [
+        # Only the attachment name says which role this is for
+        make_message(1, "My application", attachment=("Software_Engineer_CV.pdf", CV)),
+        make_message(2, "Application for Process Engineer", attachment=("process.pdf", b"%PDF-1.4 process")),
+    ]
+    server = FakeIMAPServer(messages).start()
+
+    class PlainIMAP(imaplib.IMAP4):
+        def __init__(self, host="", port=993, ssl_context=None, timeout=None):
+            super().__init__("127.0.0.1", server.port, timeout=timeout)
+
+    s3 = FakeS3()
+    monkeypatch.setattr(imaplib, "IMAP4_SSL", PlainIMAP)
+    monkeypatch.setattr(main, "imap_pool", IMAPConnectionPool(max_sessions_per_account=4))
+    monkeypatch.setattr(main, "message_cache", MessageCache(":memory:"))
+    monkeypatch.setattr(main, "s3_service", s3)
+    monkeypatch.setattr(main, "mongodb_service", None)
+    monkeypatch.setattr(main.service_health, "is_healthy", lambda name: True)
+    yield s3
+    server.stop()
+
+
+def test_category_match_from_attachment_name_is_uploaded(fake_imap):
+    async def upload():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.post("/upload-to-s3/bulk", json={
+                "email": "jobs@example.com",
+                "password": "app-password",
+                "category": "Software Engineer"
+            })
+
+    response = asyncio.run(upload())
+
+    assert response.status_code == 200
+    assert fake_imap.uploads == {"Software_Engineer_CV.pdf": CV}
@@ -0,0 +1,72 @@
+"""
+Two /emails requests must be served concurrently: AsyncEmailService runs IMAP calls
+in worker threads, so one slow mailbox never blocks the event loop for another request.
+"""
+
+import asyncio
+import imaplib
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Keep the app's local stores out of the working tree
+os.environ.setdefault("EMAIL_CACHE_PATH", ":memory:")
+os.environ.setdefault("BLOB_INDEX_PATH", ":memory:")
+os.environ.setdefault("UPLOAD_JOBS_PATH", ":memory:")
+
+import main
+from fake_imap import FakeIMAPServer, make_message
+from services.imap_pool import IMAPConnectionPool
+from services.message_cache import MessageCache
+
+# Seconds the fake server spends on every IMAP command
+COMMAND_DELAY = 0.05
+
+
+@pytest.fixture
+def fake_imap(monkeypatch):
+    messages = [make_message(index, f"Application for Software Engineer #{index}") for index in range(1, 6)]
+    server = FakeIMAPServer(messages, delay=COMMAND_DELAY).start()
+
+    class PlainIMAP(imaplib.IMAP4):
+        def __init__(self, host="", port=993, ssl_context=None, timeout=None):
+            super().__init__("127.0.0.1", server.port, timeout=timeout)
+
+    monkeypatch.setattr(imaplib, "IMAP4_SSL", PlainIMAP)
+    monkeypatch.setattr(main, "imap_pool", IMAPConnectionPool(max_sessions_per_account=4))
+    monkeypatch.setattr(main, "message_cache", MessageCache(":memory:"))
+    main.response_cache.clear()
+    yield server
+    server.stop()
+
+
+def test_two_email_listings_overlap(fake_imap):
+    spans = {}
+
+    async def fetch(client, account):
+        started = time.perf_counter()
+        response = await client.get("/emails", params={"email": account, "password": "app-password"})
+        spans[account] = (started, time.perf_counter(), response)
+
+    async def fetch_both():
+        # One event loop serves both requests, as uvicorn would
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            await asyncio.gather(fetch(client, "first@example.com"), fetch(client, "second@example.com"))
+
+    asyncio.run(fetch_both())
+
+    for started, finished, response in spans.values():
+        assert response.status_code == 200
+        assert "Application for Software Engineer #5" in response.text
+
+    # Both requests were inside the server at once, each waiting on its own IMAP command
+    assert fake_imap.max_in_flight >= 2
+    (first_start, first_end, _), (second_start, second_end, _) = spans.values()
+    assert max(first_start, second_start) < min(first_end, second_end)
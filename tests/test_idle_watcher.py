@@ -0,0 +1,87 @@
+"""
+The IDLE loop must notice a mailbox event that arrived in the same packet as an earlier line:
+imaplib has already buffered it, so the socket itself never becomes readable again.
+A page must also be sent mail that arrived between its render and the watcher's first sync.
+"""
+
+import asyncio
+import imaplib
+import os
+import socket
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_imap import FakeIMAPServer, make_message
+from services.email_service import EmailService
+from services.idle_watcher import MailboxWatcher
+from services.message_cache import MessageCache
+
+
+def test_buffered_line_is_readable_without_new_socket_data():
+    client, server = socket.socketpair()
+    mail = SimpleNamespace(sock=client, file=client.makefile("rb"))
+    watcher = MailboxWatcher("jobs@example.com", "app-password", MessageCache(":memory:"))
+
+    server.sendall(b"* OK Still here\r\n* 4 EXISTS\r\n")
+    assert watcher._wait_readable(mail)
+    assert mail.file.readline() == b"* OK Still here\r\n"
+
+    # The EXISTS line now sits in imaplib's buffer with nothing left on the socket
+    started = time.monotonic()
+    assert watcher._wait_readable(mail)
+    assert time.monotonic() - started < watcher.POLL_INTERVAL_SECONDS
+    assert mail.file.readline() == b"* 4 EXISTS\r\n"
+
+    # Nothing buffered and nothing sent: one poll interval passes, and reads still block normally
+    watcher.POLL_INTERVAL_SECONDS = 0.05
+    assert not watcher._wait_readable(mail)
+    server.sendall(b"* 5 EXISTS\r\n")
+    assert mail.file.readline() == b"* 5 EXISTS\r\n"
+    client.close()
+    server.close()
+
+
+@pytest.fixture
+def fake_imap(monkeypatch):
+    messages = [make_message(index, f"Application for Software Engineer #{index}") for index in range(1, 3)]
+    server = FakeIMAPServer(messages).start()
+
+    class PlainIMAP(imaplib.IMAP4):
+        def __init__(self, host="", port=993, ssl_context=None, timeout=None):
+            super().__init__("127.0.0.1", server.port, timeout=timeout)
+
+    monkeypatch.setattr(imaplib, "IMAP4_SSL", PlainIMAP)
+    yield server
+    server.stop()
+
+
+def test_mail_arriving_before_first_sync_reaches_the_page(fake_imap):
+    cache = MessageCache(":memory:")
+    page = EmailService("jobs@example.com", "app-password", cache=cache).get_unread_emails(listing_mode=True)
+    rendered_uids = {record.uid for record in page}
+    assert rendered_uids == {1, 2}
+
+    # Arrives after the render; the watcher's first sync already includes it
+    fake_imap.messages.append(make_message(3, "Application for Software Engineer #3"))
+
+    async def first_sync():
+        watcher = MailboxWatcher("jobs@example.com", "app-password", cache)
+        queue = watcher.subscribe(rendered_uids)
+        watcher.service.connect()
+        try:
+            watcher._publish_changes()
+        finally:
+            watcher.service.disconnect()
+        await asyncio.sleep(0)
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    events = asyncio.run(first_sync())
+
+    assert [(event["type"], event.get("email", {}).get("uid")) for event in events] == [("upsert", 3), ("status", None)]
+    assert events[-1]["total"] == 3
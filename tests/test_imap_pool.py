@@ -0,0 +1,48 @@
+"""
+A pooled session that reconnects and retries a command must send the command's literal again.
+"""
+
+import imaplib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.email_service import EmailService
+from services.imap_pool import PooledSession
+
+
+class FakeConnection:
+    """Records the literal each UID command was sent with; the first connection drops"""
+
+    def __init__(self, sent, drop):
+        self.literal = None
+        self.sent = sent
+        self.drop = drop
+
+    def uid(self, command, *args):
+        self.sent.append((command, args, self.literal))
+        self.literal = None
+        if self.drop:
+            raise imaplib.IMAP4.abort("socket error: EOF")
+        return "OK", [b"3 7"]
+
+    def logout(self):
+        pass
+
+
+def test_retry_after_reconnect_resends_literal():
+    sent = []
+    connections = iter([FakeConnection(sent, drop=True), FakeConnection(sent, drop=False)])
+    session = PooledSession(("jobs@example.com", "hash", "INBOX"), lambda: next(connections))
+
+    service = EmailService("jobs@example.com", "app-password")
+    service.mail = session
+    title = "Ingénieur logiciel".encode("utf-8")
+
+    assert service._search_uids("CHARSET", "UTF-8", "SUBJECT", title) == [3, 7]
+    assert [literal for _, _, literal in sent] == [title, title]
+
+    # The literal belongs to that one command
+    service._search_uids("ALL")
+    assert sent[-1][2] is None
@@ -0,0 +1,56 @@
+"""
+An EmailService given a MimeParserPool must build the same listing records in the worker
+processes as it does in the calling thread.
+"""
+
+import imaplib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_imap import FakeIMAPServer, make_message
+from services.email_service import EmailService
+from services.mime_parser import MimeParserPool
+
+
+@pytest.fixture
+def fake_imap(monkeypatch):
+    messages = [
+        make_message(index, f"Application for Software Engineer #{index}", attachment=(f"cv_{index}.pdf", b"%PDF-1.4"))
+        for index in range(1, 6)
+    ]
+    server = FakeIMAPServer(messages).start()
+
+    class PlainIMAP(imaplib.IMAP4):
+        def __init__(self, host="", port=993, ssl_context=None, timeout=None):
+            super().__init__("127.0.0.1", server.port, timeout=timeout)
+
+    monkeypatch.setattr(imaplib, "IMAP4_SSL", PlainIMAP)
+    yield server
+    server.stop()
+
+
+def listing(parser_pool=None):
+    service = EmailService("jobs@example.com", "app-password", parser_pool=parser_pool)
+    service.connect()
+    try:
+        return service.fetch_listing([1, 2, 3, 4, 5])
+    finally:
+        service.disconnect()
+
+
+def test_pooled_listing_matches_in_thread(fake_imap):
+    pool = MimeParserPool(workers=2, chunk_size=2, min_batch=0)
+    try:
+        pooled = listing(pool)
+    finally:
+        pool.close()
+
+    in_thread = listing()
+    assert len(in_thread) == 5
+    assert in_thread[0]["attachments"][0]["filename"] == "cv_1.pdf"
+    assert pooled == in_thread
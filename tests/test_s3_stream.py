@@ -0,0 +1,45 @@
+"""
+A streaming upload that stops early must not pull another chunk from its source, and
+close() must shut the streaming threads down.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.s3_service import S3Service
+
+
+def test_stopped_upload_fetches_no_further_chunk():
+    service = S3Service("access-key", "secret-key", "us-east-2")
+    fetched = []
+
+    async def source():
+        for index in range(100):
+            fetched.append(index)
+            yield b"x" * 1024
+
+    def failing_upload(bucket_name, chunks, filename, folder):
+        # Give the producer time to fill the buffer and block on it
+        time.sleep(0.2)
+        raise RuntimeError("S3 rejected the upload")
+
+    service.upload_stream = failing_upload
+
+    async def upload():
+        with pytest.raises(RuntimeError):
+            await service.upload_stream_async("bucket", source(), "cv.pdf")
+
+    asyncio.run(upload())
+
+    # The buffer's worth of chunks plus the one the producer was holding; nothing after the stop
+    assert len(fetched) == S3Service.STREAM_BUFFER_CHUNKS + 1
+
+    service.close()
+    with pytest.raises(RuntimeError):
+        service._stream_executor.submit(print)
@@ -0,0 +1,51 @@
+"""
+The listing cache must follow read/unread changes on servers without CONDSTORE, where
+STATUS shows no difference when a message is only marked read.
+"""
+
+import imaplib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_imap import FakeIMAPServer, make_message
+from services.email_service import EmailService
+from services.message_cache import MessageCache
+
+
+@pytest.fixture
+def fake_imap(monkeypatch):
+    messages = [make_message(index, f"Application for Software Engineer #{index}") for index in range(1, 4)]
+    server = FakeIMAPServer(messages).start()
+
+    class PlainIMAP(imaplib.IMAP4):
+        def __init__(self, host="", port=993, ssl_context=None, timeout=None):
+            super().__init__("127.0.0.1", server.port, timeout=timeout)
+
+    monkeypatch.setattr(imaplib, "IMAP4_SSL", PlainIMAP)
+    yield server
+    server.stop()
+
+
+def unread_subjects(cache: MessageCache):
+    service = EmailService("jobs@example.com", "app-password", cache=cache)
+    return [record.subject for record in service.get_unread_emails(listing_mode=True)]
+
+
+def test_flag_only_change_reaches_cache_without_condstore(fake_imap):
+    cache = MessageCache(":memory:")
+    assert len(unread_subjects(cache)) == 3
+
+    # Read on another client: UIDNEXT and MESSAGES stay the same
+    fake_imap.seen.add(2)
+    subjects = unread_subjects(cache)
+    assert len(subjects) == 2
+    assert "Application for Software Engineer #2" not in subjects
+
+    # And marked unread again
+    fake_imap.seen.discard(2)
+    assert len(unread_subjects(cache)) == 3
@@ -0,0 +1,64 @@
+"""
+Upload workers must keep running when the job store fails, and a submitted job must run
+with the secret it was submitted with.
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.upload_queue import JobStore, UploadWorkerPool
+
+
+def test_heartbeat_survives_store_errors():
+    store = JobStore(":memory:")
+    beats = []
+    heartbeat = store.heartbeat
+
+    def flaky_heartbeat():
+        beats.append(len(beats))
+        if len(beats) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        heartbeat()
+
+    async def run():
+        pool = UploadWorkerPool(store, handler=None, workers=1)
+        pool.HEARTBEAT_SECONDS = 0.01
+        pool.start()
+        store.heartbeat = flaky_heartbeat
+        await asyncio.sleep(0.2)
+        alive = not pool._tasks[-1].done()
+        await pool.stop()
+        return alive
+
+    assert asyncio.run(run())
+    assert len(beats) >= 2
+
+
+def test_submitted_job_runs_with_its_secret():
+    store = JobStore(":memory:")
+    seen = []
+
+    async def handler(payload, secret):
+        seen.append((payload["filename"], secret))
+        return True, {"key": payload["filename"]}
+
+    async def run():
+        pool = UploadWorkerPool(store, handler, workers=2)
+        pool.start()
+        job_id = await pool.submit({"filename": "cv.pdf"}, "app-password")
+        for _ in range(100):
+            job = store.get(job_id)
+            if job["status"] not in ("queued", "running"):
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"key": "cv.pdf"}
+    assert seen == [("cv.pdf", "app-password")]
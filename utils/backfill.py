@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Historical Mailbox Backfill
+Walks a mailbox by UID range, uploads the CVs of categorized emails to S3 and records the
+candidates in MongoDB. A checkpoint written after every chunk lets an interrupted run resume.
+
+Re-running a chunk is safe: S3 uploads are deduplicated by content hash (blob index) and
+candidates are upserted by CV hash, so nothing is stored twice.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.blob_index import BlobIndex
+from services.categorizer import UNCATEGORIZED
+from services.email_service import EmailService
+from services.imap_pool import IMAPConnectionPool
+from services.mime_parser import MimeParserPool
+from services.mongodb_service import MongoDBService
+from services.s3_service import S3Service, s3_relative_path
+
+# Load environment variables
+load_dotenv()
+
+
+def load_checkpoint(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as checkpoint_file:
+        return json.load(checkpoint_file)
+
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    """Write the checkpoint atomically so a crash mid-write never leaves a torn file"""
+    checkpoint["updated_at"] = datetime.utcnow().isoformat() + "Z"
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file, indent=2)
+    os.replace(temporary, path)
+
+
+class Backfill:
+    """Processes one mailbox chunk by chunk with parallel IMAP sessions and concurrent S3 uploads"""
+
+    def __init__(self, email_address: str, password: str, mailbox: str = "INBOX", sessions: int = 4,
+                 upload_workers: int = 8, s3_service: Optional[S3Service] = None,
+                 mongodb_service: Optional[MongoDBService] = None, bucket_name: Optional[str] = None,
+                 folder: str = "emailCvs", parser_pool: Optional[MimeParserPool] = None):
+        """
+        Initialize the backfill
+
+        Args:
+            email_address: Account to read
+            password: Account (app) password
+            mailbox: Folder to walk
+            sessions: IMAP sessions fetching in parallel
+            upload_workers: Concurrent S3 uploads
+            s3_service: Where CVs go; without S3 and MongoDB the run only counts (dry run)
+            mongodb_service: Where candidate records go
+            bucket_name: S3 bucket
+            folder: Folder inside the bucket
+            parser_pool: Worker processes that build the listing records; without it every
+                         fetching session parses its own slice, all of them sharing one core
+        """
+        self.email_address = email_address
+        self.password = password
+        self.mailbox = mailbox
+        self.sessions = max(1, sessions)
+        self.pool = IMAPConnectionPool(max_sessions_per_account=self.sessions, acquire_timeout=300)
+        self.fetch_executor = ThreadPoolExecutor(max_workers=self.sessions, thread_name_prefix="backfill-fetch")
+        self.upload_workers = max(1, upload_workers)
+        self.s3_service = s3_service
+        self.mongodb_service = mongodb_service
+        self.bucket_name = bucket_name
+        self.folder = folder
+        self.parser_pool = parser_pool
+
+    @property
+    def dry_run(self) -> bool:
+        return self.s3_service is None
+
+    def _service(self) -> EmailService:
+        return EmailService(self.email_address, self.password, pool=self.pool, mailbox=self.mailbox,
+                            parser_pool=self.parser_pool)
+
+    def list_uids(self, after_uid: int = 0) -> Dict:
+        """UIDVALIDITY and every UID above after_uid, in one SEARCH"""
+        service = self._service()
+        service.connect()
+        try:
+            uids = [uid for uid in service._search_uids("UID", f"{after_uid + 1}:*") if uid > after_uid]
+            return {"uidvalidity": service.current_uidvalidity(), "uids": uids}
+        finally:
+            service.disconnect()
+
+    def _fetch_slice(self, uids: List[int], enqueue: Callable[[Tuple], None]) -> Dict:
+        """
+        One session's share of a chunk: listing, classification and the attachments of categorized emails
+
+        Args:
+            uids: UIDs of the slice
+            enqueue: Hands one (email, category, attachment, data) upload to the upload workers;
+                     blocks while the queue is full, so at most a queue's worth of attachments is held
+
+        Returns:
+            Dict with the message count, the attachment count and bytes fetched
+        """
+        service = self._service()
+        service.connect()
+        try:
+            records = service.fetch_listing(uids)
+            fetched_bytes = service.last_fetch_stats.get("bytes", 0)
+
+            targets = []
+            categories = {}
+            for email_data, result in zip(records, service.classify_emails(records)):
+                if result["category"] == UNCATEGORIZED:
+                    continue
+                for attachment in email_data["attachments"]:
+                    targets.append((email_data["uid"], attachment))
+                    categories[(email_data["uid"], attachment["part"])] = (email_data, result["category"])
+
+            if not self.dry_run:
+                for uid, attachment, data in service.iter_attachments(targets):
+                    email_data, category = categories[(uid, attachment["part"])]
+                    fetched_bytes += len(data)
+                    enqueue((email_data, category, attachment, data))
+            return {
+                "messages": len(records),
+                "attachments": len(targets),
+                "bytes": fetched_bytes
+            }
+        finally:
+            service.disconnect()
+
+    async def _upload(self, upload) -> Dict:
+        email_data, category, attachment, data = upload
+        try:
+            result = await asyncio.to_thread(
+                self.s3_service.upload_attachment,
+                bucket_name=self.bucket_name,
+                attachment_data=data,
+                filename=attachment["filename"],
+                folder=self.folder
+            )
+        except Exception as e:
+            # A worker must keep draining the queue, or the fetching sessions would block on it
+            result = {"success": False, "error": str(e), "retryable": True}
+        result.update({
+            "message_id": email_data["message_id"],
+            "attachment_filename": attachment["filename"],
+            "job_category": category
+        })
+        return result
+
+    async def run_chunk(self, uids: List[int]) -> Dict:
+        """
+        Process one chunk of UIDs, split evenly across the IMAP sessions
+
+        Attachments go from the fetching sessions to the upload workers through a bounded queue,
+        so uploads start with the first attachment and memory stays at a queue's worth of files.
+
+        Raises when the chunk should be retried as a whole (IMAP errors, throttling, retryable
+        S3 failures or an unreachable database); permanent per-file failures are returned.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.upload_workers)
+        results = []
+
+        def enqueue(upload):
+            asyncio.run_coroutine_threadsafe(queue.put(upload), loop).result()
+
+        async def upload_worker():
+            while True:
+                upload = await queue.get()
+                if upload is None:
+                    return
+                results.append(await self._upload(upload))
+
+        workers = [asyncio.create_task(upload_worker()) for _ in range(self.upload_workers)]
+        share = -(-len(uids) // self.sessions)
+        try:
+            # Slices wait on the queue, so they get their own threads; uploads keep the default executor
+            slices = await asyncio.gather(*(
+                loop.run_in_executor(self.fetch_executor, self._fetch_slice, uids[start:start + share], enqueue)
+                for start in range(0, len(uids), share)
+            ), return_exceptions=True)
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        # Every slice and upload has finished before a retry starts over, so two attempts never overlap
+        for fetched in slices:
+            if isinstance(fetched, BaseException):
+                raise fetched
+
+        summary = {"messages": 0, "attachments": 0, "uploaded": 0, "bytes": 0, "candidates": 0, "failed": []}
+        uploaded = []
+        for fetched in slices:
+            for key in ("messages", "attachments", "bytes"):
+                summary[key] += fetched[key]
+        for result in results:
+            if result["success"]:
+                uploaded.append(result)
+            elif result.get("retryable"):
+                raise Exception(f"S3 upload of {result['attachment_filename']} failed: {result.get('error')}")
+            else:
+                summary["failed"].append({
+                    "message_id": result["message_id"],
+                    "filename": result["attachment_filename"],
+                    "error": result.get("error")
+                })
+        summary["uploaded"] = len(uploaded)
+
+        # One bulk write for every CV of the chunk
+        if uploaded and self.mongodb_service is not None:
+            db_result = await self.mongodb_service.create_expected_candidates([
+                {
+                    "name": result["attachment_filename"],
+                    "job_posting": result["job_category"],
+                    "cv_file_path": s3_relative_path(result),
+                    "sha256": result["sha256"]
+                }
+                for result in uploaded
+            ])
+            if db_result.get("error"):
+                raise Exception(db_result["error"])
+            for result, error in zip(uploaded, db_result["errors"]):
+                if error is None:
+                    summary["candidates"] += 1
+                else:
+                    summary["failed"].append({
+                        "message_id": result["message_id"],
+                        "filename": result["attachment_filename"],
+                        "error": error
+                    })
+        return summary
+
+    def close(self):
+        self.fetch_executor.shutdown(wait=False)
+        self.pool.close_all()
+        if self.parser_pool is not None:
+            self.parser_pool.close()
+
+
+async def run(args) -> int:
+    password = os.getenv(args.password_env)
+    if not password:
+        print(f"❌ Set {args.password_env} to the account's app password")
+        return 1
+
+    s3_service = None
+    mongodb_service = None
+    blob_index = None
+    bucket_name = os.getenv("S3_BUCKET_NAME")
+    if not args.dry_run:
+        if not all([os.getenv("AWS_ACCESS_KEY_ID"), os.getenv("AWS_SECRET_ACCESS_KEY"), bucket_name]):
+            print("❌ Missing AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY or S3_BUCKET_NAME (or pass --dry-run)")
+            return 1
+        blob_index = BlobIndex(os.getenv("BLOB_INDEX_PATH", "blob_index.db"))
+        s3_service = S3Service(
+            os.getenv("AWS_ACCESS_KEY_ID"), os.getenv("AWS_SECRET_ACCESS_KEY"), os.getenv("AWS_REGION", "us-east-2"),
+            max_pool_connections=max(10, args.upload_workers * 2),
+            blob_index=blob_index
+        )
+        mongodb_service = MongoDBService(max_pool_size=4)
+
+    parser_pool = None
+    if args.parse_workers > 0:
+        parser_pool = MimeParserPool(workers=args.parse_workers)
+        parser_pool.warm_up()
+
+    backfill = Backfill(
+        args.email, password, mailbox=args.mailbox, sessions=args.sessions, upload_workers=args.upload_workers,
+        s3_service=s3_service, mongodb_service=mongodb_service, bucket_name=bucket_name,
+        folder=os.getenv("S3_CV_FOLDER", "emailCvs"), parser_pool=parser_pool
+    )
+
+    try:
+        checkpoint = load_checkpoint(args.checkpoint)
+        if checkpoint and (checkpoint["account"] != args.email.lower() or checkpoint["mailbox"] != args.mailbox):
+            print(f"❌ {args.checkpoint} belongs to {checkpoint['account']} / {checkpoint['mailbox']}")
+            return 1
+
+        after_uid = checkpoint["last_uid"] if checkpoint else args.start_uid - 1
+        listing = backfill.list_uids(after_uid)
+        if checkpoint and checkpoint["uidvalidity"] != listing["uidvalidity"]:
+            # The server renumbered the mailbox; the stored position means nothing any more
+            print(f"❌ UIDVALIDITY of {args.mailbox} changed; delete {args.checkpoint} to start over")
+            return 1
+
+        if checkpoint is None:
+            checkpoint = {
+                "account": args.email.lower(),
+                "mailbox": args.mailbox,
+                "uidvalidity": listing["uidvalidity"],
+                "last_uid": after_uid,
+                "totals": {"messages": 0, "attachments": 0, "uploaded": 0, "candidates": 0, "bytes": 0},
+                "failed": []
+            }
+        else:
+            print(f"↩️  Resuming after UID {after_uid}")
+
+        uids = [uid for uid in listing["uids"] if args.end_uid is None or uid <= args.end_uid]
+        chunks = [uids[start:start + args.chunk_size] for start in range(0, len(uids), args.chunk_size)]
+        print(f"📬 {len(uids):,} messages to process in {len(chunks)} chunks of up to {args.chunk_size} "
+              f"with {args.sessions} IMAP sessions{' (dry run)' if backfill.dry_run else ''}")
+
+        started = time.perf_counter()
+        done_messages = 0
+        done_bytes = 0
+        for number, chunk in enumerate(chunks, 1):
+            chunk_started = time.perf_counter()
+            for attempt in range(args.max_retries + 1):
+                try:
+                    summary = await backfill.run_chunk(chunk)
+                    break
+                except Exception as e:
+                    if attempt == args.max_retries:
+                        print(f"❌ Chunk {number} failed {attempt + 1} times: {e}")
+                        print(f"💾 Progress is saved up to UID {checkpoint['last_uid']}; run the same command to resume")
+                        return 1
+                    # Gmail throttles bursts ([THROTTLED], too many connections); back off and redo the chunk
+                    delay = min(args.retry_delay * 2 ** attempt, 300)
+                    print(f"⚠️  Chunk {number} failed ({e}); retrying in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+
+            totals = checkpoint["totals"]
+            for key in totals:
+                totals[key] += summary[key]
+            checkpoint["failed"].extend(summary["failed"])
+            checkpoint["last_uid"] = chunk[-1]
+            save_checkpoint(args.checkpoint, checkpoint)
+
+            done_messages += summary["messages"]
+            done_bytes += summary["bytes"]
+            chunk_seconds = time.perf_counter() - chunk_started
+            elapsed = time.perf_counter() - started
+            print(f"✅ Chunk {number}/{len(chunks)} UIDs {chunk[0]}-{chunk[-1]}: {summary['messages']} messages, "
+                  f"{summary['attachments']} CVs found, {summary['uploaded']} uploaded, {summary['candidates']} candidates, {len(summary['failed'])} failed | "
+                  f"{summary['messages'] / chunk_seconds:,.1f} msg/s {summary['bytes'] / chunk_seconds / 2**20:,.2f} MB/s | "
+                  f"overall {done_messages / elapsed:,.1f} msg/s {done_bytes / elapsed / 2**20:,.2f} MB/s")
+
+        totals = checkpoint["totals"]
+        print("-" * 50)
+        print(f"🎉 Done: {totals['messages']:,} messages, {totals['uploaded']:,} CVs uploaded, "
+              f"{totals['candidates']:,} candidates, {len(checkpoint['failed'])} failures (listed in {args.checkpoint})")
+        return 0
+    finally:
+        backfill.close()
+        if s3_service is not None:
+            s3_service.close()
+        if mongodb_service is not None:
+            await mongodb_service.close_connection()
+        if blob_index is not None:
+            blob_index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill historical applications from a mailbox into S3 and MongoDB")
+    parser.add_argument("email", help="Gmail address to read")
+    parser.add_argument("--password-env", default="BACKFILL_PASSWORD",
+                        help="Environment variable holding the app password (default: BACKFILL_PASSWORD)")
+    parser.add_argument("--mailbox", default="INBOX", help="Folder or label to walk (default: INBOX)")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json", help="Checkpoint file to resume from")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Messages per chunk and checkpoint")
+    parser.add_argument("--sessions", type=int, default=4, help="Parallel IMAP sessions")
+    parser.add_argument("--upload-workers", type=int, default=8, help="Concurrent S3 uploads")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="Processes that parse fetched headers (default: 0, parse in the fetching sessions)")
+    parser.add_argument("--start-uid", type=int, default=1, help="First UID of a fresh run")
+    parser.add_argument("--end-uid", type=int, default=None, help="Stop after this UID")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries per chunk before giving up")
+    parser.add_argument("--retry-delay", type=float, default=10.0, help="Seconds before the first retry; doubles each time")
+    parser.add_argument("--dry-run", action="store_true", help="List and categorize only; upload nothing")
+    args = parser.parse_args()
+    args.chunk_size = max(1, args.chunk_size)
+
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
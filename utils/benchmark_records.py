@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Email Record Memory Benchmark
+Compares the memory held by plain dict email records and compact EmailRecord objects
+"""
+
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.email_record import EmailRecord, format_size
+
+SENDERS = [f"Recruiter {index} <recruiter{index}@agency{index % 20}.com>" for index in range(200)]
+TITLES = ["Software Engineer", "Prompt Engineer", "Process Engineer", "Data Analyst", "Product Manager"]
+
+
+def build_rows(count: int):
+    """Serialized records shaped like parse_listing output, as the message cache stores them"""
+    rng = random.Random(3)
+    rows = []
+    for uid in range(1, count + 1):
+        attachments = []
+        for index in range(rng.choice([0, 1, 1, 2])):
+            size = rng.randrange(50_000, 2_000_000)
+            attachments.append({
+                "filename": f"cv_{uid}_{index}.pdf",
+                "content_type": "application/pdf",
+                "size": size,
+                "size_display": format_size(size),
+                "icon": "📄",
+                "extension": "pdf",
+                "part": str(index + 2),
+                "encoding": "base64"
+            })
+        rows.append(json.dumps({
+            "subject": f"Application for {rng.choice(TITLES)} #{uid}",
+            "sender": rng.choice(SENDERS),
+            "recipient": "jobs@example.com",
+            "date": f"2025-10-{rng.randrange(1, 29):02d} 09:30:00",
+            "body": "Dear hiring team, please find my CV attached. " * 4,
+            "message_id": f"<{uid}.{rng.randrange(10**9)}@mail.example.org>",
+            "has_attachments": bool(attachments),
+            "attachments": attachments,
+            "uid": uid
+        }))
+    return rows
+
+
+def measure(build):
+    """Bytes still allocated once build() returns, i.e. what keeping its result costs"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    print(f"📊 Email record memory benchmark: {count:,} records")
+    rows = build_rows(count)
+
+    dict_bytes, dicts = measure(lambda: [json.loads(row) for row in rows])
+    print(f"🐘 Plain dicts: {dict_bytes / 2**20:,.1f} MB ({dict_bytes / count:,.0f} B/record)")
+
+    record_bytes, records = measure(lambda: [EmailRecord.from_dict(json.loads(row)) for row in rows])
+    print(f"🪶 EmailRecord: {record_bytes / 2**20:,.1f} MB ({record_bytes / count:,.0f} B/record)")
+    print(f"💾 Saved: {(1 - record_bytes / dict_bytes) * 100:.0f}%")
+
+    # Mapping access must give back exactly the dicts the cache stored
+    mismatches = sum(record.to_dict() != data for record, data in zip(records, dicts))
+    print("✅ Records round-trip" if mismatches == 0 else f"❌ {mismatches} records differ")
+
+
+if __name__ == "__main__":
+    main()
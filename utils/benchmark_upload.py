@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Upload Latency Benchmark
+Calls /upload-to-s3 repeatedly against a running server and reports per-upload latency.
+Run it before and after a change to compare; every call really uploads a file and inserts a record.
+"""
+
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: benchmark_upload.py <message_id> <filename> [runs]")
+        print("Reads BENCHMARK_SERVER_URL, BENCHMARK_EMAIL and BENCHMARK_PASSWORD from the environment")
+        sys.exit(1)
+
+    message_id, filename = sys.argv[1], sys.argv[2]
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    server_url = os.getenv("BENCHMARK_SERVER_URL", "http://localhost:8000")
+    params = {
+        "email_address": os.getenv("BENCHMARK_EMAIL"),
+        "password": os.getenv("BENCHMARK_PASSWORD"),
+        "message_id": message_id,
+        "filename": filename,
+        "job_category": "Benchmark"
+    }
+
+    print(f"⏱️  Uploading {filename} {runs} times via {server_url}")
+    latencies = []
+    stages = {}
+    with httpx.Client(timeout=120) as client:
+        for run in range(1, runs + 1):
+            started = time.perf_counter()
+            response = client.post(f"{server_url}/upload-to-s3", params=params)
+            elapsed = (time.perf_counter() - started) * 1000
+            latencies.append(elapsed)
+
+            result = response.json()
+            # Servers that report per-stage timings get a breakdown as well
+            for stage, value in result.get("timings", {}).items():
+                stages.setdefault(stage, []).append(value)
+            print(f"{run:3d}. {response.status_code} {elapsed:8.1f} ms  {result.get('message', '')[:60]}")
+
+    print("-" * 50)
+    print(f"📊 Total    p50 {percentile(latencies, 0.5):8.1f} ms | p95 {percentile(latencies, 0.95):8.1f} ms "
+          f"| mean {statistics.mean(latencies):8.1f} ms")
+    for stage, values in stages.items():
+        print(f"   {stage:<9} p50 {percentile(values, 0.5):8.1f} ms | p95 {percentile(values, 0.95):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()